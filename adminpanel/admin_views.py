@@ -1,5 +1,7 @@
 from django.shortcuts import render
+from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_http_methods
 from django.db.models import Count
 from django.utils import timezone
 from datetime import timedelta
@@ -10,6 +12,7 @@ from blog.models import Blog, BlogCategory
 from gallery.models import GalleryItem, GalleryCategory
 from users.models import User
 from contact.models import Contact, VisitorTracking, Newsletter
+from .bulk import BulkActionError, apply_bulk_action
 
 @staff_member_required
 def admin_dashboard(request):
@@ -77,3 +80,32 @@ def admin_dashboard(request):
     }
     
     return render(request, 'admin/index.html', context)
+
+@staff_member_required
+@require_http_methods(["POST"])
+def admin_bulk_actions(request):
+    """
+    Apply one action to many rows in a single request.
+
+    Expects a JSON body such as
+    {"model": "contact", "action": "mark_read", "ids": [1, 2, 3]} or
+    {"model": "product", "action": "feature", "filter": {"category": 4}}.
+    """
+    try:
+        data = json.loads(request.body)
+        result = apply_bulk_action(
+            data.get('model'),
+            data.get('action'),
+            ids=data.get('ids'),
+            filters=data.get('filter'),
+        )
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid data format.'}, status=400)
+    except BulkActionError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'message': f"{result['affected']} {result['model']} rows updated by {result['action']}",
+        **result,
+    })
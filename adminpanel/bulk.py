@@ -0,0 +1,279 @@
+from django.core.exceptions import FieldError, ValidationError
+from django.db import transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from blog import similarity
+from blog.comments import comments_changed
+from blog.counters import refresh_popular_posts
+from blog.feeds import invalidate_feeds
+from blog.models import Blog, Comment
+from blog.neighbours import invalidate_neighbours
+from contact.models import Contact, Newsletter
+from core import sitemaps
+from core.pagecache import purge
+from core.signals import PURGE_TAGS, SITEMAP_SHARDS
+from faq.models import FAQ, FAQCategory
+from gallery.models import GalleryItem
+from gallery.tags import refresh_tag_counts, tags_of
+from product import facets
+from product.models import Product
+from search.indexing import KIND_BY_MODEL, reindex
+from search.models import SearchKind
+
+# Rows touched per UPDATE/DELETE statement. Each chunk runs in its own
+# transaction so row locks are held only briefly.
+CHUNK_SIZE = 1000
+
+DELETE = 'delete'
+
+
+def _now():
+    return timezone.now()
+
+
+def _published_at():
+    # Posts that are already published keep their original date.
+    return Coalesce(F('published_at'), Value(timezone.now(), output_field=DateTimeField()))
+
+
+# model key -> (model, {action: field values or DELETE}, filterable fields)
+BULK_ACTIONS = {
+    'contact': (Contact, {
+        'mark_read': {'is_read': True},
+        'mark_unread': {'is_read': False},
+        'delete': DELETE,
+    }, ('is_read', 'newsletter_subscription', 'created_at', 'email')),
+    'newsletter': (Newsletter, {
+        'activate': {'is_active': True, 'unsubscribed_at': None},
+        'deactivate': {'is_active': False, 'unsubscribed_at': _now},
+        'delete': DELETE,
+    }, ('is_active', 'subscribed_at')),
+    'blog': (Blog, {
+        'publish': {'is_published': True, 'published_at': _published_at},
+        'unpublish': {'is_published': False, 'published_at': None},
+        'delete': DELETE,
+    }, ('is_published', 'author', 'categories', 'created_at')),
+    'comment': (Comment, {
+        'approve': {'is_approved': True},
+        'disapprove': {'is_approved': False},
+        'delete': DELETE,
+    }, ('is_approved', 'blog', 'created_at')),
+    'product': (Product, {
+        'activate': {'is_active': True},
+        'deactivate': {'is_active': False},
+        'feature': {'is_featured': True},
+        'unfeature': {'is_featured': False},
+        'delete': DELETE,
+    }, ('is_active', 'is_featured', 'category', 'created_at')),
+    'gallery': (GalleryItem, {
+        'activate': {'is_active': True},
+        'deactivate': {'is_active': False},
+        'delete': DELETE,
+    }, ('is_active', 'media_type', 'category', 'created_at')),
+    'faq': (FAQ, {
+        'activate': {'is_active': True},
+        'deactivate': {'is_active': False},
+        'delete': DELETE,
+    }, ('is_active', 'category')),
+}
+
+def _rows_changed(model, ids):
+    """Do for rows changed by queryset.update() what the post_save handlers do for save()."""
+    ids = sorted(ids)
+    if model in KIND_BY_MODEL:
+        reindex(KIND_BY_MODEL[model], ids)
+    rows = [model(pk=pk) for pk in ids]
+    if model in PURGE_TAGS:
+        purge(*{tag for row in rows for tag in PURGE_TAGS[model](row)})
+    if model in SITEMAP_SHARDS:
+        for section, pk in {shard for row in rows for shard in SITEMAP_SHARDS[model](row)}:
+            sitemaps.queue_refresh(section, pk)
+
+
+def _blogs_changed(ids):
+    _rows_changed(Blog, ids)
+    invalidate_neighbours()
+    invalidate_feeds()
+    refresh_popular_posts()
+    similarity.queue_update(ids)
+
+
+def _products_changed(ids):
+    _rows_changed(Product, ids)
+    facets.rebuild_facets()
+
+
+def _gallery_changed(ids):
+    _rows_changed(GalleryItem, ids)
+    refresh_tag_counts(tags_of(ids))
+
+
+def _faqs_changed(ids):
+    _rows_changed(FAQ, ids)
+
+
+def _faq_categories_changed(ids):
+    _rows_changed(FAQCategory, ids)
+    # Category visibility and name are part of every FAQ entry in it.
+    reindex(SearchKind.FAQ, list(FAQ.objects.filter(category__in=ids).values_list('pk', flat=True)))
+
+
+# model key -> (field, callback): values of ``field`` on the updated rows are
+# collected and passed to ``callback`` once the action has committed, for the
+# search index, cached pages, sitemaps and denormalized data that queryset
+# updates bypass. Deletes need none of this: they send the delete signals
+# for every row.
+AFTER_BULK_ACTION = {
+    'blog': ('pk', _blogs_changed),
+    'comment': ('blog_id', comments_changed),
+    'product': ('pk', _products_changed),
+    'gallery': ('pk', _gallery_changed),
+    'faq': ('pk', _faqs_changed),
+}
+
+# model -> callback for update_rows(), where the rows need more than _rows_changed().
+AFTER_UPDATE = {
+    FAQCategory: _faq_categories_changed,
+}
+
+def update_rows(queryset, **values):
+    """
+    ``queryset.update(**values)`` for admin actions on models without a
+    BULK_ACTIONS entry, then the search index, page cache and sitemap refresh
+    that save() would have triggered, once the transaction commits. Returns
+    the number of rows updated.
+    """
+    model = queryset.model
+    # Collected first: the update may change what a filtered queryset selects.
+    ids = list(queryset.values_list('pk', flat=True))
+    updated = model._default_manager.filter(pk__in=ids).update(**values)
+    if ids:
+        if model in AFTER_UPDATE:
+            transaction.on_commit(lambda: AFTER_UPDATE[model](ids))
+        else:
+            transaction.on_commit(lambda: _rows_changed(model, ids))
+    return updated
+
+
+FILTER_LOOKUPS = ('exact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull', 'icontains')
+FILTER_SCALARS = (str, int, float, bool, type(None))
+
+
+class BulkActionError(ValueError):
+    pass
+
+
+def _filter_value_ok(lookup, value):
+    if lookup == 'isnull':
+        return isinstance(value, bool)
+    if lookup == 'in':
+        return isinstance(value, list) and all(isinstance(item, FILTER_SCALARS) for item in value)
+    return isinstance(value, FILTER_SCALARS)
+
+
+def _filtered(model, allowed_fields, filters):
+    """Validate a filter expression such as {"is_read": false, "created_at__lt": "2025-01-01"}."""
+    if not isinstance(filters, dict) or not filters:
+        raise BulkActionError('Filter must be a non-empty object.')
+    for key, value in filters.items():
+        field, _, lookup = key.partition('__')
+        if field not in allowed_fields or (lookup and lookup not in FILTER_LOOKUPS):
+            raise BulkActionError(f'Filtering on "{key}" is not allowed.')
+        if not _filter_value_ok(lookup, value):
+            raise BulkActionError(f'Invalid value for "{key}".')
+    try:
+        # Lookups are resolved and their values converted here, so a lookup
+        # the field doesn't support or a bad value fails before any query runs.
+        return model.objects.filter(**filters)
+    except FieldError:
+        raise BulkActionError('Unsupported lookup in filter.')
+    except (ValidationError, TypeError, ValueError):
+        raise BulkActionError('Invalid filter value.')
+
+
+def _apply(queryset, values, touched=None):
+    if touched is not None:
+        field, collected = touched
+        collected.update(queryset.values_list(field, flat=True).distinct())
+    if values == DELETE:
+        _, per_model = queryset.delete()
+        return per_model.get(queryset.model._meta.label, 0)
+    return queryset.update(**values)
+
+
+def _id_chunks(ids, chunk_size):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size]
+
+
+def apply_bulk_action(model_key, action, ids=None, filters=None, chunk_size=CHUNK_SIZE):
+    """
+    Apply a named action to many rows with set-based statements.
+
+    Rows are selected either by an explicit list of primary keys or by a
+    filter expression, and processed ``chunk_size`` rows at a time in
+    primary-key order so that each UPDATE/DELETE stays short. Returns a summary dict with the
+    number of affected rows and statements issued.
+    """
+    try:
+        model, actions, filter_fields = BULK_ACTIONS[model_key]
+    except KeyError:
+        raise BulkActionError(f'Unknown model "{model_key}".')
+    if action not in actions:
+        raise BulkActionError(f'Unknown action "{action}" for {model_key}.')
+    if ids is None and filters is None:
+        raise BulkActionError('Provide either "ids" or "filter".')
+
+    values = actions[action]
+    if values != DELETE:
+        values = {field: value() if callable(value) else value for field, value in values.items()}
+
+    touched = None
+    if model_key in AFTER_BULK_ACTION and values != DELETE:
+        touched = (AFTER_BULK_ACTION[model_key][0], set())
+
+    affected = 0
+    chunks = 0
+    if ids is not None:
+        try:
+            # A string is iterable too; "12" must not become [1, 2].
+            if not isinstance(ids, (list, tuple)):
+                raise TypeError
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            raise BulkActionError('"ids" must be a list of integers.')
+        for chunk in _id_chunks(ids, chunk_size):
+            with transaction.atomic():
+                queryset = model.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1], pk__in=chunk)
+                affected += _apply(queryset, values, touched)
+            chunks += 1
+    else:
+        base = _filtered(model, filter_fields, filters).order_by('pk').values_list('pk', flat=True).distinct()
+        last = None
+        while True:
+            with transaction.atomic():
+                # Keyset pagination: the next chunk_size matching ids after
+                # the last one done, however sparse the ids are. Selecting ids
+                # first keeps joins from m2m filters out of the UPDATE/DELETE.
+                chunk = list((base if last is None else base.filter(pk__gt=last))[:chunk_size])
+                if not chunk:
+                    break
+                affected += _apply(model.objects.filter(pk__in=chunk), values, touched)
+            chunks += 1
+            last = chunk[-1]
+            if len(chunk) < chunk_size:
+                break
+
+    if touched is not None and touched[1]:
+        callback, collected = AFTER_BULK_ACTION[model_key][1], touched[1]
+        transaction.on_commit(lambda: callback(collected))
+
+    return {
+        'model': model_key,
+        'action': action,
+        'affected': affected,
+        'chunks': chunks,
+    }
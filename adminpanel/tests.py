@@ -0,0 +1,85 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from blog import similarity
+from blog.models import Blog
+from contact.models import Contact
+from product.models import FacetCount, Product
+from search.indexing import index_objects
+from search.models import SearchDocument, SearchKind
+from users.models import User
+from .bulk import apply_bulk_action
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        similarity._stale.clear()
+        self.client.force_login(User.objects.create_user(
+            username='staff', email='staff@example.com', password='x', is_staff=True))
+
+    def post(self, payload):
+        return self.client.post(reverse('adminpanel:bulk_actions'), json.dumps(payload),
+                                content_type='application/json')
+
+    def test_filter_actions_chunk_by_keyset_and_reject_bad_values(self):
+        # Sparse ids: chunks follow the matching rows, not the id range.
+        for pk in (1, 2, 3, 5_000, 90_000):
+            Contact.objects.create(pk=pk, name='n', email=f'{pk}@example.com', subject='s', message='m')
+        result = apply_bulk_action('contact', 'mark_read', filters={'is_read': False}, chunk_size=2)
+        self.assertEqual((result['affected'], result['chunks']), (5, 3))
+
+        response = self.post({'model': 'contact', 'action': 'mark_unread', 'filter': {'is_read': True}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['affected'], 5)
+        self.assertFalse(Contact.objects.filter(is_read=True).exists())
+
+        for bad in ({'is_read': 'abc'}, {'created_at__lt': 'not-a-date'}, {'email__in': 5},
+                    {'created_at': [1]}, {'is_read__isnull': 'x'}, {'email__icontains': {}}):
+            self.assertEqual(self.post({'model': 'contact', 'action': 'delete', 'filter': bad}).status_code, 400, bad)
+        self.assertEqual(Contact.objects.count(), 5)
+
+        for model, bad in (('blog', {'author__icontains': 'x'}), ('product', {'category__icontains': 'x'}),
+                           ('blog', {'categories__gt': 'x'})):
+            self.assertEqual(self.post({'model': model, 'action': 'delete', 'filter': bad}).status_code, 400, bad)
+        response = self.post({'model': 'contact', 'action': 'delete', 'ids': '12'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Contact.objects.count(), 5)
+
+    def test_updates_refresh_what_save_would(self):
+        author = User.objects.create_user(username='author', email='author@example.com', password='x')
+        published_at = timezone.now() - timedelta(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            old = Blog.objects.create(title='Old crust', slug='old', content='x', author=author,
+                                      is_published=True, published_at=published_at)
+            draft = Blog.objects.create(title='Draft crust', slug='draft', content='x', author=author)
+            product = Product.objects.create(name='Forno', slug='forno', short_description='x', description='x',
+                                             price=1000, main_image='products/forno.jpg', stock_quantity=1)
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchKind.BLOG, object_id=draft.pk).exists())
+
+        with mock.patch('adminpanel.bulk.purge') as purge, mock.patch('core.sitemaps.queue_refresh') as refresh, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.post({'model': 'blog', 'action': 'publish', 'ids': [old.pk, draft.pk]})
+        self.assertEqual(response.json()['affected'], 2)
+        old.refresh_from_db()
+        draft.refresh_from_db()
+        self.assertEqual(old.published_at, published_at)
+        self.assertIsNotNone(draft.published_at)
+        self.assertTrue(SearchDocument.objects.filter(kind=SearchKind.BLOG, object_id=draft.pk).exists())
+        self.assertEqual(set(purge.call_args.args), {'blog', 'home'})
+        self.assertIn(mock.call('blogs', draft.pk), refresh.call_args_list)
+
+        index_objects(SearchKind.PRODUCT, [product])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post({'model': 'product', 'action': 'deactivate', 'filter': {'is_active': True}})
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchKind.PRODUCT, object_id=product.pk).exists())
+        self.assertFalse(FacetCount.objects.filter(facet='stock', value='in').exists())
+
+    def test_route_requires_staff(self):
+        self.client.logout()
+        response = self.post({'model': 'contact', 'action': 'delete', 'ids': [1]})
+        self.assertEqual(response.status_code, 302)
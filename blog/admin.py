@@ -3,6 +3,9 @@ from django.utils.html import format_html
 from django.http import HttpResponse
 import csv
 from datetime import datetime
+from adminpanel.bulk import apply_bulk_action
+from core.cloning import clone_objects, copy_label
+from .comments import comments_changed
 from .models import BlogCategory, Blog, Comment
 
 @admin.register(BlogCategory)
@@ -74,13 +77,14 @@ class BlogAdmin(admin.ModelAdmin):
         return "No image"
     image_preview.short_description = "Featured Image Preview"
 
+    # The bulk actions also refresh the search index, feeds, related posts and cached pages.
     def make_published(self, request, queryset):
-        updated = queryset.update(is_published=True, published_at=datetime.now())
+        updated = apply_bulk_action('blog', 'publish', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} blogs were successfully published.')
     make_published.short_description = "Publish selected blogs"
 
     def make_draft(self, request, queryset):
-        updated = queryset.update(is_published=False, published_at=None)
+        updated = apply_bulk_action('blog', 'unpublish', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} blogs were successfully moved to drafts.')
     make_draft.short_description = "Move selected blogs to drafts"
 
@@ -100,14 +104,19 @@ class BlogAdmin(admin.ModelAdmin):
     export_as_csv.short_description = "Export selected blogs as CSV"
 
     def duplicate_blogs(self, request, queryset):
-        for blog in queryset:
-            blog.pk = None
-            blog.title = f"{blog.title} (Copy)"
-            blog.slug = f"{blog.slug}-copy"
-            blog.is_published = False
-            blog.save()
-        
-        self.message_user(request, f'{queryset.count()} blogs were successfully duplicated.')
+        copies = clone_objects(
+            queryset,
+            overrides={
+                'title': lambda blog: copy_label(blog.title, 200),
+                'is_published': False,
+                'published_at': None,
+                'views': 0,
+                'approved_comment_count': 0,
+            },
+            slug_field='slug',
+            m2m=['categories'],
+        )
+        self.message_user(request, f'{len(copies)} blogs were successfully duplicated.')
     duplicate_blogs.short_description = "Duplicate selected blogs"
 
 @admin.register(Comment)
@@ -124,12 +133,16 @@ class CommentAdmin(admin.ModelAdmin):
     content_preview.short_description = "Content Preview"
 
     def approve_comments(self, request, queryset):
+        blog_ids = set(queryset.values_list('blog_id', flat=True))
         updated = queryset.update(is_approved=True)
+        comments_changed(blog_ids)
         self.message_user(request, f'{updated} comments were successfully approved.')
     approve_comments.short_description = "Approve selected comments"
 
     def disapprove_comments(self, request, queryset):
+        blog_ids = set(queryset.values_list('blog_id', flat=True))
         updated = queryset.update(is_approved=False)
+        comments_changed(blog_ids)
         self.message_user(request, f'{updated} comments were successfully disapproved.')
     disapprove_comments.short_description = "Disapprove selected comments"
 
@@ -0,0 +1,121 @@
+"""
+Threaded comments.
+
+Comments carry a materialized path (see Comment.path), so one page of
+top-level threads is two indexed queries: the page's roots, then every
+approved comment whose path falls between the first and last root, in path
+order. Threads are assembled in memory and cached per page.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Length, Substr
+
+from core.pagecache import purge
+from .models import Blog, Comment
+
+THREADS_PER_PAGE = 20
+
+
+def _generation_key(blog_id):
+    return f'blog:comments:{blog_id}:generation'
+
+
+def _cache_key(blog_id, page):
+    generation = cache.get_or_set(_generation_key(blog_id), 1, None)
+    return f'blog:comments:{blog_id}:{generation}:{page}'
+
+
+class ThreadPage:
+    def __init__(self, threads, number, has_next):
+        self.threads = threads
+        self.number = number
+        self.has_next = has_next
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    def __iter__(self):
+        return iter(self.threads)
+
+    def __len__(self):
+        return len(self.threads)
+
+
+def load_comments(blog, page=1, per_page=THREADS_PER_PAGE):
+    """
+    One page of approved top-level comments of a post, each with its
+    approved descendants in ``thread_replies`` (depth-first order).
+    """
+    offset = (page - 1) * per_page
+    root_paths = list(
+        Comment.objects.filter(blog_id=blog.pk, is_approved=True, parent__isnull=True)
+        .order_by('path')
+        .values_list('path', flat=True)[offset:offset + per_page + 1]
+    )
+    has_next = len(root_paths) > per_page
+    root_paths = root_paths[:per_page]
+    if not root_paths:
+        return ThreadPage([], page, False)
+
+    comments = (Comment.objects
+        .filter(blog_id=blog.pk, is_approved=True, path__gte=root_paths[0], path__lt=root_paths[-1] + '~')
+        .select_related('user')
+        .order_by('path'))
+    roots = []
+    visible = {}
+    for comment in comments:
+        parent = visible.get(comment.parent_id)
+        if comment.parent_id is None:
+            comment.thread_replies = []
+            roots.append(comment)
+            visible[comment.pk] = comment
+        elif parent is not None:
+            # Replies under an unapproved comment stay hidden with it.
+            root = parent if parent.parent_id is None else parent.thread_root
+            comment.thread_root = root
+            root.thread_replies.append(comment)
+            visible[comment.pk] = comment
+    return ThreadPage(roots, page, has_next)
+
+
+def get_comments(blog, page=1):
+    key = _cache_key(blog.pk, page)
+    threads = cache.get(key)
+    if threads is None:
+        threads = load_comments(blog, page)
+        cache.set(key, threads, None)
+    return threads
+
+
+def refresh_comment_counts(blog_ids):
+    """
+    Recompute Blog.approved_comment_count for the given posts in one UPDATE,
+    counting the comments load_comments shows: approved ones with no
+    unapproved ancestor, i.e. no unapproved comment whose path prefixes theirs.
+    """
+    hidden_ancestor = Comment.objects.filter(
+        blog_id=OuterRef('blog_id'), is_approved=False, path=Substr(OuterRef('path'), 1, Length('path')),
+    )
+    approved = (Comment.objects
+        .filter(blog=OuterRef('pk'), is_approved=True)
+        .exclude(Exists(hidden_ancestor))
+        .values('blog')
+        .annotate(total=Count('pk'))
+        .values('total'))
+    Blog.objects.filter(pk__in=list(blog_ids)).update(approved_comment_count=Coalesce(Subquery(approved), 0))
+
+
+def comments_changed(blog_ids):
+    """Bring counts, cached threads and cached pages up to date after comments of ``blog_ids`` changed."""
+    blog_ids = set(blog_ids)
+    if not blog_ids:
+        return
+    refresh_comment_counts(blog_ids)
+    for blog_id in blog_ids:
+        try:
+            cache.incr(_generation_key(blog_id))
+        except ValueError:
+            cache.set(_generation_key(blog_id), 2, None)
+    slugs = Blog.objects.filter(pk__in=blog_ids).values_list('slug', flat=True)
+    purge(*[f'blog:{slug}' for slug in slugs])
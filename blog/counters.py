@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from core import background
+
+from .models import Blog
+
+# Buffered views are written back, on a background thread, once this many
+# seconds have passed or this many hits have accumulated, whichever comes first.
+FLUSH_INTERVAL = getattr(settings, 'BLOG_VIEW_FLUSH_INTERVAL', 30)
+FLUSH_THRESHOLD = getattr(settings, 'BLOG_VIEW_FLUSH_THRESHOLD', 500)
+# Rows per UPDATE statement when flushing.
+FLUSH_BATCH_SIZE = 500
+
+POPULAR_POSTS_COUNT = 5
+POPULAR_POSTS_CACHE_KEY = 'blog:popular_posts:v2'
+# Gravity for time-decayed ranking: score = views / (age_in_hours + 2) ** gravity.
+# 0 ranks purely by total views.
+POPULAR_POSTS_GRAVITY = getattr(settings, 'BLOG_POPULAR_POSTS_GRAVITY', 0)
+# How many of the most viewed posts are considered when decay is enabled.
+POPULAR_POSTS_CANDIDATES = 50
+
+_pending = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record_view(blog_id):
+    """Count one view of a post without touching the database; a due flush is left to core.background."""
+    with _lock:
+        _pending[blog_id] += 1
+        due = (
+            sum(_pending.values()) >= FLUSH_THRESHOLD
+            or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        )
+    if due:
+        background.schedule('blog.views', flush_views)
+
+
+def flush_views():
+    """Write buffered view counts back with batched UPDATEs. Returns the number of posts updated."""
+    global _last_flush
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    items = list(pending.items())
+    written = 0
+    try:
+        while written < len(items):
+            batch = items[written:written + FLUSH_BATCH_SIZE]
+            increment = Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in batch],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            )
+            Blog.objects.filter(pk__in=[pk for pk, _ in batch]).update(views=F('views') + increment)
+            written += len(batch)
+    except Exception:
+        # Keep whatever was not written so the next flush retries it.
+        with _lock:
+            _pending.update(dict(items[written:]))
+        raise
+
+    refresh_popular_posts()
+    return written
+
+
+def _score(post, now):
+    if not POPULAR_POSTS_GRAVITY:
+        return post['views']
+    published = post['published_at'] or post['created_at']
+    age_hours = max((now - published).total_seconds() / 3600, 0)
+    return post['views'] / (age_hours + 2) ** POPULAR_POSTS_GRAVITY
+
+
+def refresh_popular_posts():
+    """Recompute the popular posts list and store it in the cache."""
+    limit = POPULAR_POSTS_CANDIDATES if POPULAR_POSTS_GRAVITY else POPULAR_POSTS_COUNT
+    posts = list(
+        Blog.objects.filter(is_published=True)
+        .order_by('-views', '-created_at')
+        .values('id', 'title', 'slug', 'featured_image', 'views', 'published_at', 'created_at')[:limit]
+    )
+    now = timezone.now()
+    posts.sort(key=lambda post: _score(post, now), reverse=True)
+    posts = posts[:POPULAR_POSTS_COUNT]
+    cache.set(POPULAR_POSTS_CACHE_KEY, posts, None)
+    return posts
+
+
+def get_popular_posts():
+    """Return the precomputed popular posts; only queries on a cold cache."""
+    posts = cache.get(POPULAR_POSTS_CACHE_KEY)
+    if posts is None:
+        posts = refresh_popular_posts()
+    return posts
+
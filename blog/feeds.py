@@ -0,0 +1,130 @@
+"""
+RSS and Atom feeds of published posts, site-wide and per category.
+
+Rendered bodies and their validators (newest ``updated_at`` of the posts in
+scope, and an ETag over it) are cached under a generation key that every
+blog change bumps, so a poll that only revalidates is answered with a 304
+from the cache alone.
+"""
+import hashlib
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from .models import Blog, BlogCategory
+
+FEED_ITEMS = 20
+GENERATION_KEY = 'blog:feeds:generation'
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def invalidate_feeds():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+class LatestPostsFeed(Feed):
+    description = "Recipes, baking tips and news from OvenCraft."
+
+    def get_object(self, request, slug=None):
+        return get_object_or_404(BlogCategory, slug=slug) if slug else None
+
+    def title(self, category):
+        return f"OvenCraft Blog: {category.name}" if category else "OvenCraft Blog"
+
+    def link(self, category):
+        return '/blogs/'
+
+    def items(self, category):
+        posts = (Blog.objects
+            .filter(is_published=True)
+            .select_related('author')
+            .prefetch_related('categories')
+            .only('title', 'slug', 'plain_excerpt', 'published_at', 'created_at', 'updated_at',
+                  'author__username', 'author__full_name')
+            .order_by('-created_at'))
+        if category:
+            posts = posts.filter(categories=category)
+        return posts[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.plain_excerpt
+
+    def item_link(self, item):
+        return f'/blogs/{item.slug}/'
+
+    def item_pubdate(self, item):
+        return item.published_at or item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        if item.author:
+            return item.author.full_name or item.author.username
+        return None
+
+    def item_categories(self, item):
+        return [category.name for category in item.categories.all()]
+
+
+class AtomLatestPostsFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+FEEDS = {
+    'rss': LatestPostsFeed(),
+    'atom': AtomLatestPostsFeed(),
+}
+
+
+def _validators(kind, slug):
+    """Cached (last_modified, etag) for one feed."""
+    generation = _generation()
+    key = f'blog:feeds:{generation}:validators:{slug or ""}'
+    validators = cache.get(key)
+    if validators is None:
+        # Unpublished posts count too, so taking a post down moves Last-Modified.
+        posts = Blog.objects.filter(categories__slug=slug) if slug else Blog.objects.all()
+        last_modified = posts.aggregate(newest=Max('updated_at'))['newest']
+        validators = (last_modified, f'{generation}:{last_modified.isoformat() if last_modified else ""}')
+        cache.set(key, validators, None)
+    last_modified, stamp = validators
+    return last_modified, hashlib.md5(f'{kind}:{slug}:{stamp}'.encode()).hexdigest()
+
+
+def feed_view(kind):
+    feed = FEEDS[kind]
+
+    @condition(
+        etag_func=lambda request, slug=None: _validators(kind, slug)[1],
+        last_modified_func=lambda request, slug=None: _validators(kind, slug)[0],
+    )
+    def view(request, slug=None):
+        key = f'blog:feeds:{_generation()}:{kind}:{slug or ""}'
+        cached = cache.get(key)
+        if cached is None:
+            response = feed(request, slug=slug)
+            cached = (response.content, response['Content-Type'])
+            cache.set(key, cached, None)
+        return HttpResponse(cached[0], content_type=cached[1])
+
+    return view
+
+
+rss_feed = feed_view('rss')
+atom_feed = feed_view('atom')
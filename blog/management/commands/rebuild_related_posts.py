@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.similarity import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recompute the content-similarity related posts for every published blog"
+
+    def handle(self, *args, **options):
+        count = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Computed related posts for {count} blogs.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.counters import refresh_popular_posts
+
+
+class Command(BaseCommand):
+    help = "Recompute the cached popular blog posts list (run periodically when time decay is enabled)"
+
+    def handle(self, *args, **options):
+        posts = refresh_popular_posts()
+        self.stdout.write(self.style.SUCCESS(f'Cached {len(posts)} popular posts.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blog_meta_keywords'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blog_views'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['is_published', 'created_at'], name='blog_published_created_idx'),
+        ),
+    ]
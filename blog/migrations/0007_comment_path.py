@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Length, Substr
+
+
+def backfill(apps, schema_editor):
+    Blog = apps.get_model('blog', 'Blog')
+    Comment = apps.get_model('blog', 'Comment')
+    # Walk the forest level by level so every parent has its path first.
+    paths = {}
+    level = list(Comment.objects.filter(parent__isnull=True).values_list('id', flat=True))
+    depth = 0
+    while level:
+        batch = []
+        for comment in Comment.objects.filter(id__in=level).only('id', 'parent_id'):
+            comment.path = paths.get(comment.parent_id, '') + str(comment.id).zfill(10) + '/'
+            comment.depth = depth
+            paths[comment.id] = comment.path
+            batch.append(comment)
+        Comment.objects.bulk_update(batch, ['path', 'depth'], batch_size=500)
+        level = list(Comment.objects.filter(parent_id__in=level).values_list('id', flat=True))
+        depth += 1
+
+    # As blog.comments.refresh_comment_counts: approved comments with no
+    # unapproved ancestor, i.e. no unapproved comment whose path prefixes theirs.
+    hidden_ancestor = Comment.objects.filter(
+        blog_id=OuterRef('blog_id'), is_approved=False, path=Substr(OuterRef('path'), 1, Length('path')),
+    )
+    approved = (Comment.objects
+        .filter(blog=OuterRef('pk'), is_approved=True)
+        .exclude(Exists(hidden_ancestor))
+        .values('blog')
+        .annotate(total=Count('pk'))
+        .values('total'))
+    Blog.objects.update(approved_comment_count=Coalesce(Subquery(approved), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blog_rendered_content'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['blog', 'path'], name='blog_comment_blog_path_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
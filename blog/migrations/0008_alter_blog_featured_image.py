@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:09
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blog',
+            name='featured_image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='blogs/'),
+        ),
+    ]
@@ -1,8 +1,22 @@
 
 from django.db import models
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Max, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 
+from core.storage import media_storage
+from .rendering import render_content
+
+# Columns filled from content/excerpt by Blog.render().
+RENDERED_FIELDS = ('content_html', 'toc', 'word_count', 'reading_time', 'plain_excerpt')
+# Digits per comment id in Comment.path.
+PATH_DIGITS = 10
+# Deepest reply allowed (top-level comments are depth 0). Comment.path holds
+# 255 // (PATH_DIGITS + 1) levels, so this leaves plenty of room.
+MAX_COMMENT_DEPTH = 8
+
 class BlogCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
@@ -23,11 +37,21 @@ class Blog(models.Model):
     slug = models.SlugField(unique=True)
     content = models.TextField()
     excerpt = models.TextField(blank=True, null=True)
-    featured_image = models.ImageField(upload_to='blogs/', blank=True, null=True)
+    featured_image = models.ImageField(upload_to='blogs/', storage=media_storage, blank=True, null=True)
+    # Filled in by core.renditions once the upload is processed.
+    featured_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     meta_title = models.CharField(max_length=200, blank=True, null=True)
     meta_description = models.CharField(max_length=255, blank=True, null=True)
     meta_keywords = models.CharField(max_length=255, blank=True, null=True, help_text="SEO keywords, comma separated")
     is_published = models.BooleanField(default=False)
+    views = models.PositiveIntegerField(default=0, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Minutes")
+    plain_excerpt = models.TextField(blank=True, editable=False)
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(blank=True, null=True)
@@ -37,6 +61,24 @@ class Blog(models.Model):
     def __str__(self):
         return self.title
 
+    def render(self):
+        """Pre-render content so pages never parse it per request."""
+        for field, value in render_content(self.content, self.excerpt).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'content', 'excerpt'} & set(update_fields):
+            self.render()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(RENDERED_FIELDS)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_published', 'created_at'], name='blog_published_created_idx'),
+        ]
+
 class Comment(models.Model):
     content = models.TextField()
     is_approved = models.BooleanField(default=False)
@@ -45,6 +87,101 @@ class Comment(models.Model):
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name="comments")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="comments")
     parent = models.ForeignKey("self", null=True, blank=True, on_delete=models.CASCADE, related_name="replies")
+    # Materialized path: the zero-padded ids of every ancestor and the comment
+    # itself, so ordering by path yields each thread depth-first.
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.blog.title}"
+
+    def _path_parent_id(self):
+        """The parent id recorded in path, None for a top-level comment."""
+        segments = self.path.rstrip('/').split('/')
+        return int(segments[-2]) if len(segments) > 1 else None
+
+    def _check_parent(self, parent_path):
+        """ValidationError if replying to ``parent_path`` would nest this thread too deep or inside itself."""
+        if self.path and parent_path.startswith(self.path):
+            raise ValidationError({'parent': "A comment cannot reply to itself or to its own replies."})
+        height = 0
+        if self.path:
+            deepest = Comment.objects.filter(path__startswith=self.path).aggregate(depth=Max('depth'))['depth']
+            height = (deepest or self.depth) - self.depth
+        if parent_path.count('/') + height > MAX_COMMENT_DEPTH:
+            raise ValidationError({'parent': f"Replies can be nested at most {MAX_COMMENT_DEPTH} levels deep."})
+
+    def _parent_path(self):
+        return Comment.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+
+    def clean(self):
+        super().clean()
+        if self.parent_id is not None:
+            self._check_parent(self._parent_path())
+
+    def save(self, *args, **kwargs):
+        moved = bool(self.path) and self.parent_id != self._path_parent_id()
+        parent_path = ''
+        if self.parent_id is not None and (moved or not self.path):
+            parent_path = self._parent_path()
+            self._check_parent(parent_path)
+        super().save(*args, **kwargs)
+        if not self.path:
+            self.path = f'{parent_path}{str(self.pk).zfill(PATH_DIGITS)}/'
+            self.depth = self.path.count('/') - 1
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+        elif moved:
+            # Re-root the comment and its whole subtree under the new parent.
+            old_path, self.path = self.path, f'{parent_path}{str(self.pk).zfill(PATH_DIGITS)}/'
+            shift = self.path.count('/') - old_path.count('/')
+            Comment.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + shift,
+            )
+            self.depth += shift
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['blog', 'path'], name='blog_comment_blog_path_idx'),
+        ]
+
+class RelatedPost(models.Model):
+    """Precomputed content-similarity neighbours of a post, see blog.similarity."""
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name="related_entries")
+    related = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.blog_id} -> {self.related_id} ({self.score:.3f})"
+
+    class Meta:
+        ordering = ['blog', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['blog', 'rank'], name='blog_relatedpost_blog_rank_uniq'),
+        ]
+
+class SimilarityTerm(models.Model):
+    """How many published posts contain a term, for the IDF in blog.similarity."""
+    term = models.CharField(max_length=64, unique=True)
+    document_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.document_count})"
+
+class PostTerm(models.Model):
+    """One entry of a published post's stored TF-IDF vector, see blog.similarity."""
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name="+")
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    def __str__(self):
+        return f"{self.blog_id}: {self.term} ({self.weight:.3f})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blog', 'term'], name='blog_postterm_blog_term_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'blog'], name='blog_postterm_term_idx'),
+        ]
@@ -0,0 +1,102 @@
+from django.core.cache import cache
+
+from .models import Blog, RelatedPost
+
+RELATED_POSTS_COUNT = 3
+GENERATION_KEY = 'blog:neighbours:generation'
+
+CARD_FIELDS = ('id', 'title', 'slug', 'excerpt', 'featured_image', 'published_at', 'created_at')
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def _cache_key(blog_id):
+    return f'blog:neighbours:v2:{_generation()}:{blog_id}'
+
+
+def _card(post):
+    """
+    Turn a values() row into a plain dict the templates can render without
+    queries. featured_image stays the storage name, for responsive_image.
+    """
+    post = dict(post)
+    post['category'] = None
+    return post
+
+
+def _first_categories(post_ids):
+    """Map post id -> first category dict, in one query."""
+    categories = {}
+    rows = (Blog.categories.through.objects
+        .filter(blog_id__in=post_ids)
+        .order_by('blog_id', 'blogcategory__name')
+        .values('blog_id', 'blogcategory__name', 'blogcategory__slug'))
+    for row in rows:
+        categories.setdefault(row['blog_id'], {
+            'name': row['blogcategory__name'],
+            'slug': row['blogcategory__slug'],
+        })
+    return categories
+
+
+def related_posts(blog):
+    """
+    The most similar published posts from the precomputed RelatedPost table,
+    padded with posts sharing a category and then with recent posts.
+    """
+    published = Blog.objects.filter(is_published=True).exclude(pk=blog.pk).order_by('-created_at')
+    entries = (RelatedPost.objects
+        .filter(blog_id=blog.pk, related__is_published=True)
+        .order_by('rank')
+        .values(*[f'related__{field}' for field in CARD_FIELDS])[:RELATED_POSTS_COUNT])
+    posts = [{field: entry[f'related__{field}'] for field in CARD_FIELDS} for entry in entries]
+    if len(posts) < RELATED_POSTS_COUNT:
+        seen = [post['id'] for post in posts]
+        category_ids = list(Blog.categories.through.objects.filter(blog_id=blog.pk).values_list('blogcategory_id', flat=True))
+        if category_ids:
+            posts += list(published.filter(categories__in=category_ids).exclude(pk__in=seen).distinct()
+                .values(*CARD_FIELDS)[:RELATED_POSTS_COUNT - len(posts)])
+    if len(posts) < RELATED_POSTS_COUNT:
+        seen = [post['id'] for post in posts]
+        posts += list(published.exclude(pk__in=seen).values(*CARD_FIELDS)[:RELATED_POSTS_COUNT - len(posts)])
+    return posts
+
+
+def build_neighbours(blog):
+    """Compute the previous/next/related record for one post."""
+    published = Blog.objects.filter(is_published=True)
+    prev_blog = published.filter(created_at__lt=blog.created_at).order_by('-created_at').values(*CARD_FIELDS).first()
+    next_blog = published.filter(created_at__gt=blog.created_at).order_by('created_at').values(*CARD_FIELDS).first()
+    related = [_card(post) for post in related_posts(blog)]
+    categories = _first_categories([post['id'] for post in related])
+    for post in related:
+        post['category'] = categories.get(post['id'])
+    return {
+        'prev': _card(prev_blog) if prev_blog else None,
+        'next': _card(next_blog) if next_blog else None,
+        'related': related,
+    }
+
+
+def refresh_neighbours(blog):
+    record = build_neighbours(blog)
+    cache.set(_cache_key(blog.pk), record, None)
+    return record
+
+
+def get_neighbours(blog):
+    """Return the cached neighbour record for a post, computing it on a miss."""
+    record = cache.get(_cache_key(blog.pk))
+    if record is None:
+        record = refresh_neighbours(blog)
+    return record
+
+
+def invalidate_neighbours():
+    """Drop every cached record; any save can shift other posts' prev/next."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
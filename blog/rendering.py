@@ -0,0 +1,202 @@
+"""
+Save-time rendering of blog content.
+
+``render_content`` runs once per save and produces everything the pages
+need from the raw editor HTML: sanitized HTML with anchored headings, a
+table of contents, word count, reading time and a plain-text excerpt.
+Requests only ever read the stored result.
+"""
+import math
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+from django.utils.text import Truncator, slugify
+
+WORDS_PER_MINUTE = 200
+EXCERPT_LENGTH = 160
+TOC_LEVELS = ('h2', 'h3')
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'iframe', 'img', 'li', 'ol', 'p', 'pre', 's',
+    'small', 'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr',
+    'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Tags dropped together with everything inside them.
+DROP_CONTENT_TAGS = {'script', 'style', 'template', 'noscript', 'object', 'embed'}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'title'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height', 'loading'},
+    'iframe': {'src', 'width', 'height', 'allowfullscreen', 'frameborder'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+# Only embeds from these hosts survive sanitizing.
+ALLOWED_IFRAME_HOSTS = {'www.youtube.com', 'youtube.com', 'www.youtube-nocookie.com', 'player.vimeo.com'}
+# Opening one of these closes a still-open sibling of the listed kinds, as browsers do.
+IMPLIED_END_TAGS = {'li': {'li'}, 'p': {'p'}, 'tr': {'tr', 'td', 'th'}, 'td': {'td', 'th'}, 'th': {'td', 'th'}}
+BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'blockquote', 'pre', 'figcaption', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+
+def _safe_url(value, tag):
+    url = urlparse(value.strip())
+    if url.scheme.lower() not in ALLOWED_SCHEMES:
+        return False
+    if tag == 'iframe':
+        return url.scheme in ('http', 'https') and url.hostname in ALLOWED_IFRAME_HOSTS
+    return True
+
+
+class _ContentRenderer(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.text = []
+        self.toc = []
+        self.open_tags = []
+        self._dropping = 0
+        self._heading = None
+        self._anchors = set()
+
+    def _attributes(self, tag, attrs):
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = []
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRIBUTES and not _safe_url(value, tag):
+                continue
+            cleaned.append((name, value))
+        if tag == 'a' and dict(cleaned).get('target') == '_blank':
+            cleaned = [(name, value) for name, value in cleaned if name != 'rel'] + [('rel', 'noopener noreferrer')]
+        return cleaned
+
+    def _start(self, tag, attrs):
+        rendered = ''.join(f' {name}="{escape(value)}"' for name, value in attrs)
+        return f'<{tag}{rendered}>'
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self._dropping += 1
+            return
+        if self._dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+        if self.open_tags and self.open_tags[-1] in IMPLIED_END_TAGS.get(tag, ()):
+            self.handle_endtag(self.open_tags[-1])
+        attrs = self._attributes(tag, attrs)
+        if tag == 'iframe' and 'src' not in dict(attrs):
+            # An iframe without an allowed source is dropped with its fallback content.
+            self._dropping += 1
+            self.open_tags.append('#dropped-iframe')
+            return
+        if tag in TOC_LEVELS and self._heading is None:
+            self._heading = {'level': int(tag[1]), 'tag': tag, 'attrs': attrs, 'index': len(self.parts), 'text': []}
+            self.parts.append('')  # placeholder, filled once the heading text is known
+            self.open_tags.append(tag)
+            return
+        self.parts.append(self._start(tag, attrs))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and tag in ALLOWED_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self._dropping = max(self._dropping - 1, 0)
+            return
+        if tag == 'iframe' and self.open_tags and self.open_tags[-1] == '#dropped-iframe':
+            self.open_tags.pop()
+            self._dropping = max(self._dropping - 1, 0)
+            return
+        if self._dropping or tag not in self.open_tags:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        # Close anything left open inside this element so the output stays well formed.
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.parts.append(f'</{open_tag}>')
+            if self._heading and open_tag == self._heading['tag']:
+                self._close_heading()
+            if open_tag == tag:
+                break
+
+    def _close_heading(self):
+        heading, self._heading = self._heading, None
+        title = ' '.join(''.join(heading['text']).split())
+        attrs = [(name, value) for name, value in heading['attrs'] if name != 'id']
+        if title:
+            anchor = base = slugify(title) or 'section'
+            suffix = 2
+            while anchor in self._anchors:
+                anchor = f'{base}-{suffix}'
+                suffix += 1
+            self._anchors.add(anchor)
+            attrs.append(('id', anchor))
+            self.toc.append({'level': heading['level'], 'id': anchor, 'title': title})
+        self.parts[heading['index']] = self._start(heading['tag'], attrs)
+
+    def handle_data(self, data):
+        if self._dropping:
+            return
+        self.parts.append(escape(data, quote=False))
+        self.text.append(data)
+        if self._heading is not None:
+            self._heading['text'].append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            if open_tag.startswith('#'):
+                continue
+            self.parts.append(f'</{open_tag}>')
+            if self._heading and open_tag == self._heading['tag']:
+                self._close_heading()
+
+
+def sanitize_html(html):
+    """Sanitized HTML, headings anchored, plus the TOC entries and plain text."""
+    renderer = _ContentRenderer()
+    renderer.feed(html or '')
+    renderer.close()
+    text = re.sub(r'\s+', ' ', ''.join(renderer.text)).strip()
+    return ''.join(renderer.parts), renderer.toc, text
+
+
+def render_content(content, excerpt=None):
+    """
+    Render raw post content into the values stored on Blog.
+
+    Returns a dict with ``content_html``, ``toc`` (list of level/id/title
+    dicts), ``word_count``, ``reading_time`` (minutes, at least 1 when there
+    is any text) and ``plain_excerpt``.
+    """
+    html, toc, text = sanitize_html(content)
+    word_count = len(text.split())
+    if excerpt:
+        _, _, summary = sanitize_html(excerpt)
+    else:
+        summary = text
+    return {
+        'content_html': html,
+        'toc': toc,
+        'word_count': word_count,
+        'reading_time': math.ceil(word_count / WORDS_PER_MINUTE),
+        'plain_excerpt': Truncator(summary).chars(EXCERPT_LENGTH),
+    }
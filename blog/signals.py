@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .comments import comments_changed
+from .counters import refresh_popular_posts
+from .feeds import invalidate_feeds
+from .models import Blog, BlogCategory, Comment
+from .neighbours import invalidate_neighbours, refresh_neighbours
+from .similarity import SOURCE_FIELDS, forget, queue_update
+
+
+@receiver(post_delete, sender=Blog)
+def blog_changed(sender, instance, **kwargs):
+    # Publishing, unpublishing or deleting a post can change the popular list
+    # and the prev/next/related records of other posts.
+    invalidate_neighbours()
+    invalidate_feeds()
+    transaction.on_commit(refresh_popular_posts)
+
+
+@receiver(pre_delete, sender=Blog)
+def blog_deleting(sender, instance, **kwargs):
+    forget(instance.pk)
+
+
+@receiver(post_save, sender=Blog)
+def blog_saved(sender, instance, update_fields=None, **kwargs):
+    blog_changed(sender, instance, **kwargs)
+    if update_fields is None or SOURCE_FIELDS & set(update_fields):
+        transaction.on_commit(lambda: queue_update([instance.pk]))
+    if instance.is_published:
+        transaction.on_commit(lambda: refresh_neighbours(instance))
+
+
+@receiver(m2m_changed, sender=Blog.categories.through)
+def blog_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_neighbours()
+        invalidate_feeds()
+        blog_ids = list(pk_set or []) if reverse else [instance.pk]
+        if blog_ids:
+            transaction.on_commit(lambda: queue_update(blog_ids))
+
+
+@receiver(post_save, sender=BlogCategory)
+@receiver(post_delete, sender=BlogCategory)
+def blog_category_changed(sender, instance, **kwargs):
+    # Category names appear in feed titles and items.
+    invalidate_feeds()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    blog_id = instance.blog_id
+    transaction.on_commit(lambda: comments_changed([blog_id]))
@@ -0,0 +1,320 @@
+"""
+Content-similarity engine behind the "You May Also Like" section.
+
+Every published post is turned into a sparse TF-IDF vector over its title,
+excerpt, content and SEO keywords. Similarity is the cosine of two vectors
+blended with the Jaccard overlap of their categories, and the best
+``TOP_N`` neighbours per post are stored in RelatedPost so request time
+only needs one indexed lookup.
+
+The vectors are stored too: PostTerm holds each post's normalized term
+weights (an inverted index on term) and SimilarityTerm the document
+frequency of every term. A saved post is re-tokenized on its own, its
+vector rewritten against the stored frequencies, and scored by reading
+the postings of its terms, so only posts sharing a term or a category are
+touched. Saves only queue the post (``queue_update``); the update runs on
+a core.background thread. Untouched vectors keep the IDF they were
+written with until ``rebuild_all`` (the rebuild_related_posts command)
+recomputes the archive.
+"""
+import math
+import threading
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from core import background
+from core.pagecache import purge
+from core.text import tokenize
+from .models import Blog, PostTerm, RelatedPost, SimilarityTerm
+
+TOP_N = 6
+CATEGORY_WEIGHT = 0.3
+MAX_TERM_LENGTH = 64
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'meta_keywords': 2.0,
+    'excerpt': 1.5,
+    'content': 1.0,
+}
+# Saving only these fields can change a post's neighbours.
+SOURCE_FIELDS = {'is_published', *FIELD_WEIGHTS}
+
+_stale = set()
+_lock = threading.Lock()
+
+
+def term_counts(fields):
+    """Field-weighted term frequencies of a post's values() row."""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(fields.get(field)):
+            counts[token[:MAX_TERM_LENGTH]] += weight
+    return counts
+
+
+def idf(document_count, total):
+    return math.log((1 + total) / (1 + document_count)) + 1
+
+
+def vector(counts, document_counts, total):
+    """Unit-length TF-IDF vector of ``counts``."""
+    weights = {term: (1 + math.log(tf)) * idf(document_counts.get(term, 0), total) for term, tf in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    return {term: weight / norm for term, weight in weights.items()}
+
+
+def blend(cosine, own_categories, other_categories):
+    union = own_categories | other_categories
+    jaccard = len(own_categories & other_categories) / len(union) if union else 0.0
+    return (1 - CATEGORY_WEIGHT) * cosine + CATEGORY_WEIGHT * jaccard
+
+
+def _rank(scores, n=TOP_N):
+    return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:n]
+
+
+class SimilarityModel:
+    """TF-IDF vectors and category sets for the whole published archive, for ``rebuild_all``."""
+
+    def __init__(self, documents, categories):
+        self.categories = categories
+        counts = {doc_id: term_counts(fields) for doc_id, fields in documents.items()}
+        self.document_frequency = Counter()
+        for terms in counts.values():
+            self.document_frequency.update(terms.keys())
+
+        total = len(documents)
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for doc_id, terms in counts.items():
+            self.vectors[doc_id] = vector(terms, self.document_frequency, total)
+            for term, weight in self.vectors[doc_id].items():
+                self.postings[term].append((doc_id, weight))
+
+        self.category_members = defaultdict(set)
+        for doc_id, category_ids in categories.items():
+            for category_id in category_ids:
+                self.category_members[category_id].add(doc_id)
+
+    @classmethod
+    def load(cls):
+        documents = {
+            row['id']: row for row in
+            Blog.objects.filter(is_published=True).values('id', 'title', 'excerpt', 'content', 'meta_keywords')
+        }
+        return cls(documents, _categories(documents))
+
+    def scores(self, doc_id):
+        """Blended similarity of ``doc_id`` against every other post with some overlap."""
+        cosine = defaultdict(float)
+        for term, weight in self.vectors.get(doc_id, {}).items():
+            for other_id, other_weight in self.postings[term]:
+                if other_id != doc_id:
+                    cosine[other_id] += weight * other_weight
+
+        own_categories = self.categories.get(doc_id, set())
+        candidates = set(cosine)
+        for category_id in own_categories:
+            candidates |= self.category_members[category_id]
+        candidates.discard(doc_id)
+
+        scores = {}
+        for other_id in candidates:
+            score = blend(cosine.get(other_id, 0.0), own_categories, self.categories.get(other_id, set()))
+            if score > 0:
+                scores[other_id] = score
+        return scores
+
+    def top(self, doc_id, n=TOP_N):
+        return _rank(self.scores(doc_id), n)
+
+
+def _categories(blog_ids):
+    categories = defaultdict(set)
+    rows = Blog.categories.through.objects.filter(blog_id__in=list(blog_ids)).values_list('blog_id', 'blogcategory_id')
+    for blog_id, category_id in rows:
+        categories[blog_id].add(category_id)
+    return categories
+
+
+def _write(neighbours):
+    """Replace the stored neighbour rows of the given posts."""
+    with transaction.atomic():
+        RelatedPost.objects.filter(blog_id__in=list(neighbours)).delete()
+        RelatedPost.objects.bulk_create([
+            RelatedPost(blog_id=doc_id, related_id=related_id, score=score, rank=rank)
+            for doc_id, ranked in neighbours.items()
+            for rank, (related_id, score) in enumerate(ranked)
+        ], batch_size=1000)
+    # Cached detail pages embed the related list.
+    from .neighbours import invalidate_neighbours
+    invalidate_neighbours()
+    transaction.on_commit(lambda: purge('blog'))
+
+
+def rebuild_all():
+    """Recompute vectors, frequencies and neighbours for the whole archive. Returns the number of posts processed."""
+    model = SimilarityModel.load()
+    neighbours = {doc_id: model.top(doc_id) for doc_id in model.vectors}
+    with transaction.atomic():
+        SimilarityTerm.objects.all().delete()
+        SimilarityTerm.objects.bulk_create(
+            [SimilarityTerm(term=term, document_count=count) for term, count in model.document_frequency.items()],
+            batch_size=2000,
+        )
+        PostTerm.objects.all().delete()
+        PostTerm.objects.bulk_create(
+            (PostTerm(blog_id=doc_id, term=term, weight=weight)
+             for doc_id, weights in model.vectors.items() for term, weight in weights.items()),
+            batch_size=2000,
+        )
+        RelatedPost.objects.exclude(blog_id__in=list(neighbours)).delete()
+        _write(neighbours)
+    return len(neighbours)
+
+
+def _apply_document_counts(deltas):
+    """Apply {term: change} to SimilarityTerm, one UPDATE per distinct change."""
+    SimilarityTerm.objects.bulk_create(
+        [SimilarityTerm(term=term) for term, delta in deltas.items() if delta > 0], ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for term, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(term)
+    for delta, terms in by_delta.items():
+        SimilarityTerm.objects.filter(term__in=terms).update(document_count=F('document_count') + delta)
+
+
+def _reindex(blog_ids):
+    """Rewrite the stored vectors of ``blog_ids``; returns {id: vector} of the published ones."""
+    documents = {
+        row['id']: row for row in
+        Blog.objects.filter(pk__in=blog_ids, is_published=True).values('id', 'title', 'excerpt', 'content', 'meta_keywords')
+    }
+    counts = {doc_id: term_counts(fields) for doc_id, fields in documents.items()}
+    deltas = Counter()
+    for term in PostTerm.objects.filter(blog_id__in=blog_ids).values_list('term', flat=True):
+        deltas[term] -= 1
+    for terms in counts.values():
+        deltas.update(terms.keys())
+    PostTerm.objects.filter(blog_id__in=blog_ids).delete()
+    _apply_document_counts(deltas)
+
+    terms = {term for doc_terms in counts.values() for term in doc_terms}
+    document_counts = dict(SimilarityTerm.objects.filter(term__in=terms).values_list('term', 'document_count'))
+    total = Blog.objects.filter(is_published=True).count()
+    vectors = {doc_id: vector(doc_terms, document_counts, total) for doc_id, doc_terms in counts.items()}
+    PostTerm.objects.bulk_create([
+        PostTerm(blog_id=doc_id, term=term, weight=weight)
+        for doc_id, weights in vectors.items() for term, weight in weights.items()
+    ], batch_size=2000)
+    return vectors
+
+
+def _scores(doc_id, weights, own_categories):
+    """Blended similarity of one post against every stored post sharing a term or a category."""
+    cosine = defaultdict(float)
+    postings = PostTerm.objects.filter(term__in=list(weights)).exclude(blog_id=doc_id)
+    for other_id, term, other_weight in postings.values_list('blog_id', 'term', 'weight'):
+        cosine[other_id] += weights[term] * other_weight
+    candidates = set(cosine)
+    if own_categories:
+        candidates.update(Blog.categories.through.objects
+            .filter(blogcategory_id__in=own_categories, blog__is_published=True)
+            .exclude(blog_id=doc_id)
+            .values_list('blog_id', flat=True))
+    categories = _categories(candidates)
+    scores = {}
+    for other_id in candidates:
+        score = blend(cosine.get(other_id, 0.0), own_categories, categories.get(other_id, set()))
+        if score > 0:
+            scores[other_id] = score
+    return scores
+
+
+def _stored_top(doc_id):
+    """Full neighbour list of an untouched post from its stored vector."""
+    weights = dict(PostTerm.objects.filter(blog_id=doc_id).values_list('term', 'weight'))
+    return _rank(_scores(doc_id, weights, _categories([doc_id]).get(doc_id, set())))
+
+
+def update_for(blog_ids):
+    """
+    Incrementally refresh vectors and neighbours after ``blog_ids`` changed.
+
+    The touched posts are re-vectorized and recomputed in full. Another
+    post only changes if a touched post enters, moves within or leaves its
+    top-N list; those lists are patched in place, and recomputed from the
+    stored vectors only when a touched post dropped out of a full list and
+    a replacement has to be found.
+    """
+    touched = set(blog_ids)
+    with transaction.atomic():
+        vectors = _reindex(touched)
+        categories = _categories(vectors)
+        touched_scores = {doc_id: _scores(doc_id, weights, categories.get(doc_id, set()))
+                          for doc_id, weights in vectors.items()}
+        neighbours = {doc_id: _rank(scores) for doc_id, scores in touched_scores.items()}
+
+        affected = {other_id for scores in touched_scores.values() for other_id in scores}
+        affected.update(RelatedPost.objects.filter(related_id__in=touched).values_list('blog_id', flat=True))
+        affected -= touched
+        stored = defaultdict(list)
+        for row in RelatedPost.objects.filter(blog_id__in=affected).values('blog_id', 'related_id', 'score').order_by('blog_id', 'rank'):
+            stored[row['blog_id']].append((row['related_id'], row['score']))
+
+        for doc_id in affected:
+            current = stored.get(doc_id, [])
+            ranked = [(related_id, score) for related_id, score in current if related_id not in touched]
+            changed = len(ranked) != len(current)
+            for touched_id, scores in touched_scores.items():
+                score = scores.get(doc_id)
+                if score and (len(ranked) < TOP_N or score > ranked[-1][1]):
+                    ranked.append((touched_id, score))
+                    ranked.sort(key=lambda item: (-item[1], -item[0]))
+                    ranked = ranked[:TOP_N]
+                    changed = True
+            if not changed:
+                continue
+            if len(current) == TOP_N and len(ranked) < TOP_N:
+                ranked = _stored_top(doc_id)
+            neighbours[doc_id] = ranked
+
+        unpublished = touched - set(vectors)
+        if unpublished:
+            RelatedPost.objects.filter(blog_id__in=unpublished).delete()
+        if neighbours:
+            _write(neighbours)
+    return len(neighbours)
+
+
+def forget(blog_id):
+    """
+    Drop a post that is about to be deleted from the document frequencies,
+    and queue the posts that list it so their lists are refilled.
+    """
+    terms = list(PostTerm.objects.filter(blog_id=blog_id).values_list('term', flat=True))
+    _apply_document_counts(Counter({term: -1 for term in terms}))
+    PostTerm.objects.filter(blog_id=blog_id).delete()
+    listing = set(RelatedPost.objects.filter(related_id=blog_id).values_list('blog_id', flat=True))
+    listing.discard(blog_id)
+    if listing:
+        transaction.on_commit(lambda: queue_update(listing))
+
+
+def _update_stale():
+    with _lock:
+        blog_ids = set(_stale)
+        _stale.clear()
+    if blog_ids:
+        update_for(blog_ids)
+
+
+def queue_update(blog_ids):
+    """Refresh ``blog_ids``' vectors and neighbours on a background thread."""
+    with _lock:
+        _stale.update(blog_ids)
+    background.schedule('blog.similarity', _update_stale)
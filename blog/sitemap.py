@@ -1,15 +0,0 @@
-from django.contrib.sitemaps import Sitemap
-from .models import Blog
-
-class BlogSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.8
-
-    def items(self):
-        return Blog.objects.filter(is_published=True)
-
-    def lastmod(self, obj):
-        return obj.updated_at if hasattr(obj, 'updated_at') else obj.created_at
-
-    def location(self, obj):
-        return f"/blogs/{obj.slug}/"
@@ -0,0 +1,378 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.cloning import clone_objects
+from core.testing import without_page_cache
+from users.models import User
+from . import counters
+from . import similarity
+from .comments import load_comments
+from .models import MAX_COMMENT_DEPTH, Blog, BlogCategory, Comment, PostTerm, RelatedPost, SimilarityTerm
+
+
+@without_page_cache
+class BlogDetailQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author', email='author@example.com', password='x')
+        category = BlogCategory.objects.create(name='Recipes')
+        self.posts = []
+        for i in range(5):
+            post = Blog.objects.create(
+                title=f'Post {i}',
+                slug=f'post-{i}',
+                content='<p>Wood-fired baking.</p>',
+                is_published=True,
+                author=author,
+            )
+            post.categories.add(category)
+            self.posts.append(post)
+
+    @mock.patch('blog.counters.FLUSH_INTERVAL', 3600)
+    @mock.patch('blog.counters.FLUSH_THRESHOLD', 10 ** 6)
+    def test_detail_query_count(self):
+        url = f'/blogs/{self.posts[2].slug}/'
+        # The first hit fills the neighbour, comment and popular post caches.
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['prev_blog']['slug'], 'post-1')
+        self.assertEqual(response.context['next_blog']['slug'], 'post-3')
+        self.assertEqual(len(response.context['related_posts']), 3)
+
+    def test_related_and_popular_cards_link_images_once(self):
+        for post in self.posts:
+            Blog.objects.filter(pk=post.pk).update(featured_image=f'blog/{post.slug}.jpg')
+        cache.clear()
+        response = self.client.get(f'/blogs/{self.posts[2].slug}/')
+        self.assertContains(response, f'src="{settings.MEDIA_URL}blog/post-0.jpg"')
+        self.assertNotContains(response, f'{settings.MEDIA_URL}{settings.MEDIA_URL.lstrip("/")}')
+
+    def test_neighbours_refresh_on_publish(self):
+        url = f'/blogs/{self.posts[2].slug}/'
+        self.client.get(url)
+        self.posts[3].is_published = False
+        self.posts[3].save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['next_blog']['slug'], 'post-4')
+
+
+class ViewCounterTests(TestCase):
+    @mock.patch('blog.counters.FLUSH_INTERVAL', 3600)
+    @mock.patch('blog.counters.FLUSH_THRESHOLD', 3)
+    def test_views_are_buffered_until_a_flush_is_due(self):
+        counters._pending.clear()
+        cache.clear()
+        quiet = Blog.objects.create(title='Quiet', slug='quiet', content='<p>x</p>', is_published=True)
+        busy = Blog.objects.create(title='Busy', slug='busy', content='<p>x</p>', is_published=True)
+        with self.assertNumQueries(0):
+            counters.record_view(busy.pk)
+            counters.record_view(quiet.pk)
+        self.assertEqual(Blog.objects.get(pk=busy.pk).views, 0)
+
+        # The third view makes the flush due; the test runner runs it inline.
+        counters.record_view(busy.pk)
+        self.assertEqual(dict(Blog.objects.values_list('slug', 'views')), {'busy': 2, 'quiet': 1})
+        self.assertEqual([post['slug'] for post in cache.get(counters.POPULAR_POSTS_CACHE_KEY)], ['busy', 'quiet'])
+        self.assertEqual(counters.flush_views(), 0)
+
+
+class RelatedPostTests(TestCase):
+    TOPICS = {
+        'dough': 'Pizza dough hydration and pizza dough fermentation',
+        'sauce': 'Pizza sauce with san marzano tomatoes for pizza',
+        'sourdough': 'Sourdough bread starter and bread crust',
+        'loaf': 'Bread loaf crust and sourdough crumb',
+        'steak': 'Grill steak over oak embers',
+    }
+
+    def setUp(self):
+        similarity._stale.clear()
+        self.posts = {
+            slug: Blog.objects.create(title=slug.title(), slug=slug, content=f'<p>{text}</p>', is_published=True)
+            for slug, text in self.TOPICS.items()
+        }
+        similarity.rebuild_all()
+
+    def related(self, slug):
+        return [Blog.objects.get(pk=pk).slug for pk in
+                RelatedPost.objects.filter(blog=self.posts[slug]).values_list('related_id', flat=True)]
+
+    def test_save_updates_only_the_post_and_its_neighbours(self):
+        self.assertEqual(self.related('dough')[0], 'sauce')
+        self.assertEqual(SimilarityTerm.objects.get(term='pizza').document_count, 2)
+
+        steak = self.posts['steak']
+        steak.content = '<p>Grill steak then a pizza with sourdough crust</p>'
+        with mock.patch('blog.similarity.term_counts', wraps=similarity.term_counts) as counted, \
+                self.captureOnCommitCallbacks(execute=True):
+            steak.save()
+        # Only the saved post is tokenized; the archive is read from the stored vectors.
+        self.assertEqual(counted.call_count, 1)
+        self.assertEqual(SimilarityTerm.objects.get(term='pizza').document_count, 3)
+        self.assertIn('steak', self.related('sauce'))
+        self.assertEqual(set(self.related('steak')), {'dough', 'sauce', 'sourdough', 'loaf'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            steak.is_published = False
+            steak.save()
+        self.assertNotIn('steak', self.related('sauce'))
+        self.assertFalse(PostTerm.objects.filter(blog=steak).exists())
+        self.assertEqual(SimilarityTerm.objects.get(term='pizza').document_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts['sauce'].delete()
+        self.assertEqual(SimilarityTerm.objects.get(term='pizza').document_count, 1)
+        self.assertNotIn('sauce', self.related('dough'))
+
+    @override_settings(BACKGROUND_WORKERS=1)
+    def test_save_leaves_the_update_to_a_background_thread(self):
+        post = self.posts['loaf']
+        post.title = 'Rye loaf'
+        with mock.patch('core.background.schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save()
+            queued = [call for call in schedule.call_args_list if call.args[0] == 'blog.similarity']
+            self.assertEqual(queued, [mock.call('blog.similarity', similarity._update_stale)])
+            self.assertFalse(PostTerm.objects.filter(blog=post, term='rye').exists())
+            schedule.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save(update_fields=['views'])
+            self.assertNotIn('blog.similarity', [call.args[0] for call in schedule.call_args_list])
+
+
+class BlogRenderingTests(TestCase):
+    def test_content_rendered_on_save(self):
+        post = Blog.objects.create(
+            title='Rendered',
+            slug='rendered',
+            content='<h2>Dough</h2><p>Mix <b>flour</b><script>alert(1)</script></p>'
+                    '<h2>Dough</h2><a href="javascript:alert(1)" onclick="x">link</a>',
+            is_published=True,
+        )
+        self.assertEqual(
+            post.content_html,
+            '<h2 id="dough">Dough</h2><p>Mix <b>flour</b></p><h2 id="dough-2">Dough</h2><a>link</a>',
+        )
+        self.assertEqual([entry['id'] for entry in post.toc], ['dough', 'dough-2'])
+        self.assertEqual(post.word_count, 5)
+        self.assertEqual(post.reading_time, 1)
+        self.assertEqual(post.plain_excerpt, 'Dough Mix flour Dough link')
+
+    def test_partial_save_rerenders(self):
+        post = Blog.objects.create(title='Partial', slug='partial', content='<p>one</p>')
+        post.content = '<p>one two three</p>'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 3)
+
+
+@without_page_cache
+class BlogListPaginationTests(TestCase):
+    def setUp(self):
+        for i in range(30):
+            Blog.objects.create(title=f'Post {i}', slug=f'list-{i}', content='<p>Body</p>', is_published=True)
+
+    def test_cursor_walks_every_post_once(self):
+        seen = []
+        cursor = ''
+        while True:
+            with self.assertNumQueries(2):
+                data = self.client.get('/blogs/', {'format': 'json', 'cursor': cursor}).json()
+            seen += [post['url'] for post in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+        self.assertEqual(seen[0], '/blogs/list-29/')
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/blogs/', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='x')
+        self.post = Blog.objects.create(
+            title='Cached', slug='cached', content='<p>Body</p>', is_published=True, author=self.author,
+        )
+
+    def test_anonymous_hits_and_purge(self):
+        url = '/blogs/cached/'
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertIn('Cookie', response['Vary'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed'
+            self.post.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Renamed')
+
+    def test_admin_publishing_purges_the_listing(self):
+        draft = Blog.objects.create(title='Fresh draft', slug='fresh', content='<p>x</p>', author=self.author)
+        self.client.get('/blogs/')
+        response = self.client.get('/blogs/')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertNotContains(response, 'Fresh draft')
+
+        admin = Client()
+        admin.force_login(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.post(reverse('custom_admin:blog_blog_changelist'),
+                       {'action': 'make_published', '_selected_action': [draft.pk]})
+        response = self.client.get('/blogs/')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Fresh draft')
+
+    def test_signed_in_users_bypass_cache(self):
+        self.client.get('/blogs/cached/')
+        self.client.force_login(self.author)
+        self.assertFalse(self.client.get('/blogs/cached/').has_header('X-Page-Cache'))
+
+    def test_cached_pages_set_the_csrf_cookie_and_messages_bypass_them(self):
+        first = self.client.get('/blogs/cached/')
+        self.assertIn(settings.CSRF_COOKIE_NAME, first.cookies)
+        visitor = Client()
+        response = visitor.get('/blogs/cached/')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        # The newsletter form's token comes from this cookie.
+        self.assertNotEqual(response.cookies[settings.CSRF_COOKIE_NAME].value,
+                            first.cookies[settings.CSRF_COOKIE_NAME].value)
+
+        visitor.cookies['messages'] = 'pending'
+        self.assertFalse(visitor.get('/blogs/cached/').has_header('X-Page-Cache'))
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='x')
+        self.post = Blog.objects.create(title='Threads', slug='threads', content='<p>Body</p>', is_published=True)
+
+    def comment(self, parent=None, approved=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Comment.objects.create(
+                blog=self.post, user=self.user, parent=parent, content='x', is_approved=approved,
+            )
+
+    def test_tree_loads_in_two_queries(self):
+        first = self.comment()
+        reply = self.comment(first)
+        nested = self.comment(reply)
+        hidden = self.comment(first, approved=False)
+        self.comment(hidden)
+        second = self.comment()
+
+        self.assertEqual(nested.path, f'{first.pk:010d}/{reply.pk:010d}/{nested.pk:010d}/')
+        self.assertEqual(nested.depth, 2)
+        with self.assertNumQueries(2):
+            threads = load_comments(self.post)
+        self.assertEqual([thread.pk for thread in threads], [first.pk, second.pk])
+        self.assertEqual([c.pk for c in threads.threads[0].thread_replies], [reply.pk, nested.pk])
+        # The count matches what is shown: the reply under the hidden comment is left out.
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.approved_comment_count, 4)
+
+    def test_moving_a_reply_moves_its_subtree_and_depth_is_limited(self):
+        first, second = self.comment(), self.comment()
+        reply = self.comment(first)
+        nested = self.comment(reply)
+        with self.captureOnCommitCallbacks(execute=True):
+            reply.parent = second
+            reply.save()
+        nested.refresh_from_db()
+        self.assertEqual(nested.path, f'{second.pk:010d}/{reply.pk:010d}/{nested.pk:010d}/')
+        self.assertEqual([c.pk for c in load_comments(self.post).threads[1].thread_replies], [reply.pk, nested.pk])
+
+        reply.parent = nested
+        with self.assertRaises(ValidationError):
+            reply.full_clean()
+
+        deepest = nested
+        for _ in range(MAX_COMMENT_DEPTH - nested.depth):
+            deepest = self.comment(deepest)
+        self.assertEqual(deepest.depth, MAX_COMMENT_DEPTH)
+        with self.assertRaises(ValidationError) as raised:
+            Comment(blog=self.post, user=self.user, parent=deepest, content='x').full_clean()
+        self.assertEqual(list(raised.exception.message_dict), ['parent'])
+        # Moving a thread must keep its deepest reply within the limit too.
+        first_reply = self.comment(first)
+        reply.parent = first_reply
+        with self.assertRaises(ValidationError):
+            reply.save()
+
+    def test_top_level_pagination(self):
+        roots = [self.comment() for _ in range(3)]
+        page = load_comments(self.post, page=2, per_page=2)
+        self.assertEqual([thread.pk for thread in page], [roots[2].pk])
+        self.assertFalse(page.has_next)
+        self.assertTrue(page.has_previous)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = BlogCategory.objects.create(name='Bread')
+        self.post = Blog.objects.create(title='Sourdough', slug='sourdough', content='<p>Starter</p>', is_published=True)
+        self.post.categories.add(self.category)
+
+    def test_feeds_render(self):
+        self.assertContains(self.client.get('/blogs/feed/rss/'), '/blogs/sourdough/')
+        self.assertContains(self.client.get('/blogs/feed/atom/'), '<feed')
+        self.assertContains(self.client.get('/blogs/category/bread/feed/rss/'), 'OvenCraft Blog: Bread')
+        self.assertEqual(self.client.get('/blogs/category/missing/feed/rss/').status_code, 404)
+
+    def test_conditional_get_skips_database(self):
+        etag = self.client.get('/blogs/feed/rss/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/blogs/feed/rss/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Blog.objects.create(title='Focaccia', slug='focaccia', content='<p>Oil</p>', is_published=True)
+        response = self.client.get('/blogs/feed/rss/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Focaccia')
+
+    def test_admin_actions_invalidate_the_feeds(self):
+        draft = Blog.objects.create(title='Focaccia', slug='focaccia', content='<p>Oil</p>')
+        self.assertNotContains(self.client.get('/blogs/feed/rss/'), 'Focaccia')
+        self.assertNotContains(self.client.get('/blogs/feed/atom/'), 'Focaccia')
+
+        admin = Client()
+        admin.force_login(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+        changelist = reverse('custom_admin:blog_blog_changelist')
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.post(changelist, {'action': 'make_published', '_selected_action': [draft.pk]})
+        self.assertContains(self.client.get('/blogs/feed/rss/'), 'Focaccia')
+        self.assertContains(self.client.get('/blogs/feed/atom/'), 'Focaccia')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.post(changelist, {'action': 'make_draft', '_selected_action': [self.post.pk]})
+        self.assertNotContains(self.client.get('/blogs/feed/rss/'), 'Sourdough')
+
+
+class CloneTests(TestCase):
+    def test_clone_allocates_unique_slugs_and_copies_categories(self):
+        category = BlogCategory.objects.create(name='Pizza')
+        post = Blog.objects.create(title='Margherita', slug='margherita', content='<p>Basil</p>', is_published=True)
+        post.categories.add(category)
+        Blog.objects.create(title='Taken', slug='margherita-copy', content='<p>x</p>')
+
+        first = clone_objects(Blog.objects.filter(pk=post.pk), {'is_published': False}, slug_field='slug', m2m=['categories'])
+        second = clone_objects(Blog.objects.filter(pk=post.pk), {'is_published': False}, slug_field='slug', m2m=['categories'])
+        self.assertEqual(first[0].slug, 'margherita-copy-2')
+        self.assertEqual(second[0].slug, 'margherita-copy-3')
+        self.assertEqual(list(second[0].categories.all()), [category])
+        self.assertFalse(second[0].is_published)
@@ -1,7 +1,12 @@
 from django.urls import path
+from .feeds import atom_feed, rss_feed
 from .views import index, detail
 
 urlpatterns = [
     path('', index, name='blogs'),
+    path('feed/rss/', rss_feed, name='blog_feed_rss'),
+    path('feed/atom/', atom_feed, name='blog_feed_atom'),
+    path('category/<slug:slug>/feed/rss/', rss_feed, name='blog_category_feed_rss'),
+    path('category/<slug:slug>/feed/atom/', atom_feed, name='blog_category_feed_atom'),
     path('<slug:slug>/', detail, name='blog_detail'),
 ]
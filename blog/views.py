@@ -1,30 +1,96 @@
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
+from core.pagecache import on_cache_hit, page_tags
+from core.pagination import InvalidCursor, keyset_paginate
 from .models import Blog
+from .comments import get_comments
+from .counters import get_popular_posts, record_view
+from .neighbours import get_neighbours
 
+BLOGS_PER_PAGE = 12
+LIST_FIELDS = (
+    'title', 'slug', 'featured_image', 'plain_excerpt', 'reading_time', 'published_at', 'created_at',
+    'author__username', 'author__full_name',
+)
+
+
+def _card_json(blog):
+    return {
+        'title': blog.title,
+        'url': f'/blogs/{blog.slug}/',
+        'image': blog.featured_image.url if blog.featured_image else '',
+        'excerpt': blog.plain_excerpt,
+        'reading_time': blog.reading_time,
+        'published_at': blog.published_at or blog.created_at,
+        'author': (blog.author.full_name or blog.author.username) if blog.author else None,
+        'categories': [{'name': category.name, 'slug': category.slug} for category in blog.categories.all()],
+    }
+
+
+@page_tags('blog')
 def index(request):
-    blogs = Blog.objects.filter(is_published=True).order_by('-created_at')
+    blogs = (Blog.objects
+        .filter(is_published=True)
+        .select_related('author')
+        .prefetch_related('categories')
+        .only(*LIST_FIELDS))
+    try:
+        page = keyset_paginate(blogs, request.GET.get('cursor'), BLOGS_PER_PAGE)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+
+    # Infinite scroll asks for the next page as JSON or as rendered cards.
+    fmt = request.GET.get('format')
+    if fmt == 'json':
+        return JsonResponse({
+            'results': [_card_json(blog) for blog in page],
+            'next_cursor': page.next_cursor,
+        })
+    if fmt == 'html':
+        return JsonResponse({
+            'html': render_to_string('components/blog_cards.html', {'blogs': page}, request=request),
+            'next_cursor': page.next_cursor,
+        })
+
     context = {
-        'blogs': blogs,
+        'blogs': page,
+        'next_cursor': page.next_cursor,
         'title': 'Blogs',
     }
     return render(request, 'blogs.html', context)
 
+@page_tags('blog', 'blog:{slug}')
 def detail(request, slug):
-    blog = get_object_or_404(Blog, slug=slug, is_published=True)
-    # Fetch related posts, popular posts, categories, tags as needed
-    related_posts = Blog.objects.filter(is_published=True).exclude(id=blog.id)[:3]
-    popular_posts = Blog.objects.filter(is_published=True).order_by('-views')[:5]
+    blog = get_object_or_404(
+        Blog.objects.select_related('author').prefetch_related('categories').defer('content'),
+        slug=slug,
+        is_published=True,
+    )
+    # Prev/next/related and popular posts come from precomputed cache records
+    neighbours = get_neighbours(blog)
+    try:
+        comments_page = max(int(request.GET.get('comments_page', 1)), 1)
+    except ValueError:
+        comments_page = 1
+    comments = get_comments(blog, comments_page)
     categories = []  # Add category fetching logic if applicable
     tags = []  # Add tag fetching logic if applicable
-    prev_blog = Blog.objects.filter(is_published=True, created_at__lt=blog.created_at).order_by('-created_at').first()
-    next_blog = Blog.objects.filter(is_published=True, created_at__gt=blog.created_at).order_by('created_at').first()
     context = {
         'blog': blog,
-        'related_posts': related_posts,
-        'popular_posts': popular_posts,
+        'related_posts': neighbours['related'],
+        'popular_posts': get_popular_posts(),
         'categories': categories,
         'tags': tags,
-        'prev_blog': prev_blog,
-        'next_blog': next_blog,
+        'prev_blog': neighbours['prev'],
+        'next_blog': neighbours['next'],
+        'comments': comments,
+        'comment_count': blog.approved_comment_count,
+        'title': blog.title,
+        'current_user': request.user if request.user.is_authenticated else None,
     }
-    return render(request, 'blog_detail.html', context)
+    record_view(blog.id)
+    response = render(request, 'blog_detail.html', context)
+    # Cached copies still count as views.
+    on_cache_hit(response, 'blog.counters.record_view', blog.id)
+    return response
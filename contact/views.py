@@ -1,11 +1,12 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.template.loader import render_to_string
 from django.contrib.admin.views.decorators import staff_member_required
+from django.utils import timezone
 import json
 import re
 from .models import Contact, VisitorTracking, Newsletter
@@ -158,13 +159,12 @@ def contact_detail_ajax(request, contact_id):
 def mark_contact_read(request, contact_id):
     """AJAX view to mark contact as read"""
     try:
-        contact = get_object_or_404(Contact, id=contact_id)
-        contact.is_read = True
-        contact.save()
+        if not Contact.objects.filter(id=contact_id).update(is_read=True, updated_at=timezone.now()):
+            raise Http404('Contact not found')
         
         return JsonResponse({
             'success': True,
-            'message': f'Contact from {contact.name} marked as read'
+            'message': 'Contact marked as read'
         })
     except Exception as e:
         return JsonResponse({
@@ -178,13 +178,12 @@ def mark_contact_read(request, contact_id):
 def mark_contact_unread(request, contact_id):
     """AJAX view to mark contact as unread"""
     try:
-        contact = get_object_or_404(Contact, id=contact_id)
-        contact.is_read = False
-        contact.save()
+        if not Contact.objects.filter(id=contact_id).update(is_read=False, updated_at=timezone.now()):
+            raise Http404('Contact not found')
         
         return JsonResponse({
             'success': True,
-            'message': f'Contact from {contact.name} marked as unread'
+            'message': 'Contact marked as unread'
         })
     except Exception as e:
         return JsonResponse({
@@ -3,6 +3,8 @@ from django.utils.html import format_html
 from django.http import HttpResponse
 import csv
 from datetime import datetime
+from adminpanel.bulk import update_rows
+from .cloning import clone_objects, copy_label
 from .models import (
     SiteSettings, HeroSection, Testimonial, Partner, 
     AboutContent, TeamMember, Feature
@@ -84,24 +86,23 @@ class HeroSectionAdmin(admin.ModelAdmin):
 
     def make_active(self, request, queryset):
         # First deactivate all hero sections
-        HeroSection.objects.update(is_active=False)
+        update_rows(HeroSection.objects.exclude(pk__in=queryset.values('pk')), is_active=False)
         # Then activate selected ones
-        updated = queryset.update(is_active=True)
+        updated = update_rows(queryset, is_active=True)
         self.message_user(request, f'{updated} hero sections were successfully activated.')
     make_active.short_description = "Activate selected hero sections"
 
     def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = update_rows(queryset, is_active=False)
         self.message_user(request, f'{updated} hero sections were successfully deactivated.')
     make_inactive.short_description = "Deactivate selected hero sections"
 
     def duplicate_hero_sections(self, request, queryset):
-        for hero in queryset:
-            hero.pk = None
-            hero.title = f"{hero.title} (Copy)"
-            hero.is_active = False
-            hero.save()
-        self.message_user(request, f'{queryset.count()} hero sections were successfully duplicated.')
+        copies = clone_objects(
+            queryset,
+            overrides={'title': lambda hero: copy_label(hero.title, 200), 'is_active': False},
+        )
+        self.message_user(request, f'{len(copies)} hero sections were successfully duplicated.')
     duplicate_hero_sections.short_description = "Duplicate selected hero sections"
 
 @admin.register(Testimonial)
@@ -0,0 +1,64 @@
+"""
+Follow-up work moved off the request path.
+
+Some work triggered by a request, such as writing buffered view counts
+back or rewriting a sitemap shard, doesn't change the response. The caller
+records what needs doing in its own pending state and calls
+``schedule(key, function)``. ``function`` then runs on a background thread
+and drains that state. While it is queued, further calls with the same
+key are dropped. While it runs, they request a single rerun. A burst of
+saves therefore costs one or two runs, not one each.
+
+BACKGROUND_WORKERS sets the number of threads. With 0, ``function`` runs
+in the calling thread, as it does under the test runner.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, RERUN = 'queued', 'running', 'rerun'
+
+_executor = None
+_state = {}
+_lock = threading.Lock()
+
+
+def schedule(key, function):
+    """Run ``function()`` soon on a background thread, once per burst of calls with ``key``."""
+    global _executor
+    workers = getattr(settings, 'BACKGROUND_WORKERS', 1)
+    if not workers:
+        function()
+        return
+    with _lock:
+        state = _state.get(key)
+        if state is not None:
+            if state == RUNNING:
+                _state[key] = RERUN
+            return
+        _state[key] = QUEUED
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='background')
+    _executor.submit(_run, key, function)
+
+
+def _run(key, function):
+    try:
+        while True:
+            with _lock:
+                _state[key] = RUNNING
+            try:
+                function()
+            except Exception:
+                logger.exception('Background task %s failed', key)
+            with _lock:
+                if _state[key] != RERUN:
+                    del _state[key]
+                    return
+    finally:
+        close_old_connections()
@@ -0,0 +1,121 @@
+"""
+Bulk cloning for the admin "duplicate" actions.
+
+``clone_objects`` copies a queryset with bulk_create inside one
+transaction, along with selected many-to-many links and reverse
+foreign-key rows (inline images, specifications...). Unique slugs for the
+copies come from ``allocate_slugs``, which checks a whole batch against
+the table with one prefix query.
+
+bulk_create does not call save() or send signals, so copies should be
+created as drafts (unpublished/inactive); publishing one later goes
+through save() and the usual index/cache updates.
+"""
+import copy
+
+from django.db import transaction
+from django.db.models import Q
+
+# Bases per prefix query; keeps the OR chain well inside SQLite's expression depth limit.
+SLUG_QUERY_BATCH = 200
+# Room kept at the end of a truncated slug for a "-<n>" suffix.
+SLUG_SUFFIX_ROOM = 6
+
+
+def allocate_slugs(model, field, bases):
+    """
+    Return one unused slug per requested base, in order.
+
+    Bases that are taken (in the table or earlier in ``bases``) get "-2",
+    "-3"... appended; everything is cut to the field's max_length.
+    """
+    max_length = model._meta.get_field(field).max_length
+    trimmed = [base[:max_length - SLUG_SUFFIX_ROOM].rstrip('-') for base in bases]
+
+    taken = set()
+    prefixes = sorted(set(trimmed))
+    for start in range(0, len(prefixes), SLUG_QUERY_BATCH):
+        condition = Q()
+        for prefix in prefixes[start:start + SLUG_QUERY_BATCH]:
+            condition |= Q(**{f'{field}__startswith': prefix})
+        taken.update(model._default_manager.filter(condition).values_list(field, flat=True))
+
+    slugs = []
+    for base in trimmed:
+        candidate = base
+        number = 2
+        while candidate in taken:
+            candidate = f'{base}-{number}'
+            number += 1
+        taken.add(candidate)
+        slugs.append(candidate)
+    return slugs
+
+
+def copy_label(text, max_length, suffix=' (Copy)'):
+    """``text`` marked as a copy, shortened to fit ``max_length``."""
+    return f'{text[:max_length - len(suffix)]}{suffix}'
+
+
+def _copy(instance):
+    clone = copy.copy(instance)
+    clone.pk = None
+    clone.__dict__.pop('_prefetched_objects_cache', None)
+    clone._state = copy.copy(instance._state)
+    clone._state.adding = True
+    clone._state.fields_cache = {}
+    return clone
+
+
+def clone_objects(queryset, overrides=None, slug_field=None, slug_suffix='-copy', m2m=(), related=()):
+    """
+    Duplicate every object of ``queryset`` and return the copies.
+
+    ``overrides`` maps field names to values or to callables taking the
+    original. ``m2m`` names many-to-many fields whose links are copied, and
+    ``related`` names reverse foreign keys (related_name) whose rows are
+    copied and pointed at the clone. Issues a fixed number of queries per
+    batch regardless of its size.
+    """
+    overrides = overrides or {}
+    model = queryset.model
+    with transaction.atomic():
+        originals = list(queryset.order_by('pk'))
+        if not originals:
+            return []
+        clones = []
+        for original in originals:
+            clone = _copy(original)
+            for field, value in overrides.items():
+                setattr(clone, field, value(original) if callable(value) else value)
+            clones.append(clone)
+        if slug_field:
+            bases = [f'{getattr(original, slug_field)}{slug_suffix}' for original in originals]
+            for clone, slug in zip(clones, allocate_slugs(model, slug_field, bases)):
+                setattr(clone, slug_field, slug)
+        model._default_manager.bulk_create(clones)
+        new_pk = {original.pk: clone.pk for original, clone in zip(originals, clones)}
+
+        for name in m2m:
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            links = through.objects.filter(**{f'{source}__in': list(new_pk)}).values_list(f'{source}_id', f'{target}_id')
+            through.objects.bulk_create([
+                through(**{f'{source}_id': new_pk[source_id], f'{target}_id': target_id})
+                for source_id, target_id in links
+            ])
+
+        for name in related:
+            relation = model._meta.get_field(name)
+            foreign_key = relation.field.attname
+            rows = list(relation.related_model._default_manager.filter(**{f'{foreign_key}__in': list(new_pk)}).order_by('pk'))
+            copies = []
+            for row in rows:
+                row_copy = _copy(row)
+                setattr(row_copy, foreign_key, new_pk[getattr(row, foreign_key)])
+                copies.append(row_copy)
+            relation.related_model._default_manager.bulk_create(copies)
+
+    return clones
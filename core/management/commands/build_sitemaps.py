@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import sitemaps
+
+
+class Command(BaseCommand):
+    help = "Rebuild every sitemap shard and the sitemap index under SITEMAP_ROOT"
+
+    def handle(self, *args, **options):
+        names = sitemaps.build_all()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(names)} sitemap files to {sitemaps.sitemap_root()}.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from core import renditions
+from core.models import ImageMetadata
+from core.signals import RENDITION_SOURCES
+
+
+class Command(BaseCommand):
+    help = "Generate responsive image renditions and metadata for uploaded images that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render images that already have renditions")
+
+    def handle(self, *args, force=False, **options):
+        sources = []
+        for model, images in RENDITION_SOURCES.items():
+            for instance in model._default_manager.iterator():
+                sources.extend(file.name for file in images(instance) if file)
+        rendered = renditions.generate_renditions(sources, force=force)
+
+        # Rows that share an already processed file (copies, bulk imports) still need its dimensions.
+        filled = 0
+        for model, field, width_field, height_field in renditions.dimension_fields():
+            metadata = ImageMetadata.objects.filter(source=OuterRef(field))
+            filled += model._default_manager.filter(**{f'{width_field}__isnull': True}).exclude(**{field: ''}).update(**{
+                width_field: Subquery(metadata.values('width')[:1]),
+                height_field: Subquery(metadata.values('height')[:1]),
+            })
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {len(rendered)} of {len(sources)} images; filled in dimensions on {filled} rows.'
+        ))
@@ -0,0 +1,90 @@
+import hashlib
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.template.defaultfilters import filesizeformat
+
+from core.models import MediaBlob
+from core.renditions import generate_renditions
+from core.storage import is_blob, managed_fields, media_storage
+
+
+def _locate(name):
+    """Filesystem path of a legacy file value: under MEDIA_ROOT, or a static path left by the old site."""
+    candidates = [os.path.join(settings.MEDIA_ROOT, name)]
+    legacy = name[len(settings.STATIC_URL):] if name.startswith(settings.STATIC_URL) else name
+    candidates += [os.path.join(directory, legacy) for directory in settings.STATICFILES_DIRS]
+    return next((path for path in candidates if os.path.isfile(path)), None)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = "Move existing uploads into content-addressed storage and point their rows at the blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+        parser.add_argument('--delete-originals', action='store_true',
+                            help="Remove migrated files from MEDIA_ROOT (static files are never touched)")
+
+    def handle(self, *args, dry_run=False, delete_originals=False, **options):
+        # legacy file value -> [(model, field, pk), ...]
+        references = defaultdict(list)
+        for model, field in managed_fields():
+            rows = model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            for pk, name in rows.values_list('pk', field).iterator():
+                if not is_blob(name):
+                    references[name].append((model, field, pk))
+
+        migrated = missing = total_bytes = unique_bytes = 0
+        seen = set()
+        originals = []
+        blobs = []
+        for name, rows in references.items():
+            path = _locate(name)
+            if path is None:
+                missing += 1
+                self.stderr.write(f'Missing file for {name!r} ({len(rows)} rows)')
+                continue
+            size = os.path.getsize(path)
+            digest = _sha256(path)
+            total_bytes += size
+            if digest not in seen:
+                seen.add(digest)
+                unique_bytes += size
+            migrated += 1
+            if dry_run:
+                continue
+
+            with transaction.atomic():
+                with open(path, 'rb') as handle:
+                    blob = media_storage.save(os.path.basename(name), File(handle))
+                for model, field, pk in rows:
+                    model._default_manager.filter(pk=pk).update(**{field: blob})
+                # save() counted one reference; every further row shares the blob.
+                MediaBlob.objects.filter(name=blob).update(refcount=F('refcount') + len(rows) - 1)
+            blobs.append(blob)
+            if path.startswith(os.path.join(str(settings.MEDIA_ROOT), '')):
+                originals.append(path)
+
+        # Rows were updated in bulk, so the upload signals did not run.
+        generate_renditions(blobs)
+        if delete_originals and not dry_run:
+            for path in originals:
+                os.remove(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would migrate" if dry_run else "Migrated"} {migrated} files ({filesizeformat(total_bytes)}) '
+            f'into {len(seen)} blobs, {filesizeformat(total_bytes - unique_bytes)} deduplicated; {missing} missing.'
+        ))
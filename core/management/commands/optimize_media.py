@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from core import optimization
+
+
+class Command(BaseCommand):
+    help = "Recompress every image in the media library that changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', type=float, default=optimization.TARGET_SIMILARITY,
+                            help="Minimum SSIM to the original (default %(default)s)")
+
+    def handle(self, *args, target, **options):
+        report = optimization.optimize_files(optimization.media_images(), target=target)
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.optimized} images optimized, {report.unchanged} unchanged, '
+            f'{report.skipped} skipped; {filesizeformat(report.bytes_saved)} saved.'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import video
+from core.models import VideoAsset
+from core.pagecache import purge
+from core.signals import VIDEO_SOURCES
+
+
+class Command(BaseCommand):
+    help = "Extract posters, encode lighter renditions and probe uploaded videos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Reprocess videos that were already processed")
+
+    def handle(self, *args, force=False, **options):
+        if not video.available():
+            raise CommandError("ffmpeg and ffprobe must be on PATH to process videos.")
+        processed = failed = 0
+        for model, (files, audio) in VIDEO_SOURCES.items():
+            for instance in model._default_manager.iterator():
+                for file in files(instance):
+                    if not file or (not force and VideoAsset.objects.filter(source=file.name).exists()):
+                        continue
+                    asset = video.process_video(file.name, audio=audio)
+                    if asset.error:
+                        failed += 1
+                        self.stderr.write(f'{file.name}: {asset.error.strip().splitlines()[-1]}')
+                    else:
+                        processed += 1
+        purge('gallery', 'home')
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} videos, {failed} failed.'))
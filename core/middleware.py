@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+
+from . import pagecache
+
+
+class PageCacheMiddleware:
+    """
+    Serve anonymous GET requests from the full-page cache, see core.pagecache.
+
+    Visitors with a session cookie (signed in) or a messages cookie (flash
+    messages, which the default message storage keeps in a cookie until they
+    outgrow it) always get a freshly rendered page.
+
+    Cached pages carry no CSRF token; their forms copy it from the csrftoken
+    cookie when submitted. Visitors without that cookie get one set along
+    with the cached page, by CsrfViewMiddleware on the way out. Place after
+    CsrfViewMiddleware, AuthenticationMiddleware and MessageMiddleware.
+    """
+
+    BYPASS_COOKIES = (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or any(name in request.COOKIES for name in self.BYPASS_COOKIES):
+            return self.get_response(request)
+
+        response = pagecache.get_cached_response(request)
+        if response is not None:
+            pagecache.count('hits')
+            response['X-Page-Cache'] = 'HIT'
+            self._ensure_csrf_cookie(request)
+            return response
+
+        response = self.get_response(request)
+        if getattr(request, 'vary_on_accept', False):
+            # The page picked image formats from Accept (media_tags.rendition_url).
+            patch_vary_headers(response, ('Accept',))
+        if request.method == 'GET' and pagecache.store_response(request, response):
+            pagecache.count('misses')
+            response['X-Page-Cache'] = 'MISS'
+            # Only after storing: the stored copy must not carry this visitor's cookie.
+            self._ensure_csrf_cookie(request)
+        return response
+
+    @staticmethod
+    def _ensure_csrf_cookie(request):
+        if settings.CSRF_COOKIE_NAME not in request.COOKIES:
+            get_token(request)
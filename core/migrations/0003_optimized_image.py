@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_image_rendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptimizedImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name of the image', max_length=255, unique=True)),
+                ('content_hash', models.CharField(help_text='SHA-256 of the file as last left by the optimizer', max_length=64)),
+                ('original_size', models.PositiveIntegerField()),
+                ('optimized_size', models.PositiveIntegerField()),
+                ('quality', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('optimized_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
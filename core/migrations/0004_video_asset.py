@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_optimized_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Storage name of the original video', max_length=255, unique=True)),
+                ('poster', models.CharField(blank=True, max_length=255)),
+                ('rendition', models.CharField(blank=True, max_length=255)),
+                ('duration', models.FloatField(blank=True, help_text='Seconds', null=True)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
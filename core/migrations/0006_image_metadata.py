@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_media_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Storage name of the original image', max_length=255, unique=True)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('dominant_color', models.CharField(help_text='#rrggbb', max_length=7)),
+                ('placeholder', models.TextField(help_text='Tiny blurred preview as a data: URI')),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='imagerendition',
+            name='metadata',
+            field=models.ForeignObject(from_fields=['source'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.imagemetadata', to_fields=['source']),
+        ),
+    ]
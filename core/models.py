@@ -127,3 +127,76 @@ class Feature(models.Model):
 
     class Meta:
         ordering = ['order', 'title']
+
+class ImageMetadata(models.Model):
+    """Dimensions, dominant colour and placeholder of an uploaded image, see core.renditions."""
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name of the original image")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    dominant_color = models.CharField(max_length=7, help_text="#rrggbb")
+    placeholder = models.TextField(help_text="Tiny blurred preview as a data: URI")
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} {self.width}x{self.height}"
+
+class ImageRendition(models.Model):
+    """A resized copy of an uploaded image, see core.renditions."""
+    source = models.CharField(max_length=255, help_text="Storage name of the original image")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    file = models.CharField(max_length=255, help_text="Storage name of the rendition")
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Joined on source (no column) so a ladder and its metadata load in one query.
+    metadata = models.ForeignObject(
+        ImageMetadata, from_fields=['source'], to_fields=['source'],
+        on_delete=models.DO_NOTHING, null=True, related_name='+',
+    )
+
+    def __str__(self):
+        return f"{self.source} {self.width}w {self.format}"
+
+    class Meta:
+        ordering = ['source', 'format', 'width']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'width', 'format'], name='unique_image_rendition'),
+        ]
+
+class OptimizedImage(models.Model):
+    """What core.optimization last did to a media file, so unchanged files are skipped."""
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the image")
+    content_hash = models.CharField(max_length=64, help_text="SHA-256 of the file as last left by the optimizer")
+    original_size = models.PositiveIntegerField()
+    optimized_size = models.PositiveIntegerField()
+    quality = models.PositiveSmallIntegerField(null=True, blank=True)
+    optimized_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+class VideoAsset(models.Model):
+    """Poster, lighter rendition and probed metadata of an uploaded video, see core.video."""
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name of the original video")
+    poster = models.CharField(max_length=255, blank=True)
+    rendition = models.CharField(max_length=255, blank=True)
+    duration = models.FloatField(null=True, blank=True, help_text="Seconds")
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.source
+
+class MediaBlob(models.Model):
+    """One unique uploaded file in content-addressed storage, see core.storage."""
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name, derived from the hash")
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
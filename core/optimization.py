@@ -0,0 +1,221 @@
+"""
+Lossy recompression of uploaded images.
+
+Each image is re-encoded in the worker pool of core.renditions at the lowest
+quality whose structural similarity (SSIM over 8x8 luma blocks) to the
+original still reaches TARGET_SIMILARITY, found by binary search. EXIF
+orientation is applied and metadata other than the colour profile is
+dropped. PNGs are only recompressed losslessly. The result replaces the
+original only when it is smaller; content-addressed uploads (core.storage)
+are stored as a new blob and every reference is moved to it.
+
+OptimizedImage remembers the hash of every file as the optimizer left it,
+so a file is worked on again only after it has been replaced.
+"""
+import hashlib
+import io
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import OptimizedImage
+from .pagecache import purge
+from .renditions import BATCH_SIZE, RENDITION_ROOT, delete_renditions, generate_renditions, is_image, worker_pool
+from .storage import is_blob, media_storage, repoint
+
+TARGET_SIMILARITY = 0.985
+MIN_QUALITY = 40
+MAX_QUALITY = 95
+# Longest side of the luma copies compared; enough to judge artefacts, cheap to encode.
+COMPARE_SIZE = 512
+SSIM_BLOCK = 8
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+LOSSY_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'WEBP': {'method': 6},
+}
+
+
+class OptimizationReport:
+    def __init__(self):
+        self.optimized = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.bytes_saved = 0
+        self.moved = 0
+
+
+def _luma_statistics(image):
+    """Block means of x, x² for the reference side of an SSIM comparison."""
+    from PIL import Image, ImageMath
+
+    luma = image.convert('L')
+    luma.thumbnail((COMPARE_SIZE, COMPARE_SIZE))
+    luma = luma.convert('F')
+    blocks = (max(1, luma.width // SSIM_BLOCK), max(1, luma.height // SSIM_BLOCK))
+    mean = luma.resize(blocks, Image.BOX)
+    square = ImageMath.lambda_eval(lambda a: a['x'] * a['x'], x=luma).resize(blocks, Image.BOX)
+    return luma, blocks, mean, square
+
+
+def similarity(reference, candidate):
+    """Mean SSIM between a reference from ``_luma_statistics`` and a candidate image."""
+    from PIL import Image, ImageMath, ImageStat
+
+    luma, blocks, mean_x, square_x = reference
+    other = candidate.convert('L').resize(luma.size, Image.BILINEAR).convert('F')
+    mean_y = other.resize(blocks, Image.BOX)
+    square_y = ImageMath.lambda_eval(lambda a: a['y'] * a['y'], y=other).resize(blocks, Image.BOX)
+    product = ImageMath.lambda_eval(lambda a: a['x'] * a['y'], x=luma, y=other).resize(blocks, Image.BOX)
+    ssim = ImageMath.lambda_eval(
+        lambda a: ((a['mx'] * a['my'] * 2 + SSIM_C1) * ((a['xy'] - a['mx'] * a['my']) * 2 + SSIM_C2))
+        / ((a['mx'] * a['mx'] + a['my'] * a['my'] + SSIM_C1)
+           * (a['xx'] - a['mx'] * a['mx'] + a['yy'] - a['my'] * a['my'] + SSIM_C2)),
+        mx=mean_x, my=mean_y, xx=square_x, yy=square_y, xy=product,
+    )
+    return ImageStat.Stat(ssim).mean[0]
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def optimize_bytes(data, target=TARGET_SIMILARITY):
+    """
+    Recompress one image. Runs in a worker process; returns
+    (new bytes or None when nothing smaller was found, quality used).
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    fmt = image.format
+    if fmt not in ('JPEG', 'PNG', 'WEBP') or getattr(image, 'is_animated', False):
+        return None, None
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    extra = {'icc_profile': icc_profile} if icc_profile else {}
+
+    if fmt == 'PNG':
+        encoded, quality = _encode(image, 'PNG', optimize=True, **extra), None
+    else:
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        reference = _luma_statistics(image)
+        options = dict(LOSSY_OPTIONS[fmt], **extra)
+        low, high = MIN_QUALITY, MAX_QUALITY
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = _encode(image, fmt, quality=quality, **options)
+            if similarity(reference, Image.open(io.BytesIO(candidate))) >= target:
+                best = (candidate, quality)
+                high = quality - 1
+            else:
+                low = quality + 1
+        if best is None:
+            return None, None
+        encoded, quality = best
+
+    if len(encoded) >= len(data):
+        return None, quality
+    return encoded, quality
+
+
+def _read(name):
+    try:
+        with default_storage.open(name, 'rb') as handle:
+            return handle.read()
+    except (OSError, ValueError, SuspiciousFileOperation):
+        return None
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _replace(name, data):
+    """Store new content for ``name``; returns the name it now lives under."""
+    if not is_blob(name):
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(data))
+        return name
+    # Content-addressed blobs never change: store a new blob and move the references.
+    new_name = media_storage.save(name, ContentFile(data))
+    repoint(name, new_name)
+    delete_renditions([name])
+    generate_renditions([new_name])
+    return new_name
+
+
+def optimize_files(names, target=TARGET_SIMILARITY):
+    """
+    Optimize the images stored under ``names`` in the worker pool, skipping
+    files unchanged since the optimizer last saw them. Returns an
+    OptimizationReport.
+    """
+    report = OptimizationReport()
+    names = [name for name in dict.fromkeys(map(str, names)) if is_image(name)]
+    pool = worker_pool()
+
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start + BATCH_SIZE]
+        known = dict(OptimizedImage.objects.filter(name__in=batch).values_list('name', 'content_hash'))
+        pending = []
+        for name in batch:
+            data = _read(name)
+            if data is None:
+                report.skipped += 1
+            elif known.get(name) == _digest(data):
+                report.unchanged += 1
+            else:
+                job = pool.submit(optimize_bytes, data, target) if pool else None
+                pending.append((name, data, job))
+
+        records = []
+        for name, data, job in pending:
+            try:
+                optimized, quality = job.result() if job else optimize_bytes(data, target)
+            except Exception:
+                # Undecodable or truncated file: leave it alone.
+                report.skipped += 1
+                continue
+            final = data
+            if optimized is not None:
+                moved = is_blob(name)
+                name = _replace(name, optimized)
+                final = optimized
+                report.optimized += 1
+                report.bytes_saved += len(data) - len(optimized)
+                report.moved += moved
+            else:
+                report.unchanged += 1
+            records.append(OptimizedImage(
+                name=name, content_hash=_digest(final), original_size=len(data),
+                optimized_size=len(final), quality=quality,
+            ))
+        OptimizedImage.objects.bulk_create(
+            records, update_conflicts=True, unique_fields=['name'],
+            update_fields=['content_hash', 'original_size', 'optimized_size', 'quality', 'optimized_at'],
+        )
+    if report.moved:
+        # Cached pages link to the old blobs' URLs.
+        purge('home', 'blog', 'gallery', 'products')
+    return report
+
+
+def media_images(directory=''):
+    """Every image in default storage, generated renditions excluded."""
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        path = f'{directory}/{name}' if directory else name
+        if is_image(path):
+            yield path
+    for name in directories:
+        path = f'{directory}/{name}' if directory else name
+        if path != RENDITION_ROOT:
+            yield from media_images(path)
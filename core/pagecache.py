@@ -0,0 +1,161 @@
+"""
+Full-page cache for anonymous visitors.
+
+Views opt in with ``@page_tags(...)``, naming what their output depends on
+(``'blog'``, ``'blog:{slug}'``...). PageCacheMiddleware stores the rendered
+response of anonymous GETs together with the current version of each tag;
+``purge()`` bumps tag versions, which turns every page carrying the tag
+into a miss without having to know its URL. core.signals purges the right
+tags whenever content models change.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import cc_delim_re, patch_vary_headers
+from django.utils.module_loading import import_string
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+KEY_PREFIX = 'pagecache'
+STATS = ('hits', 'misses')
+
+
+def page_tags(*tags):
+    """
+    Mark a view's responses as cacheable for anonymous visitors.
+
+    Tags may use the view's URL kwargs as format fields, e.g. ``'blog:{slug}'``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            response.page_cache_tags = [tag.format(**kwargs) for tag in tags]
+            # The same URL renders differently for signed-in users.
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapped
+    return decorator
+
+
+def on_cache_hit(response, func, *args):
+    """Have ``func`` (a dotted path) called with ``args`` whenever the cached copy is served."""
+    response.page_cache_replay = getattr(response, 'page_cache_replay', []) + [(func, args)]
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _tag_versions(tags):
+    stored = cache.get_many([_tag_key(tag) for tag in tags])
+    return {tag: stored.get(_tag_key(tag), 1) for tag in tags}
+
+
+def purge(*tags):
+    """Invalidate every cached page carrying any of ``tags``."""
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), 2, None)
+
+
+def _url_hash(request):
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+# Vary header -> the part of its value a page actually depends on, so that
+# e.g. every browser's Accept string does not get a cache entry of its own.
+# Pages vary on Accept only for WebP negotiation (core.templatetags.media_tags).
+VARIANT_NORMALIZERS = {
+    'accept': lambda value: 'webp' if 'image/webp' in value else '',
+}
+
+
+def _variant_key(url_hash, request, vary_headers):
+    """Cache key for the variant of a URL selected by the request headers named in Vary."""
+    variant = hashlib.md5()
+    for header in vary_headers:
+        value = request.META.get('HTTP_' + header.upper().replace('-', '_'), '')
+        if header in VARIANT_NORMALIZERS:
+            value = VARIANT_NORMALIZERS[header](value)
+        variant.update(value.encode())
+        variant.update(b'\0')
+    return f'{KEY_PREFIX}:page:{url_hash}:{variant.hexdigest()}'
+
+
+def _vary_headers(response):
+    # Cookie is handled by only ever serving the cache to visitors without a session.
+    if not response.has_header('Vary'):
+        return []
+    return sorted({
+        header.lower() for header in cc_delim_re.split(response['Vary'])
+        if header and header.lower() != 'cookie'
+    })
+
+
+def get_cached_response(request):
+    """The cached response for ``request``, or None on a miss or stale tags."""
+    url_hash = _url_hash(request)
+    vary_headers = cache.get(f'{KEY_PREFIX}:vary:{url_hash}')
+    if vary_headers is None:
+        return None
+    entry = cache.get(_variant_key(url_hash, request, vary_headers))
+    if entry is None or _tag_versions(entry['tags']) != entry['tags']:
+        return None
+    response = HttpResponse(entry['content'], status=entry['status'], headers=entry['headers'])
+    for func, args in entry['replay']:
+        import_string(func)(*args)
+    return response
+
+
+def store_response(request, response):
+    """Cache ``response`` if its view opted in and it is safe to share. Returns whether it was stored."""
+    tags = getattr(response, 'page_cache_tags', None)
+    if (
+        tags is None
+        or response.status_code != 200
+        or response.streaming
+        or response.cookies
+        # A page with a CSRF token is specific to the visitor it was rendered for.
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        or 'private' in response.get('Cache-Control', '')
+        or 'no-store' in response.get('Cache-Control', '')
+    ):
+        return False
+    url_hash = _url_hash(request)
+    vary_headers = _vary_headers(response)
+    headers = {name: value for name, value in response.items() if name.lower() != 'set-cookie'}
+    cache.set(f'{KEY_PREFIX}:vary:{url_hash}', vary_headers, PAGE_CACHE_TIMEOUT)
+    cache.set(_variant_key(url_hash, request, vary_headers), {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': headers,
+        'tags': _tag_versions(tags),
+        'replay': getattr(response, 'page_cache_replay', []),
+    }, PAGE_CACHE_TIMEOUT)
+    return True
+
+
+def count(stat):
+    key = f'{KEY_PREFIX}:stats:{stat}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    values = cache.get_many([f'{KEY_PREFIX}:stats:{stat}' for stat in STATS])
+    result = {stat: values.get(f'{KEY_PREFIX}:stats:{stat}', 0) for stat in STATS}
+    lookups = result['hits'] + result['misses']
+    result['hit_ratio'] = round(result['hits'] / lookups, 4) if lookups else None
+    return result
+
+
+def reset_stats():
+    cache.delete_many([f'{KEY_PREFIX}:stats:{stat}' for stat in STATS])
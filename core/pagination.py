@@ -0,0 +1,95 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET, each page is fetched with a WHERE clause on the sort
+key of the last row shown, so the cost of a page does not depend on how
+deep into the list it is. The cursor is the sort key encoded as an opaque
+URL-safe token.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _split(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _json_default(value):
+    # Full isoformat: DjangoJSONEncoder drops sub-millisecond precision, which
+    # would make the cursor skip rows.
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(queryset, ordering, cursor):
+    """Turn a cursor back into typed sort-key values for ``queryset``'s model."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    fields = _split(ordering)
+    # Sort keys are never null (a null could not be compared), so encode_cursor never writes one.
+    if not isinstance(values, list) or len(values) != len(fields) or None in values:
+        raise InvalidCursor(cursor)
+    try:
+        return [queryset.model._meta.get_field(name).to_python(value) for (name, _), value in zip(fields, values)]
+    except (ValidationError, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _after(ordering, values):
+    """Q selecting rows strictly after ``values`` in ``ordering``: (a > x) OR (a = x AND b > y) ..."""
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (name, descending), value in zip(_split(ordering), values):
+        condition |= equal & Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_paginate(queryset, cursor=None, per_page=12, ordering=('-created_at', '-id')):
+    """
+    One page of ``queryset`` after ``cursor``, ordered by ``ordering``.
+
+    ``ordering`` must end in a unique field so every row has a distinct key.
+    Raises InvalidCursor for tokens that do not decode.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(queryset, ordering, cursor)))
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, name) for name, _ in _split(ordering)])
+    return KeysetPage(items, next_cursor)
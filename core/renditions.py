@@ -0,0 +1,279 @@
+"""
+Responsive renditions of uploaded images.
+
+Every uploaded image gets a ladder of downscaled copies (RENDITION_WIDTHS,
+never wider than the original) in WebP plus a JPEG fallback, written next
+to the media under ``renditions/`` and recorded in ImageRendition.
+Decoding and encoding run in a process pool: the JPEG decoder is asked to
+downscale while reading (Image.draft), EXIF orientation is applied once, and
+metadata is dropped from the copies.
+
+The same pass records the original's dimensions, dominant colour and a
+tiny WebP placeholder (LQIP) in ImageMetadata, and copies the dimensions to
+``<field>_width``/``<field>_height`` columns next to any file field that has
+them. Those are plain integers filled in here rather than ImageField's
+width_field/height_field, which open the file whenever a row without them
+is loaded.
+
+Templates read renditions and metadata through ``renditions_for`` and
+``image_metadata``, cached together per source, and the ``responsive_image``
+tag in core.templatetags.media_tags.
+"""
+import atexit
+import base64
+import hashlib
+import io
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+
+from .models import ImageMetadata, ImageRendition
+
+RENDITION_WIDTHS = (320, 640, 960, 1280, 1920)
+RENDITION_ROOT = 'renditions'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+# format -> (extension, Pillow save options)
+FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Originals read into memory and handed to the pool at a time.
+BATCH_SIZE = 16
+# Longest side of the placeholder; browsers scale it up smoothly, which blurs it.
+PLACEHOLDER_SIZE = 16
+
+_executor = None
+
+
+def is_image(name):
+    return bool(name) and os.path.splitext(str(name))[1].lower() in IMAGE_EXTENSIONS
+
+
+def _cache_key(source):
+    return f'images:{hashlib.md5(source.encode()).hexdigest()}'
+
+
+def worker_pool():
+    """The shared process pool for image work, or None when IMAGE_RENDITION_WORKERS is 0."""
+    global _executor
+    workers = getattr(settings, 'IMAGE_RENDITION_WORKERS', 2)
+    if not workers:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        atexit.register(_executor.shutdown)
+    return _executor
+
+
+def describe(image, width, height):
+    """{'width', 'height', 'dominant_color', 'placeholder'} for an opaque RGB image."""
+    from PIL import Image
+
+    sample = image.copy()
+    sample.thumbnail((64, 64))
+    palette = sample.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+
+    sample.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    sample.save(buffer, 'WEBP', quality=40)
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def render_ladder(data, widths=RENDITION_WIDTHS):
+    """
+    Encode every rendition of one image. Runs in a worker process, so it
+    takes and returns plain data: (metadata dict from ``describe``, list of
+    (width, height, format, bytes)).
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    if image.getexif().get(0x0112) in (5, 6, 7, 8):
+        # Rotated a quarter turn: the displayed width is the stored height.
+        width, height = height, width
+    original_size = (width, height)
+    target = min(max(widths), width)
+    scale = target / width
+    # Let the JPEG decoder skip detail the largest rendition will not use.
+    requested = (round(image.size[0] * scale), round(image.size[1] * scale))
+    image.draft('RGB', requested)
+    image = ImageOps.exif_transpose(image)
+    width, height = image.size
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    if has_alpha:
+        opaque = Image.new('RGB', image.size, (255, 255, 255))
+        opaque.paste(image, mask=image.getchannel('A'))
+    else:
+        opaque = image
+
+    metadata = describe(opaque, *original_size)
+    results = []
+    ladder = sorted({min(step, width) for step in widths})
+    for step in ladder:
+        size = (step, max(1, round(height * step / width)))
+        for fmt, (_, options) in FORMATS.items():
+            source = image if fmt == 'webp' else opaque
+            resized = source if source.size == size else source.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), **options)
+            results.append((size[0], size[1], fmt, buffer.getvalue()))
+    return metadata, results
+
+
+def _rendition_name(source, width, fmt):
+    stem = os.path.splitext(source)[0]
+    return posixpath.join(RENDITION_ROOT, f'{stem}-{width}w.{FORMATS[fmt][0]}')
+
+
+def _read(source):
+    try:
+        with default_storage.open(source, 'rb') as handle:
+            return handle.read()
+    except (OSError, ValueError, SuspiciousFileOperation):
+        return None
+
+
+def dimension_fields():
+    """(model, file field, width field, height field) for file fields with ``_width``/``_height`` columns."""
+    found = []
+    for model in apps.get_models():
+        names = {field.name for field in model._meta.concrete_fields}
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and {f'{field.name}_width', f'{field.name}_height'} <= names:
+                found.append((model, field.name, f'{field.name}_width', f'{field.name}_height'))
+    return found
+
+
+def _record_dimensions(source, width, height):
+    # queryset.update: no signals, so no second round of rendering.
+    for model, field, width_field, height_field in dimension_fields():
+        model._default_manager.filter(**{field: source}).update(**{width_field: width, height_field: height})
+
+
+def _store(source, metadata, ladder):
+    rows = []
+    for width, height, fmt, data in ladder:
+        name = _rendition_name(source, width, fmt)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        name = default_storage.save(name, ContentFile(data))
+        rows.append(ImageRendition(source=source, width=width, height=height, format=fmt, file=name, size=len(data)))
+    with transaction.atomic():
+        ImageRendition.objects.filter(source=source).delete()
+        ImageRendition.objects.bulk_create(rows)
+        ImageMetadata.objects.update_or_create(source=source, defaults=metadata)
+        _record_dimensions(source, metadata['width'], metadata['height'])
+    cache.delete(_cache_key(source))
+
+
+def generate_renditions(sources, force=False):
+    """
+    Render and store the renditions and metadata of ``sources`` (storage
+    names). Sources already processed are skipped unless ``force``;
+    unreadable files and non-images are ignored. Returns the sources rendered.
+    """
+    sources = [source for source in dict.fromkeys(map(str, sources)) if is_image(source)]
+    if not force:
+        done = set(ImageMetadata.objects.filter(source__in=sources).values_list('source', flat=True))
+        sources = [source for source in sources if source not in done]
+
+    pool = worker_pool()
+    rendered = []
+    for start in range(0, len(sources), BATCH_SIZE):
+        batch = [(source, _read(source)) for source in sources[start:start + BATCH_SIZE]]
+        batch = [(source, data) for source, data in batch if data]
+        if pool:
+            jobs = [(source, pool.submit(render_ladder, data)) for source, data in batch]
+        else:
+            jobs = [(source, None) for source, _ in batch]
+        for (source, job), (_, data) in zip(jobs, batch):
+            try:
+                metadata, ladder = job.result() if job else render_ladder(data)
+            except Exception:
+                # Not a decodable image (or a truncated upload); the original is still served.
+                continue
+            _store(source, metadata, ladder)
+            rendered.append(source)
+    return rendered
+
+
+def delete_renditions(sources):
+    """Remove the rendition files, rows and metadata of ``sources``."""
+    sources = [str(source) for source in sources if source]
+    renditions = ImageRendition.objects.filter(source__in=sources)
+    for name in renditions.values_list('file', flat=True):
+        default_storage.delete(name)
+    renditions.delete()
+    ImageMetadata.objects.filter(source__in=sources).delete()
+    cache.delete_many([_cache_key(source) for source in sources])
+
+
+METADATA_FIELDS = ('width', 'height', 'dominant_color', 'placeholder')
+
+
+def prime(sources):
+    """Load the renditions and metadata of many sources into the cache with at most one query."""
+    sources = [str(source) for source in sources if source]
+    keys = {_cache_key(source): source for source in sources}
+    cached = cache.get_many(list(keys))
+    missing = [source for key, source in keys.items() if key not in cached]
+    if not missing:
+        return
+    entries = {source: ({}, None) for source in missing}
+    rows = (ImageRendition.objects
+        .filter(source__in=missing)
+        .order_by('width')
+        .values_list('source', 'format', 'width', 'height', 'file',
+                     *(f'metadata__{field}' for field in METADATA_FIELDS)))
+    for source, fmt, width, height, name, *metadata in rows:
+        ladder, _ = entries[source]
+        ladder.setdefault(fmt, []).append((width, height, default_storage.url(name)))
+        if metadata[0] is not None:
+            entries[source] = (ladder, dict(zip(METADATA_FIELDS, metadata)))
+    cache.set_many({_cache_key(source): entry for source, entry in entries.items()}, None)
+
+
+def _entry(source):
+    source = str(source or '')
+    if not source:
+        return {}, None
+    key = _cache_key(source)
+    entry = cache.get(key)
+    if entry is None:
+        prime([source])
+        entry = cache.get(key, ({}, None))
+    return entry
+
+
+def renditions_for(source):
+    """
+    {format: [(width, height, url), ...]} for one source, widest last;
+    empty when it has none (yet).
+    """
+    return _entry(source)[0]
+
+
+def image_metadata(source):
+    """
+    {'width', 'height', 'dominant_color', 'placeholder'} of one source's
+    original, or None before it has been processed.
+    """
+    return _entry(source)[1]
@@ -0,0 +1,176 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from about.models import AboutPage
+from blog.models import Blog, BlogCategory
+from faq.models import FAQ, FAQCategory
+from gallery.models import GalleryCategory, GalleryItem, MediaType
+from product.models import Product, ProductCategory, ProductImage, ProductSpecification
+from . import renditions, sitemaps, storage, video
+from .models import AboutContent, HeroSection, Partner, SiteSettings, TeamMember, Testimonial
+from .pagecache import purge
+
+# model -> page cache tags to purge when an instance changes. Blog pages embed
+# prev/next/related/popular posts, so any post change purges every blog page.
+# Comments purge their post's page from blog.comments.comments_changed.
+PURGE_TAGS = {
+    Blog: lambda blog: ('blog', 'home'),
+    BlogCategory: lambda category: ('blog',),
+    GalleryItem: lambda item: ('gallery', 'home'),
+    GalleryCategory: lambda category: ('gallery',),
+    FAQ: lambda faq: ('faq',),
+    FAQCategory: lambda category: ('faq',),
+    Product: lambda product: ('products',),
+    ProductCategory: lambda category: ('products',),
+    ProductImage: lambda image: ('products',),
+    ProductSpecification: lambda spec: ('products',),
+    HeroSection: lambda hero: ('home',),
+}
+
+# model -> sitemap shards to rewrite, as (section, pk) pairs; pk None for single-file sections.
+SITEMAP_SHARDS = {
+    Blog: lambda blog: (('blogs', blog.pk), ('pages', None)),
+    GalleryItem: lambda item: (('pages', None),),
+    FAQ: lambda faq: (('pages', None),),
+    FAQCategory: lambda category: (('pages', None),),
+    Product: lambda product: (('products', product.pk), ('pages', None)),
+    ProductImage: lambda image: (('products', image.product_id),),
+}
+
+
+def _refresh_sitemaps(shards):
+    for section, pk in shards:
+        sitemaps.queue_refresh(section, pk)
+
+
+def _changed(sender, instance, **kwargs):
+    tags = PURGE_TAGS[sender](instance)
+    transaction.on_commit(lambda: purge(*tags))
+    if sender in SITEMAP_SHARDS:
+        shards = SITEMAP_SHARDS[sender](instance)
+        transaction.on_commit(lambda: _refresh_sitemaps(shards))
+
+
+for model in PURGE_TAGS:
+    post_save.connect(_changed, sender=model, dispatch_uid=f'pagecache_save_{model._meta.label_lower}')
+    post_delete.connect(_changed, sender=model, dispatch_uid=f'pagecache_delete_{model._meta.label_lower}')
+
+
+def _blog_categories_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: purge('blog'))
+
+
+m2m_changed.connect(_blog_categories_changed, sender=Blog.categories.through, dispatch_uid='pagecache_blog_categories')
+
+
+# model -> the images on an instance that get responsive renditions and metadata.
+RENDITION_SOURCES = {
+    Blog: lambda blog: [blog.featured_image],
+    GalleryItem: lambda item: ([item.file_path] if item.media_type == MediaType.IMAGE else []) + [item.thumbnail_path],
+    Product: lambda product: [product.main_image],
+    ProductCategory: lambda category: [category.image],
+    ProductImage: lambda image: [image.image],
+    get_user_model(): lambda user: [user.profile_image],
+    HeroSection: lambda hero: [hero.background_image],
+    SiteSettings: lambda site: [site.logo],
+    Testimonial: lambda testimonial: [testimonial.image],
+    Partner: lambda partner: [partner.logo],
+    AboutContent: lambda about: [about.main_image, about.team_image],
+    TeamMember: lambda member: [member.image],
+    AboutPage: lambda page: [page.hero_image, page.story_image, page.team_image],
+}
+
+
+def _image_saved(sender, instance, update_fields=None, **kwargs):
+    files = RENDITION_SOURCES[sender](instance)
+    if update_fields and not any(file.field.name in update_fields for file in files):
+        return
+    sources = [file.name for file in files if file]
+    if sources:
+        transaction.on_commit(lambda: renditions.generate_renditions(sources))
+
+
+def _image_deleted(sender, instance, **kwargs):
+    # A blob may be shared with other rows; _release drops its renditions
+    # once the last reference goes.
+    sources = [file.name for file in RENDITION_SOURCES[sender](instance) if file and not storage.is_blob(file.name)]
+    if sources:
+        transaction.on_commit(lambda: renditions.delete_renditions(sources))
+
+
+for model in RENDITION_SOURCES:
+    post_save.connect(_image_saved, sender=model, dispatch_uid=f'renditions_save_{model._meta.label_lower}')
+    post_delete.connect(_image_deleted, sender=model, dispatch_uid=f'renditions_delete_{model._meta.label_lower}')
+
+
+# model -> (uploaded videos on an instance, whether renditions keep the audio track).
+VIDEO_SOURCES = {
+    GalleryItem: (lambda item: [item.file_path] if item.media_type == MediaType.VIDEO else [], True),
+    HeroSection: (lambda hero: [hero.background_video], False),
+}
+
+
+def _video_saved(sender, instance, update_fields=None, **kwargs):
+    files, audio = VIDEO_SOURCES[sender]
+    files = files(instance)
+    if update_fields and not any(file.field.name in update_fields for file in files):
+        return
+    sources = [file.name for file in files if file]
+    if sources:
+        transaction.on_commit(lambda: video.schedule(sources, audio=audio))
+
+
+def _video_deleted(sender, instance, **kwargs):
+    sources = [file.name for file in VIDEO_SOURCES[sender][0](instance) if file and not storage.is_blob(file.name)]
+    if sources:
+        transaction.on_commit(lambda: video.delete_assets(sources))
+
+
+for model in VIDEO_SOURCES:
+    post_save.connect(_video_saved, sender=model, dispatch_uid=f'video_save_{model._meta.label_lower}')
+    post_delete.connect(_video_deleted, sender=model, dispatch_uid=f'video_delete_{model._meta.label_lower}')
+
+
+# Reference counting for content-addressed uploads (core.storage): a row
+# that is deleted, or whose file is replaced, gives up its blob. The blob's
+# renditions, metadata and video assets go with the last reference.
+CAS_FIELDS = {}
+for model, field in storage.managed_fields():
+    CAS_FIELDS.setdefault(model, []).append(field)
+
+
+def _release(names):
+    removed = storage.release(names)
+    if removed:
+        renditions.delete_renditions(removed)
+        video.delete_assets(removed)
+
+
+def _blob_owner_saving(sender, instance, **kwargs):
+    if instance._state.adding or instance.pk is None:
+        instance._previous_blobs = {}
+        return
+    instance._previous_blobs = sender._default_manager.filter(pk=instance.pk).values(*CAS_FIELDS[sender]).first() or {}
+
+
+def _blob_owner_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_blobs', {})
+    replaced = [name for field, name in previous.items() if name and name != getattr(instance, field).name]
+    if replaced:
+        transaction.on_commit(lambda: _release(replaced))
+
+
+def _blob_owner_deleted(sender, instance, **kwargs):
+    names = [getattr(instance, field).name for field in CAS_FIELDS[sender]]
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: _release(names))
+
+
+for model in CAS_FIELDS:
+    label = model._meta.label_lower
+    pre_save.connect(_blob_owner_saving, sender=model, dispatch_uid=f'cas_presave_{label}')
+    post_save.connect(_blob_owner_saved, sender=model, dispatch_uid=f'cas_save_{label}')
+    post_delete.connect(_blob_owner_deleted, sender=model, dispatch_uid=f'cas_delete_{label}')
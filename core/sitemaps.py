@@ -0,0 +1,288 @@
+"""
+Precomputed sitemaps.
+
+Sitemaps are written to SITEMAP_ROOT as a sitemap index plus one file per
+shard and served from disk, so a crawler never causes an ORM scan.
+Model sections are sharded by primary-key range (SHARD_SIZE ids per
+file), which caps every file at the protocol's 50,000 URLs and lets a
+change to one object rewrite only the shard holding it. manifest.json
+keeps each shard's lastmod so the index is rebuilt without reading shards.
+
+Saves don't write files: ``queue_refresh`` marks their shards stale and a
+core.background thread rewrites them, so a burst of saves (an import, a
+bulk action) rewrites each shard once instead of once per row.
+SITEMAP_ROOT and SITE_URL are read on every call.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Max
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX development machines
+    fcntl = None
+
+from blog.models import Blog
+from faq.models import FAQ, FAQCategory
+from gallery.models import GalleryItem
+from product.models import Product, ProductImage
+from . import background
+
+SHARD_SIZE = 50000
+# Google reads at most 1,000 images per URL.
+MAX_IMAGES_PER_URL = 1000
+INDEX_NAME = 'sitemap.xml'
+MANIFEST_NAME = 'manifest.json'
+SHARD_NAME_RE = re.compile(r'^sitemap-(?P<section>[a-z]+)-(?P<shard>\d+)\.xml$')
+
+_lock = threading.Lock()
+_stale = set()
+_stale_lock = threading.Lock()
+
+
+def sitemap_root():
+    return str(getattr(settings, 'SITEMAP_ROOT', settings.BASE_DIR / 'sitemaps'))
+
+
+def _site_url():
+    return getattr(settings, 'SITE_URL', 'https://ovencraft.in').rstrip('/')
+
+
+def _absolute(url):
+    return url if url.startswith(('http://', 'https://')) else _site_url() + url
+
+
+def _media_url(name):
+    return _absolute(default_storage.url(name)) if name else None
+
+
+def _blog_entries(low, high):
+    posts = (Blog.objects
+        .filter(is_published=True, pk__gte=low, pk__lt=high)
+        .order_by('pk')
+        .values_list('slug', 'updated_at', 'featured_image', 'title'))
+    for slug, updated_at, image, title in posts:
+        images = [(_media_url(image), title)] if image else []
+        yield f'/blogs/{slug}/', updated_at, images
+
+
+def _product_entries(low, high):
+    extra_images = defaultdict(list)
+    rows = (ProductImage.objects
+        .filter(product_id__gte=low, product_id__lt=high, product__is_active=True)
+        .order_by('product_id', '-is_primary', 'pk')
+        .values_list('product_id', 'image', 'alt_text'))
+    for product_id, image, alt_text in rows:
+        extra_images[product_id].append((_media_url(image), alt_text))
+    products = (Product.objects
+        .filter(is_active=True, pk__gte=low, pk__lt=high)
+        .order_by('pk')
+        .values_list('pk', 'slug', 'updated_at', 'main_image', 'name'))
+    for pk, slug, updated_at, image, name in products:
+        images = ([(_media_url(image), name)] if image else []) + extra_images[pk]
+        yield f'/products/{slug}/', updated_at, images[:MAX_IMAGES_PER_URL]
+
+
+def _page_entries():
+    """The fixed pages, with lastmod taken from the content they list where there is any."""
+    blogs = Blog.objects.filter(is_published=True).aggregate(lastmod=Max('updated_at'))['lastmod']
+    products = Product.objects.filter(is_active=True).aggregate(lastmod=Max('updated_at'))['lastmod']
+    faqs = max(filter(None, [
+        FAQ.objects.filter(is_active=True).aggregate(lastmod=Max('updated_at'))['lastmod'],
+        FAQCategory.objects.filter(is_active=True).aggregate(lastmod=Max('updated_at'))['lastmod'],
+    ]), default=None)
+    gallery = list(
+        GalleryItem.objects.filter(is_active=True)
+        .order_by('-created_at')
+        .values_list('file_path', 'thumbnail_path', 'media_type', 'title', 'alt_text', 'updated_at')[:MAX_IMAGES_PER_URL]
+    )
+    gallery_images = [
+        (_media_url(file_path if media_type == 'image' else thumbnail), alt_text or title)
+        for file_path, thumbnail, media_type, title, alt_text, _ in gallery
+        if media_type == 'image' or thumbnail
+    ]
+    gallery_lastmod = max((row[-1] for row in gallery), default=None)
+
+    yield '/', max(filter(None, [blogs, gallery_lastmod]), default=None), []
+    yield '/blogs/', blogs, []
+    yield '/products/', products, []
+    yield '/gallery/', gallery_lastmod, gallery_images
+    yield '/faq/', faqs, []
+    yield '/about/', None, []
+    yield '/contact/', None, []
+    yield '/privacy-policy/', None, []
+
+
+# section -> (model sharded by pk or None for a single file, entry builder)
+SECTIONS = {
+    'pages': (None, _page_entries),
+    'blogs': (Blog, _blog_entries),
+    'products': (Product, _product_entries),
+}
+
+
+def sitemap_path(name):
+    return os.path.join(sitemap_root(), name)
+
+
+def _write_atomic(name, content):
+    os.makedirs(sitemap_root(), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=sitemap_root(), prefix='.tmp-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+        handle.write(content)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, sitemap_path(name))
+
+
+@contextmanager
+def _locked():
+    """Serialise writers, across processes where the platform allows it."""
+    os.makedirs(sitemap_root(), exist_ok=True)
+    with _lock, open(sitemap_path('.lock'), 'w') as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def _read_manifest():
+    try:
+        with open(sitemap_path(MANIFEST_NAME), encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _shard_name(section, shard):
+    return f'sitemap-{section}-{shard}.xml'
+
+
+def _render_urlset(entries):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+        'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">',
+    ]
+    lastmod = None
+    count = 0
+    for loc, modified, images in entries:
+        count += 1
+        lines.append(f'  <url><loc>{escape(_absolute(loc))}</loc>')
+        if modified:
+            lines.append(f'    <lastmod>{modified.isoformat()}</lastmod>')
+            lastmod = max(lastmod, modified) if lastmod else modified
+        for image_url, caption in images:
+            lines.append(f'    <image:image><image:loc>{escape(image_url)}</image:loc>')
+            if caption:
+                lines.append(f'      <image:caption>{escape(caption)}</image:caption>')
+            lines.append('    </image:image>')
+        lines.append('  </url>')
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n', count, lastmod
+
+
+def _build_shard(section, shard, manifest):
+    """Rewrite one shard file (or remove it when empty) and record it in ``manifest``."""
+    model, entries = SECTIONS[section]
+    name = _shard_name(section, shard)
+    if model is None:
+        content, count, lastmod = _render_urlset(entries())
+    else:
+        content, count, lastmod = _render_urlset(entries(shard * SHARD_SIZE, (shard + 1) * SHARD_SIZE))
+    if count:
+        _write_atomic(name, content)
+        manifest[name] = lastmod.isoformat() if lastmod else None
+    else:
+        manifest.pop(name, None)
+        if os.path.exists(sitemap_path(name)):
+            os.remove(sitemap_path(name))
+
+
+def _write_index(manifest):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for name in sorted(manifest):
+        lines.append(f'  <sitemap><loc>{escape(_site_url())}/sitemaps/{name}</loc>')
+        if manifest[name]:
+            lines.append(f'    <lastmod>{manifest[name]}</lastmod>')
+        lines.append('  </sitemap>')
+    lines.append('</sitemapindex>')
+    _write_atomic(MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True))
+    _write_atomic(INDEX_NAME, '\n'.join(lines) + '\n')
+
+
+def _shards(section):
+    model, _ = SECTIONS[section]
+    if model is None:
+        return [0]
+    top = model.objects.aggregate(top=Max('pk'))['top'] or 0
+    return range(top // SHARD_SIZE + 1)
+
+
+def build_all():
+    """Rewrite every shard and the index, dropping files no section produces any more. Returns the shard names."""
+    with _locked():
+        manifest = {}
+        for section in SECTIONS:
+            for shard in _shards(section):
+                _build_shard(section, shard, manifest)
+        for name in os.listdir(sitemap_root()):
+            if SHARD_NAME_RE.match(name) and name not in manifest:
+                os.remove(sitemap_path(name))
+        _write_index(manifest)
+        return sorted(manifest)
+
+
+def _rewrite(targets):
+    """Rewrite the shards of (section, pk) ``targets`` (every shard of a section for pk None) and the index."""
+    if not os.path.exists(sitemap_path(INDEX_NAME)):
+        # Nothing built yet: build everything once instead of lone shards.
+        build_all()
+        return
+    shards = set()
+    for section, pk in targets:
+        if pk is None or SECTIONS[section][0] is None:
+            shards.update((section, shard) for shard in _shards(section))
+        else:
+            shards.add((section, pk // SHARD_SIZE))
+    with _locked():
+        manifest = _read_manifest()
+        for section, shard in sorted(shards):
+            _build_shard(section, shard, manifest)
+        _write_index(manifest)
+
+
+def refresh(section, pk=None):
+    """Rewrite the shard of ``section`` holding ``pk`` (every shard when None) and the index, now."""
+    _rewrite([(section, pk)])
+
+
+def _refresh_stale():
+    with _stale_lock:
+        targets = set(_stale)
+        _stale.clear()
+    if targets:
+        _rewrite(targets)
+
+
+def queue_refresh(section, pk=None):
+    """Like ``refresh``, but on a core.background thread, merged with other queued refreshes."""
+    with _stale_lock:
+        _stale.add((section, pk))
+    background.schedule('core.sitemaps', _refresh_stale)
+
+
+def ensure_built():
+    """Build the sitemaps on first use, e.g. on a fresh deployment."""
+    if not os.path.exists(sitemap_path(INDEX_NAME)):
+        build_all()
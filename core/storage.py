@@ -0,0 +1,155 @@
+"""
+Content-addressed media storage.
+
+Uploads handled by ContentAddressedStorage are hashed (SHA-256) while they
+are streamed to disk and stored once per unique content as
+``cas/ab/cd/<hash><ext>``, whatever name or upload_to they arrived with.
+The hash is part of the URL, so a URL always means the same bytes and can
+be served with a far-future immutable Cache-Control (core.views.media_blob,
+or the front web server for MEDIA_URL/cas/).
+
+MediaBlob counts the references to each blob: a save adds one, and
+``release`` (called from core.signals when a row is deleted or a file field
+changes) drops one. A blob's file is removed when nothing refers to it any
+more; before that the remaining references are recounted, since bulk
+operations (bulk_create, queryset.update) bypass the counting.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CAS_ROOT = 'cas'
+
+
+def blob_name(digest, extension):
+    return posixpath.join(CAS_ROOT, digest[:2], digest[2:4], digest + extension.lower())
+
+
+def is_blob(name):
+    return bool(name) and str(name).startswith(CAS_ROOT + '/')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content; see _save.
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        directory = os.path.join(self.location, CAS_ROOT)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        incoming, owned = None, False
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                # Already on disk (large uploads, assembled chunks): hash it in place and move it.
+                incoming, owned = content.temporary_file_path(), False
+                with open(incoming, 'rb') as handle:
+                    for chunk in iter(lambda: handle.read(1 << 20), b''):
+                        digest.update(chunk)
+                        size += len(chunk)
+            else:
+                fd, incoming = tempfile.mkstemp(dir=directory, prefix='.incoming-')
+                owned = True
+                with os.fdopen(fd, 'wb') as handle:
+                    if hasattr(content, 'seek'):
+                        content.seek(0)
+                    for chunk in content.chunks():
+                        digest.update(chunk)
+                        size += len(chunk)
+                        handle.write(chunk)
+            sha256 = digest.hexdigest()
+            target = blob_name(sha256, os.path.splitext(name)[1])
+
+            with transaction.atomic():
+                blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+                    sha256=sha256, defaults={'name': target, 'size': size},
+                )
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+                path = self.path(blob.name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    file_move_safe(incoming, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+            return blob.name
+        finally:
+            if owned and incoming and os.path.exists(incoming):
+                os.remove(incoming)
+
+    def delete(self, name):
+        if is_blob(name):
+            release([name])
+        else:
+            super().delete(name)
+
+
+media_storage = ContentAddressedStorage()
+
+
+def managed_fields():
+    """(model, field name) of every file field stored in content-addressed storage."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def count_references(name):
+    return sum(model._default_manager.filter(**{field: name}).count() for model, field in managed_fields())
+
+
+def release(names):
+    """Drop one reference to each blob in ``names``; delete blobs nothing refers to and return their names."""
+    from .models import MediaBlob
+
+    removed = []
+    for name in filter(is_blob, names):
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                continue
+            remaining = blob.refcount - 1
+            if remaining <= 0:
+                # Copies made with bulk_create/update were never counted; trust the tables.
+                remaining = count_references(name)
+            if remaining > 0:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=remaining)
+                continue
+            blob.delete()
+            transaction.on_commit(lambda name=name: FileSystemStorage.delete(media_storage, name))
+        removed.append(name)
+    return removed
+
+
+def repoint(old, new):
+    """
+    Point every reference to blob ``old`` at ``new`` (saved with one
+    reference already), moving the reference counts along. Used when a file's
+    content is rewritten, e.g. by core.optimization.
+    """
+    from .models import MediaBlob
+
+    moved = 0
+    for model, field in managed_fields():
+        moved += model._default_manager.filter(**{field: old}).update(**{field: new})
+    if moved > 1:
+        MediaBlob.objects.filter(name=new).update(refcount=F('refcount') + moved - 1)
+    elif moved == 0:
+        release([new])
+    for _ in range(moved):
+        release([old])
+    return moved
@@ -0,0 +1,118 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from core.renditions import image_metadata, renditions_for
+from core.video import video_for
+
+register = template.Library()
+
+
+def _source_url(image):
+    url = getattr(image, 'url', None)
+    return url if url is not None else default_storage.url(str(image))
+
+
+def _placeholder(metadata):
+    """Inline style and onload for an <img>: the LQIP over the dominant colour until the image arrives."""
+    if not metadata:
+        return ''
+    return format_html(
+        ' style="background:{} url({}) center/cover no-repeat" onload="this.style.background=\'\'"',
+        metadata['dominant_color'], metadata['placeholder'],
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """
+    ``<picture>`` for an uploaded image: a WebP srcset with a JPEG srcset as
+    fallback, sized by the widest rendition and painted with the image's
+    placeholder until it loads. Falls back to a plain ``<img>`` of the
+    original while renditions are missing.
+
+        {% responsive_image blog.featured_image alt=blog.title sizes="(min-width: 992px) 33vw, 100vw" %}
+    """
+    if not image:
+        return ''
+    name = getattr(image, 'name', image)
+    ladder = renditions_for(name)
+    if 'jpeg' not in ladder:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+                           _source_url(image), alt, css_class, loading)
+    placeholder = _placeholder(image_metadata(name))
+
+    fallback = ladder['jpeg']
+    width, height, url = fallback[-1]
+    webp = ''
+    if 'webp' in ladder:
+        webp = format_html('<source type="image/webp" srcset="{}" sizes="{}">',
+                           format_html_join(', ', '{} {}w', ((u, w) for w, _, u in ladder['webp'])), sizes)
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="{}" decoding="async"{}></picture>',
+        webp, url, format_html_join(', ', '{} {}w', ((u, w) for w, _, u in fallback)),
+        sizes, width, height, alt, css_class, loading, placeholder,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def rendition_url(context, image, width=1280):
+    """
+    URL of the smallest rendition at least ``width`` wide, for places a
+    single URL is needed (lightboxes, CSS backgrounds). WebP is chosen when
+    the request's Accept header allows it; the response then varies on
+    Accept (see PageCacheMiddleware).
+    """
+    if not image:
+        return ''
+    ladder = renditions_for(getattr(image, 'name', image))
+    request = context.get('request')
+    fmt = 'jpeg'
+    if request is not None and 'webp' in ladder:
+        request.vary_on_accept = True
+        if 'image/webp' in request.META.get('HTTP_ACCEPT', ''):
+            fmt = 'webp'
+    candidates = ladder.get(fmt)
+    if not candidates:
+        return _source_url(image)
+    for candidate_width, _, url in candidates:
+        if candidate_width >= width:
+            return url
+    return candidates[-1][2]
+
+
+@register.simple_tag
+def image_info(image):
+    """
+    Stored metadata of an uploaded image (see core.renditions.image_metadata),
+    or {} before it has been processed:
+
+        {% image_info product.main_image as info %}
+        <div style="aspect-ratio: {{ info.width }} / {{ info.height }}; background: {{ info.dominant_color }}">
+    """
+    if not image:
+        return {}
+    return image_metadata(getattr(image, 'name', image)) or {}
+
+
+@register.simple_tag
+def video_info(video):
+    """
+    Playback details of an uploaded video (see core.video.video_for):
+
+        {% video_info item.file_path as clip %}
+        <button data-video="{{ clip.url }}">{{ clip.duration|duration }}</button>
+    """
+    if not video:
+        return {}
+    return video_for(getattr(video, 'name', video))
+
+
+@register.filter
+def duration(seconds):
+    """Seconds as m:ss (h:mm:ss from an hour)."""
+    if seconds is None or seconds == '':
+        return ''
+    minutes, seconds = divmod(int(round(float(seconds))), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
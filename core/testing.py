@@ -0,0 +1,52 @@
+"""Test helpers shared by the apps' test modules."""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs core.background work inline, so captured on_commit callbacks
+    finish before the assertions, and writes sitemaps to a throwaway
+    SITEMAP_ROOT instead of the real one.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._sitemap_root = tempfile.mkdtemp()
+        self._test_settings = override_settings(BACKGROUND_WORKERS=0, SITEMAP_ROOT=self._sitemap_root)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        shutil.rmtree(self._sitemap_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+# Measure the views themselves rather than full-page cache hits.
+without_page_cache = override_settings(
+    MIDDLEWARE=[m for m in settings.MIDDLEWARE if m != 'core.middleware.PageCacheMiddleware'],
+)
+
+
+class MediaTestCase(TestCase):
+    """
+    A TestCase whose uploads go to a throwaway MEDIA_ROOT and whose image
+    renditions are made inline, so on_commit callbacks captured with
+    ``captureOnCommitCallbacks(execute=True)`` finish before the assertions.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root, IMAGE_RENDITION_WORKERS=0))
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
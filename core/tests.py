@@ -0,0 +1,203 @@
+import io
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.contrib import admin
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from blog.models import Blog
+from faq.admin import FAQAdmin
+from faq.models import FAQ, FAQCategory
+from gallery.models import GalleryItem
+from . import background, sitemaps
+from .admin import HeroSectionAdmin
+from .models import HeroSection, ImageMetadata, ImageRendition, MediaBlob, OptimizedImage
+from .optimization import optimize_files
+from .storage import media_storage
+from .templatetags.media_tags import duration
+from .testing import MediaTestCase
+
+
+class ImagePipelineTests(MediaTestCase):
+    def _jpeg(self, size, orientation=None, quality=75):
+        from PIL import Image
+        image = Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 100).convert('RGB')
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif, quality=quality)
+        return buffer.getvalue()
+
+    def test_upload_renders_ladder_upright(self):
+        # Stored 1200x800 but tagged as rotated a quarter turn: displayed 800x1200.
+        upload = SimpleUploadedFile('oven.jpg', self._jpeg((1200, 800), orientation=6), content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Blog.objects.create(title='Oven', slug='oven', content='<p>x</p>', featured_image=upload)
+
+        renditions = ImageRendition.objects.filter(source=post.featured_image.name)
+        self.assertEqual(
+            sorted(renditions.values_list('format', 'width', 'height')),
+            [(fmt, w, h) for fmt in ('jpeg', 'webp') for w, h in ((320, 480), (640, 960), (800, 1200))],
+        )
+
+        html = Template('{% load media_tags %}{% responsive_image post.featured_image alt="Oven" %}').render(Context({'post': post}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('800w', html)
+        self.assertIn('width="800" height="1200"', html)
+
+    def test_upload_records_metadata_and_dimensions(self):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (900, 300), (200, 40, 20)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('brick.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Blog.objects.create(title='Brick', slug='brick', content='<p>x</p>', featured_image=upload)
+
+        post.refresh_from_db()
+        self.assertEqual((post.featured_image_width, post.featured_image_height), (900, 300))
+        metadata = ImageMetadata.objects.get(source=post.featured_image.name)
+        self.assertEqual(metadata.dominant_color, '#c82814')
+        self.assertTrue(metadata.placeholder.startswith('data:image/webp;base64,'))
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            html = Template('{% load media_tags %}{% responsive_image post.featured_image %}').render(Context({'post': post}))
+        self.assertIn('background:#c82814 url(data:image/webp;base64,', html)
+
+    def test_optimizer_shrinks_once(self):
+        original = self._jpeg((800, 600), quality=100)
+        name = default_storage.save('gallery/dome.jpg', ContentFile(original))
+
+        report = optimize_files([name])
+        self.assertEqual(report.optimized, 1)
+        self.assertEqual(report.bytes_saved, len(original) - default_storage.size(name))
+        self.assertGreater(report.bytes_saved, 0)
+        self.assertEqual(OptimizedImage.objects.get(name=name).optimized_size, default_storage.size(name))
+
+        report = optimize_files([name])
+        self.assertEqual((report.optimized, report.unchanged), (0, 1))
+
+    def test_video_without_ffmpeg_serves_original(self):
+        upload = SimpleUploadedFile('bake.mp4', b'not really a video', content_type='video/mp4')
+        with mock.patch('core.video.available', return_value=False), self.captureOnCommitCallbacks(execute=True):
+            item = GalleryItem.objects.create(title='Bake', media_type='video', file_path=upload)
+        html = Template('{% load media_tags %}{% video_info item.file_path as clip %}{{ clip.url }}|{{ clip.poster }}').render(Context({'item': item}))
+        self.assertEqual(html, f'{item.file_path.url}|')
+        self.assertEqual((duration(75.4), duration(3725)), ('1:15', '1:02:05'))
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def test_identical_uploads_share_one_counted_blob(self):
+        posts = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('first.jpg', 'second-name.jpg'):
+                upload = SimpleUploadedFile(name, b'same bytes', content_type='image/jpeg')
+                posts.append(Blog.objects.create(title=name, slug=name[:5], content='<p>x</p>', featured_image=upload))
+        blob = posts[0].featured_image.name
+        self.assertEqual(posts[1].featured_image.name, blob)
+        self.assertRegex(blob, r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(MediaBlob.objects.get(name=blob).refcount, 2)
+        ImageRendition.objects.create(source=blob, width=480, height=360, format='jpeg', file='renditions/x.jpg', size=1)
+        ImageMetadata.objects.create(source=blob, width=640, height=480)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            posts[0].delete()
+        self.assertTrue(media_storage.exists(blob))
+        # The other post still shows the image, renditions and all.
+        self.assertTrue(ImageRendition.objects.filter(source=blob).exists())
+        self.assertTrue(ImageMetadata.objects.filter(source=blob).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            posts[1].delete()
+        self.assertFalse(media_storage.exists(blob))
+        self.assertFalse(MediaBlob.objects.filter(name=blob).exists())
+        self.assertFalse(ImageRendition.objects.filter(source=blob).exists())
+        self.assertFalse(ImageMetadata.objects.filter(source=blob).exists())
+
+
+class BackgroundTests(SimpleTestCase):
+    @override_settings(BACKGROUND_WORKERS=1)
+    def test_calls_during_a_run_coalesce_into_one_rerun(self):
+        started, release, finished = threading.Event(), threading.Event(), threading.Event()
+        runs = []
+
+        def task():
+            runs.append(threading.current_thread().name)
+            started.set()
+            release.wait(5)
+            if len(runs) == 2:
+                finished.set()
+
+        background.schedule('test', task)
+        self.assertTrue(started.wait(5))
+        for _ in range(5):
+            background.schedule('test', task)
+        release.set()
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(len(runs), 2)
+        self.assertTrue(all(name.startswith('background') for name in runs))
+
+
+@override_settings(SITE_URL='https://example.test')
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.enterContext(override_settings(SITEMAP_ROOT=self.root))
+        sitemaps._stale.clear()
+
+    def test_saves_rewrite_their_shard_and_files_are_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Blog.objects.create(title='Dome', slug='dome', content='<p>x</p>', is_published=True)
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'sitemap-blogs-0.xml')))
+
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response['Content-Type'], 'application/xml; charset=utf-8')
+        self.assertIn(b'<loc>https://example.test/sitemaps/sitemap-blogs-0.xml</loc>', b''.join(response.streaming_content))
+        shard = self.client.get('/sitemaps/sitemap-blogs-0.xml')
+        self.assertIn(b'https://example.test/blogs/dome/', b''.join(shard.streaming_content))
+        self.assertEqual(self.client.get('/sitemaps/sitemap-blogs-0.xml',
+                                         headers={'If-Modified-Since': shard['Last-Modified']}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.is_published = False
+            post.save()
+        self.assertEqual(self.client.get('/sitemaps/sitemap-blogs-0.xml').status_code, 404)
+
+    @override_settings(BACKGROUND_WORKERS=1)
+    def test_a_burst_of_saves_is_written_once_off_the_request(self):
+        with mock.patch('core.background.schedule') as schedule, self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Blog.objects.create(title=f'Post {i}', slug=f'post-{i}', content='<p>x</p>', is_published=True)
+        self.assertIn('core.sitemaps', {call.args[0] for call in schedule.call_args_list})
+        self.assertEqual(os.listdir(self.root), [])
+
+        with mock.patch('core.sitemaps._build_shard', wraps=sitemaps._build_shard) as built:
+            sitemaps._refresh_stale()
+        self.assertIn(b'/blogs/post-2/', open(os.path.join(self.root, 'sitemap-blogs-0.xml'), 'rb').read())
+        self.assertLessEqual(built.call_count, len(sitemaps.SECTIONS))
+
+
+class AdminActionTests(TestCase):
+    def run_action(self, model_admin, action, queryset):
+        request = RequestFactory().post('/')
+        with mock.patch.object(model_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            getattr(model_admin, action)(request, queryset)
+
+    @mock.patch('adminpanel.bulk.purge')
+    def test_actions_on_hero_sections_and_faqs_purge_their_pages(self, purge):
+        shown, hidden = (HeroSection.objects.create(title=title, description='x') for title in ('Shown', 'Hidden'))
+        self.run_action(HeroSectionAdmin(HeroSection, admin.site), 'make_active', HeroSection.objects.filter(pk=hidden.pk))
+        self.assertEqual(list(HeroSection.objects.filter(is_active=True)), [hidden])
+        self.assertIn(mock.call('home'), purge.call_args_list)
+
+        purge.reset_mock()
+        faq = FAQ.objects.create(category=FAQCategory.objects.create(name='Ovens', slug='ovens'), question='Hot?', answer='Yes')
+        self.run_action(FAQAdmin(FAQ, admin.site), 'make_inactive', FAQ.objects.filter(pk=faq.pk))
+        self.assertIn(mock.call('faq'), purge.call_args_list)
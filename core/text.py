@@ -0,0 +1,18 @@
+import re
+
+from django.utils.html import strip_tags
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset("""
+    a an and are as at be but by can for from has have how in is it its of on or our
+    so that the their them then there these they this to was we were what when which
+    who will with you your
+""".split())
+
+
+def tokenize(text, min_length=3):
+    """Lowercase word tokens of ``text`` with HTML and stop words removed."""
+    return [
+        token for token in TOKEN_RE.findall(strip_tags(text or '').lower())
+        if len(token) >= min_length and token not in STOP_WORDS
+    ]
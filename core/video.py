@@ -0,0 +1,208 @@
+"""
+Posters and lighter renditions of uploaded videos.
+
+When ffmpeg/ffprobe are on PATH, every uploaded video is probed for duration
+and dimensions, a poster frame is extracted (and gets image renditions like
+any upload), and an H.264 rendition capped at RENDITION_HEIGHT and
+RENDITION_MAXRATE is encoded with the moov atom up front so playback starts
+before the download ends. Results are recorded in VideoAsset, keyed by the
+source's storage name. Without ffmpeg nothing is recorded and pages keep
+serving the original.
+
+Transcoding takes a while, so uploads are processed by a small background
+thread pool (VIDEO_WORKERS; 0 processes in the calling thread).
+"""
+import atexit
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from .models import VideoAsset
+from .pagecache import purge
+from .renditions import delete_renditions, generate_renditions
+
+VIDEO_ROOT = 'videos/processed'
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.webm', '.ogv', '.avi', '.mkv')
+RENDITION_HEIGHT = 720
+RENDITION_MAXRATE = '1500k'
+# Seconds into the video the poster is taken from (or its middle when shorter).
+POSTER_OFFSET = 1.0
+TIMEOUT = 15 * 60
+
+_executor = None
+
+
+def available():
+    return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+
+
+def is_video(name):
+    return bool(name) and os.path.splitext(str(name))[1].lower() in VIDEO_EXTENSIONS
+
+
+def _cache_key(source):
+    return f'video:{hashlib.md5(source.encode()).hexdigest()}'
+
+
+@contextmanager
+def _local_path(name):
+    """A filesystem path for a stored file, downloading it when the storage is remote."""
+    try:
+        yield default_storage.path(name)
+        return
+    except NotImplementedError:
+        pass
+    suffix = os.path.splitext(name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as handle, default_storage.open(name, 'rb') as source:
+        shutil.copyfileobj(source, handle)
+        handle.flush()
+        yield handle.name
+
+
+def _run(*args):
+    return subprocess.run(args, check=True, capture_output=True, timeout=TIMEOUT)
+
+
+def probe(path):
+    """(duration in seconds, width, height) of a video file."""
+    output = _run(
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path,
+    ).stdout
+    info = json.loads(output)
+    stream = (info.get('streams') or [{}])[0]
+    duration = info.get('format', {}).get('duration')
+    return (float(duration) if duration else None), stream.get('width'), stream.get('height')
+
+
+def _save(name, path):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    with open(path, 'rb') as handle:
+        return default_storage.save(name, File(handle))
+
+
+def process_video(source, audio=True):
+    """Probe ``source`` and store its poster and rendition. Returns the VideoAsset, or None without ffmpeg."""
+    if not available():
+        return None
+    stem = posixpath.join(VIDEO_ROOT, os.path.splitext(source)[0])
+    fields = {'poster': '', 'rendition': '', 'duration': None, 'width': None, 'height': None, 'error': ''}
+    try:
+        with _local_path(source) as path, tempfile.TemporaryDirectory() as workdir:
+            duration, width, height = probe(path)
+            fields.update(duration=duration, width=width, height=height)
+
+            poster = os.path.join(workdir, 'poster.jpg')
+            offset = min(POSTER_OFFSET, duration / 2) if duration else 0
+            _run('ffmpeg', '-y', '-v', 'error', '-ss', f'{offset:.2f}', '-i', path,
+                 '-frames:v', '1', '-q:v', '3', poster)
+            fields['poster'] = _save(f'{stem}-poster.jpg', poster)
+
+            rendition = os.path.join(workdir, 'rendition.mp4')
+            _run('ffmpeg', '-y', '-v', 'error', '-i', path,
+                 '-vf', f"scale=-2:'min({RENDITION_HEIGHT},ih)'",
+                 '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '26',
+                 '-maxrate', RENDITION_MAXRATE, '-bufsize', '3000k', '-pix_fmt', 'yuv420p',
+                 *(('-c:a', 'aac', '-b:a', '96k') if audio else ('-an',)),
+                 '-movflags', '+faststart', rendition)
+            fields['rendition'] = _save(f'{stem}-{RENDITION_HEIGHT}p.mp4', rendition)
+    except (OSError, ValueError, subprocess.SubprocessError) as exc:
+        stderr = getattr(exc, 'stderr', None)
+        fields['error'] = (stderr.decode(errors='replace') if stderr else str(exc))[-2000:]
+
+    asset, _ = VideoAsset.objects.update_or_create(source=source, defaults=fields)
+    cache.delete(_cache_key(source))
+    if asset.poster:
+        generate_renditions([asset.poster], force=True)
+    return asset
+
+
+def _process_all(sources, audio):
+    close_old_connections()
+    try:
+        for source in sources:
+            process_video(source, audio=audio)
+        purge('gallery', 'home')
+    finally:
+        close_old_connections()
+
+
+def schedule(sources, audio=True):
+    """Process ``sources`` that have no VideoAsset yet, in the background."""
+    global _executor
+    sources = [str(source) for source in sources if is_video(source)]
+    done = set(VideoAsset.objects.filter(source__in=sources).values_list('source', flat=True))
+    sources = [source for source in sources if source not in done]
+    if not sources or not available():
+        return
+    workers = getattr(settings, 'VIDEO_WORKERS', 1)
+    if not workers:
+        _process_all(sources, audio)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='video')
+        atexit.register(_executor.shutdown)
+    _executor.submit(_process_all, sources, audio)
+
+
+def delete_assets(sources):
+    assets = VideoAsset.objects.filter(source__in=[str(source) for source in sources])
+    for poster, rendition in assets.values_list('poster', 'rendition'):
+        for name in filter(None, (poster, rendition)):
+            default_storage.delete(name)
+        if poster:
+            delete_renditions([poster])
+    assets.delete()
+    cache.delete_many([_cache_key(str(source)) for source in sources])
+
+
+def _info(source, asset):
+    return {
+        'url': default_storage.url(asset.rendition if asset and asset.rendition else source),
+        'poster': asset.poster if asset else '',
+        'duration': asset.duration if asset else None,
+        'width': asset.width if asset else None,
+        'height': asset.height if asset else None,
+    }
+
+
+def prime(sources):
+    """Load the playback details of many videos into the cache with at most one query."""
+    sources = [str(source) for source in sources if source]
+    keys = {_cache_key(source): source for source in sources}
+    cached = cache.get_many(list(keys))
+    missing = [source for key, source in keys.items() if key not in cached]
+    if not missing:
+        return
+    assets = {asset.source: asset for asset in VideoAsset.objects.filter(source__in=missing)}
+    cache.set_many({_cache_key(source): _info(source, assets.get(source)) for source in missing}, None)
+
+
+def video_for(source):
+    """
+    {'url', 'poster', 'duration', 'width', 'height'} for a video: the
+    rendition's URL when there is one (the original's otherwise) and the
+    poster's storage name. Cached per source.
+    """
+    source = str(source or '')
+    if not source:
+        return {}
+    key = _cache_key(source)
+    info = cache.get(key)
+    if info is None:
+        prime([source])
+        info = cache.get(key) or _info(source, None)
+    return info
@@ -1,19 +1,34 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.static import serve
 from blog.models import Blog
 from gallery.models import GalleryItem
+from . import pagecache, sitemaps, storage
+from .models import HeroSection
+from .pagecache import page_tags
 
+@page_tags('home')
 def index(request):
     recent_posts = Blog.objects.filter(is_published=True).order_by('-created_at')[:3]
     gallery_items = GalleryItem.objects.all().order_by('-created_at')[:6]
+    hero = HeroSection.objects.filter(is_active=True).order_by('-updated_at').first()
 
     return render(request, 'home.html', {
         'title': 'Home',
+        'hero': hero,
         'recent_posts': recent_posts,
         'gallery_items': gallery_items,
         'current_user': request.user if request.user.is_authenticated else None,
         'is_authenticated': request.user.is_authenticated
     })
 
+@page_tags('pages')
 def about(request):
     return render(request, 'about.html', {
         'title': 'About Us',
@@ -21,13 +36,7 @@ def about(request):
         'is_authenticated': request.user.is_authenticated
     })
 
-def products(request):
-    return render(request, 'products.html', {
-        'title': 'Products',
-        'current_user': request.user if request.user.is_authenticated else None,
-        'is_authenticated': request.user.is_authenticated
-    })
-
+@page_tags('faq')
 def faq(request):
     return render(request, 'faq.html', {
         'title': 'FAQ',
@@ -35,6 +44,7 @@ def faq(request):
         'is_authenticated': request.user.is_authenticated
     })
 
+@page_tags('pages')
 def privacy_policy(request):
     return render(request, 'privacy_policy.html', {
         'title': 'Privacy Policy',
@@ -42,9 +52,41 @@ def privacy_policy(request):
         'is_authenticated': request.user.is_authenticated
     })
 
+@page_tags('products')
 def product_details(request):
     return render(request, 'product-details.html', {
         'title': 'Product Details',
         'current_user': request.user if request.user.is_authenticated else None,
         'is_authenticated': request.user.is_authenticated
     })
+
+@staff_member_required
+def page_cache_stats(request):
+    """Page cache hit/miss counters; POST resets them."""
+    if request.method == 'POST':
+        pagecache.reset_stats()
+    return JsonResponse({'success': True, 'stats': pagecache.stats()})
+
+
+def sitemap(request, name=sitemaps.INDEX_NAME):
+    """Serve a prebuilt sitemap file (see core.sitemaps); the web server can serve SITEMAP_ROOT directly instead."""
+    sitemaps.ensure_built()
+    try:
+        handle = open(sitemaps.sitemap_path(name), 'rb')
+    except FileNotFoundError:
+        raise Http404('No such sitemap')
+    last_modified = os.fstat(handle.fileno()).st_mtime
+    response = get_conditional_response(request, last_modified=int(last_modified))
+    if response is not None:
+        handle.close()
+        return response
+    response = FileResponse(handle, content_type='application/xml; charset=utf-8')
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def media_blob(request, path):
+    """Serve a content-addressed upload (see core.storage); its URL never changes meaning, so it may be cached forever."""
+    response = serve(request, f'{storage.CAS_ROOT}/{path}', document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
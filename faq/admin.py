@@ -3,6 +3,8 @@ from django.utils.html import format_html
 from django.http import HttpResponse
 import csv
 from datetime import datetime
+from adminpanel.bulk import apply_bulk_action, update_rows
+from core.cloning import clone_objects, copy_label
 from .models import FAQCategory, FAQ
 
 @admin.register(FAQCategory)
@@ -25,12 +27,12 @@ class FAQCategoryAdmin(admin.ModelAdmin):
     preview_link.short_description = "Preview"
 
     def make_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = update_rows(queryset, is_active=True)
         self.message_user(request, f'{updated} categories were successfully activated.')
     make_active.short_description = "Activate selected categories"
 
     def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = update_rows(queryset, is_active=False)
         self.message_user(request, f'{updated} categories were successfully deactivated.')
     make_inactive.short_description = "Deactivate selected categories"
 
@@ -82,12 +84,12 @@ class FAQAdmin(admin.ModelAdmin):
     answer_preview.short_description = "Answer Preview"
 
     def make_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = apply_bulk_action('faq', 'activate', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} FAQs were successfully activated.')
     make_active.short_description = "Activate selected FAQs"
 
     def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = apply_bulk_action('faq', 'deactivate', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} FAQs were successfully deactivated.')
     make_inactive.short_description = "Deactivate selected FAQs"
 
@@ -107,13 +109,11 @@ class FAQAdmin(admin.ModelAdmin):
     export_as_csv.short_description = "Export selected FAQs as CSV"
 
     def duplicate_faqs(self, request, queryset):
-        for faq in queryset:
-            faq.pk = None
-            faq.question = f"{faq.question} (Copy)"
-            faq.is_active = False
-            faq.save()
-        
-        self.message_user(request, f'{queryset.count()} FAQs were successfully duplicated.')
+        copies = clone_objects(
+            queryset,
+            overrides={'question': lambda faq: copy_label(faq.question, 500), 'is_active': False},
+        )
+        self.message_user(request, f'{len(copies)} FAQs were successfully duplicated.')
     duplicate_faqs.short_description = "Duplicate selected FAQs"
 
     class Media:
@@ -1,9 +1,15 @@
 from django.contrib import admin
+from django.template.defaultfilters import filesizeformat
 from django.utils.html import format_html
 from django.http import HttpResponse
 import csv
 from datetime import datetime
-from .models import GalleryCategory, GalleryItem
+from adminpanel.bulk import apply_bulk_action
+from core.optimization import optimize_files
+from core.templatetags.media_tags import duration, rendition_url
+from core.video import video_for
+from .models import GalleryCategory, GalleryItem, Tag
+from .tags import refresh_tag_counts
 
 @admin.register(GalleryCategory)
 class GalleryCategoryAdmin(admin.ModelAdmin):
@@ -32,6 +38,19 @@ class GalleryCategoryAdmin(admin.ModelAdmin):
         return response
     export_as_csv.short_description = "Export selected categories as CSV"
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'item_count', 'created_at')
+    search_fields = ('name', 'slug')
+    readonly_fields = ('item_count', 'created_at')
+    prepopulated_fields = {'slug': ('name',)}
+    actions = ['recount']
+
+    def recount(self, request, queryset):
+        refresh_tag_counts(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{queryset.count()} tag counts were recalculated.')
+    recount.short_description = "Recalculate item counts"
+
 @admin.register(GalleryItem)
 class GalleryItemAdmin(admin.ModelAdmin):
     list_display = ('title', 'media_type', 'category', 'uploaded_by', 'file_preview', 'is_active', 'created_at')
@@ -63,9 +82,16 @@ class GalleryItemAdmin(admin.ModelAdmin):
     def file_preview(self, obj):
         if obj.file_path:
             if obj.media_type == 'image':
-                return format_html('<img src="{}" style="max-height: 100px;" />', obj.file_path.url)
+                return format_html('<img src="{}" style="max-height: 100px;" />', rendition_url({}, obj.file_path, 320))
             elif obj.media_type == 'video':
-                return format_html('<video width="150" height="100" controls><source src="{}" type="video/mp4"></video>', obj.file_path.url)
+                clip = video_for(obj.file_path.name)
+                poster = obj.thumbnail_path or clip['poster']
+                if not poster:
+                    return format_html('<a href="{}" target="_blank">Play video</a>', clip['url'])
+                return format_html(
+                    '<a href="{}" target="_blank" title="Play video"><img src="{}" style="max-height: 100px;" /></a> {}',
+                    clip['url'], rendition_url({}, poster, 320), duration(clip['duration']),
+                )
         return "No file"
     file_preview.short_description = "File Preview"
 
@@ -80,13 +106,16 @@ class GalleryItemAdmin(admin.ModelAdmin):
             obj.uploaded_by = request.user
         super().save_model(request, obj, form, change)
 
+    # The bulk actions refresh tag counts, the search index and cached pages
+    # for the selected ids, collected before the update changes what a
+    # filtered queryset selects.
     def make_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = apply_bulk_action('gallery', 'activate', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} gallery items were successfully marked as active.')
     make_active.short_description = "Mark selected items as active"
 
     def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = apply_bulk_action('gallery', 'deactivate', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} gallery items were successfully marked as inactive.')
     make_inactive.short_description = "Mark selected items as inactive"
 
@@ -106,10 +135,11 @@ class GalleryItemAdmin(admin.ModelAdmin):
     export_as_csv.short_description = "Export selected items as CSV"
 
     def optimize_images(self, request, queryset):
-        image_items = queryset.filter(media_type='image')
-        for item in image_items:
-            # Here you would implement image optimization logic
-            # For example, using PIL to resize and compress images
-            pass
-        self.message_user(request, f'{image_items.count()} images were processed for optimization.')
+        names = queryset.filter(media_type='image').values_list('file_path', flat=True)
+        report = optimize_files(names)
+        self.message_user(
+            request,
+            f'{report.optimized} images were optimized and {report.unchanged} were already optimal '
+            f'({filesizeformat(report.bytes_saved)} saved).'
+        )
     optimize_images.short_description = "Optimize selected images"
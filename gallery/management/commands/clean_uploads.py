@@ -0,0 +1,34 @@
+import os
+import shutil
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gallery import uploads
+from gallery.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked gallery uploads abandoned before completion, and their chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48, help="Idle time after which an upload is abandoned")
+
+    def handle(self, *args, hours=48, **options):
+        stale = list(ChunkedUpload.objects.filter(
+            item__isnull=True, updated_at__lt=timezone.now() - timedelta(hours=hours),
+        ))
+        uploads.discard(stale)
+
+        # Chunk directories whose upload row is gone. List them before the rows,
+        # so an upload started meanwhile is not mistaken for an orphan.
+        root = uploads.upload_root()
+        directories = os.listdir(root) if os.path.isdir(root) else []
+        known = {str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+        orphans = [name for name in directories if name not in known]
+        for name in orphans:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {len(stale)} abandoned uploads and {len(orphans)} orphaned chunk directories.'
+        ))
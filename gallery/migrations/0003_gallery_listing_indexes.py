@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_galleryitem_is_active'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='galleryitem',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='gallery_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='galleryitem',
+            index=models.Index(fields=['is_active', 'media_type', '-created_at', '-id'], name='gallery_active_type_idx'),
+        ),
+    ]
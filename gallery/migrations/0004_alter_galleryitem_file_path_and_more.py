@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:09
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0003_gallery_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='galleryitem',
+            name='file_path',
+            field=models.FileField(storage=core.storage.ContentAddressedStorage(), upload_to='gallery/'),
+        ),
+        migrations.AlterField(
+            model_name='galleryitem',
+            name='thumbnail_path',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='gallery/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+
+def parse_tags(text):
+    # Frozen copy of gallery.tags.parse_tags as of this migration; importing
+    # gallery.tags would pull in the current models.
+    tags = {}
+    for part in (text or '').split(','):
+        name = ' '.join(part.split())[:50]
+        slug = slugify(name)[:60]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return list(tags.items())
+
+
+def link_existing_tags(apps, schema_editor):
+    GalleryItem = apps.get_model('gallery', 'GalleryItem')
+    Tag = apps.get_model('gallery', 'Tag')
+    GalleryItemTag = apps.get_model('gallery', 'GalleryItemTag')
+    tag_ids = {}
+    items = GalleryItem.objects.exclude(tags='').only('id', 'tags').order_by('pk')
+    batch = []
+
+    def flush():
+        names = {}
+        for _, parsed in batch:
+            for slug, name in parsed:
+                if slug not in tag_ids:
+                    names.setdefault(slug, name)
+        if names:
+            Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], ignore_conflicts=True)
+            tag_ids.update(Tag.objects.filter(slug__in=list(names)).values_list('slug', 'pk'))
+        GalleryItemTag.objects.bulk_create([
+            GalleryItemTag(item_id=item_id, tag_id=tag_ids[slug])
+            for item_id, parsed in batch for slug, _ in parsed
+        ], ignore_conflicts=True)
+        batch.clear()
+
+    for item in items.iterator(chunk_size=500):
+        batch.append((item.pk, parse_tags(item.tags)))
+        if len(batch) >= 500:
+            flush()
+    if batch:
+        flush()
+
+    active = (GalleryItemTag.objects
+        .filter(tag=OuterRef('pk'), item__is_active=True)
+        .values('tag')
+        .annotate(total=Count('pk'))
+        .values('total'))
+    Tag.objects.update(item_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0004_alter_galleryitem_file_path_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='galleryitem',
+            name='tags',
+            field=models.CharField(blank=True, help_text='Comma-separated; kept in sync with tag_list on save', max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slug', models.SlugField(max_length=60, unique=True)),
+                ('item_count', models.PositiveIntegerField(default=0, editable=False, help_text='Active items with this tag')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['-item_count', 'name'], name='gallery_tag_cloud_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GalleryItemTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='gallery.galleryitem')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_links', to='gallery.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='galleryitem',
+            name='tag_list',
+            field=models.ManyToManyField(blank=True, related_name='items', through='gallery.GalleryItemTag', to='gallery.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='galleryitemtag',
+            index=models.Index(fields=['tag', 'item'], name='gallery_tag_item_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='galleryitemtag',
+            constraint=models.UniqueConstraint(fields=('item', 'tag'), name='unique_gallery_item_tag'),
+        ),
+        migrations.RunPython(link_existing_tags, migrations.RunPython.noop),
+    ]
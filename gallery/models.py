@@ -1,7 +1,11 @@
 
+import uuid
+
 from django.db import models
 from django.conf import settings
 
+from core.storage import media_storage
+
 class MediaType(models.TextChoices):
     IMAGE = "image", "Image"
     VIDEO = "video", "Video"
@@ -15,15 +19,40 @@ class GalleryCategory(models.Model):
     def __str__(self):
         return self.name
 
+class Tag(models.Model):
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=60, unique=True)
+    item_count = models.PositiveIntegerField(default=0, editable=False, help_text="Active items with this tag")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        indexes = [models.Index(fields=['-item_count', 'name'], name='gallery_tag_cloud_idx')]
+
+class GalleryItemTag(models.Model):
+    item = models.ForeignKey('GalleryItem', on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='item_links')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['item', 'tag'], name='unique_gallery_item_tag')]
+        indexes = [models.Index(fields=['tag', 'item'], name='gallery_tag_item_idx')]
+
 class GalleryItem(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
-    file_path = models.FileField(upload_to='gallery/')
-    thumbnail_path = models.ImageField(upload_to='gallery/thumbnails/', blank=True, null=True)
+    file_path = models.FileField(upload_to='gallery/', storage=media_storage)
+    # Filled in by core.renditions once the upload is processed.
+    file_path_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    file_path_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    thumbnail_path = models.ImageField(upload_to='gallery/thumbnails/', storage=media_storage, blank=True, null=True)
     media_type = models.CharField(max_length=10, choices=MediaType.choices)
     category = models.ForeignKey(GalleryCategory, null=True, blank=True, on_delete=models.SET_NULL, related_name="items")
     alt_text = models.CharField(max_length=255, blank=True, null=True)
-    tags = models.CharField(max_length=255, blank=True, null=True)
+    tags = models.CharField(max_length=255, blank=True, null=True, help_text="Comma-separated; kept in sync with tag_list on save")
+    tag_list = models.ManyToManyField(Tag, through=GalleryItemTag, related_name='items', blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -31,3 +60,46 @@ class GalleryItem(models.Model):
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        from .tags import sync_item_tags
+        update_fields = kwargs.get('update_fields')
+        tags_touched = update_fields is None or bool({'tags', 'is_active'} & set(update_fields))
+        was_active = False
+        if self.pk and tags_touched:
+            was_active = GalleryItem.objects.filter(pk=self.pk).values_list('is_active', flat=True).first() or False
+        super().save(*args, **kwargs)
+        if tags_touched:
+            sync_item_tags(self, was_active)
+
+    class Meta:
+        indexes = [
+            # The gallery pages through active items newest first, per media type or all together.
+            models.Index(fields=['is_active', '-created_at', '-id'], name='gallery_active_created_idx'),
+            models.Index(fields=['is_active', 'media_type', '-created_at', '-id'], name='gallery_active_type_idx'),
+        ]
+
+class ChunkedUpload(models.Model):
+    """A gallery upload arriving in chunks, see gallery.uploads."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="chunked_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Checksum of the whole file, when the client sent one")
+    fields = models.JSONField(default=dict, help_text="GalleryItem fields to create the item with")
+    item = models.OneToOneField(GalleryItem, null=True, blank=True, on_delete=models.SET_NULL, related_name="upload")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.filename
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def expected_size(self, index):
+        if index == self.chunk_count - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
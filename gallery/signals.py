@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import GalleryItem
+from .tags import adjust_counts
+
+
+@receiver(pre_delete, sender=GalleryItem)
+def gallery_item_deleting(sender, instance, **kwargs):
+    # The links are cascaded away before post_delete; remember them.
+    instance._tag_ids = list(instance.tag_links.values_list('tag_id', flat=True)) if instance.is_active else []
+
+
+@receiver(post_delete, sender=GalleryItem)
+def gallery_item_deleted(sender, instance, **kwargs):
+    adjust_counts({tag_id: -1 for tag_id in getattr(instance, '_tag_ids', [])})
@@ -0,0 +1,115 @@
+"""
+Gallery tags.
+
+GalleryItem.tags stays the editable comma-separated text; on save it is
+parsed into Tag rows linked through GalleryItemTag, so listing an item's
+tag or a tag's items is an indexed join instead of an ``icontains`` scan.
+
+Tag.item_count (active items per tag) is adjusted by F() deltas as links
+and activity change, and the tag cloud built from it is cached until the
+next change. Bulk changes that skip save() call ``refresh_tag_counts``.
+"""
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from .models import GalleryItemTag, Tag
+
+TAG_CLOUD_KEY = 'gallery:tagcloud'
+TAG_CLOUD_SIZE = 30
+MAX_NAME_LENGTH = 50
+
+
+def parse_tags(text):
+    """[(slug, name), ...] for a comma-separated tag string, de-duplicated by slug, in order."""
+    tags = {}
+    for part in (text or '').split(','):
+        name = ' '.join(part.split())[:MAX_NAME_LENGTH]
+        slug = slugify(name)[:60]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return list(tags.items())
+
+
+def get_or_create_tags(parsed):
+    """{slug: Tag} for parsed tags, creating missing ones in bulk."""
+    slugs = [slug for slug, _ in parsed]
+    tags = {tag.slug: tag for tag in Tag.objects.filter(slug__in=slugs)}
+    missing = [Tag(slug=slug, name=name) for slug, name in parsed if slug not in tags]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        tags.update((tag.slug, tag) for tag in Tag.objects.filter(slug__in=[tag.slug for tag in missing]))
+    return tags
+
+
+def adjust_counts(deltas):
+    """Apply {tag_id: delta} with one UPDATE per distinct delta."""
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        Tag.objects.filter(pk__in=tag_ids).update(item_count=F('item_count') + delta)
+    if by_delta:
+        transaction.on_commit(invalidate_tag_cloud)
+
+
+def sync_item_tags(item, was_active):
+    """Bring ``item``'s links and the tag counts in line with item.tags and item.is_active."""
+    wanted = get_or_create_tags(parse_tags(item.tags))
+    wanted_ids = {tag.pk for tag in wanted.values()}
+    current_ids = set(GalleryItemTag.objects.filter(item=item).values_list('tag_id', flat=True))
+
+    removed = current_ids - wanted_ids
+    added = wanted_ids - current_ids
+    if removed:
+        GalleryItemTag.objects.filter(item=item, tag_id__in=removed).delete()
+    if added:
+        GalleryItemTag.objects.bulk_create([GalleryItemTag(item=item, tag_id=tag_id) for tag_id in added])
+
+    deltas = Counter()
+    if was_active:
+        deltas.update({tag_id: -1 for tag_id in current_ids})
+    if item.is_active:
+        deltas.update({tag_id: 1 for tag_id in wanted_ids})
+    adjust_counts(deltas)
+
+
+def refresh_tag_counts(tag_ids=None):
+    """Recount Tag.item_count (for ``tag_ids``, or every tag) in one UPDATE."""
+    active = (GalleryItemTag.objects
+        .filter(tag=OuterRef('pk'), item__is_active=True)
+        .values('tag')
+        .annotate(total=Count('pk'))
+        .values('total'))
+    tags = Tag.objects.all() if tag_ids is None else Tag.objects.filter(pk__in=list(tag_ids))
+    tags.update(item_count=Coalesce(Subquery(active), 0))
+    transaction.on_commit(invalidate_tag_cloud)
+
+
+def tags_of(items):
+    """Tag ids linked to ``items`` (a queryset or ids), for refresh_tag_counts after bulk changes."""
+    return set(GalleryItemTag.objects.filter(item__in=items).values_list('tag_id', flat=True))
+
+
+def invalidate_tag_cloud():
+    cache.delete(TAG_CLOUD_KEY)
+
+
+def get_tag_cloud():
+    """The most used tags as [{'name', 'slug', 'count'}], cached."""
+    cloud = cache.get(TAG_CLOUD_KEY)
+    if cloud is None:
+        cloud = [
+            {'name': name, 'slug': slug, 'count': count}
+            for name, slug, count in Tag.objects
+                .filter(item_count__gt=0)
+                .order_by('-item_count', 'name')
+                .values_list('name', 'slug', 'item_count')[:TAG_CLOUD_SIZE]
+        ]
+        cache.set(TAG_CLOUD_KEY, cloud, None)
+    return cloud
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import MediaTestCase, without_page_cache
+from users.models import User
+from .models import GalleryItem, Tag
+from .tags import get_tag_cloud
+
+
+@without_page_cache
+class GalleryListingTests(TestCase):
+    def test_cursor_walks_active_items_of_one_type(self):
+        cache.clear()
+        GalleryItem.objects.bulk_create([
+            GalleryItem(title=f'Item {i}', media_type='image' if i % 4 else 'video',
+                        is_active=i % 5 != 0, file_path=f'gallery/{i}.jpg')
+            for i in range(40)
+        ])
+        expected = set(GalleryItem.objects.filter(is_active=True, media_type='image').values_list('pk', flat=True))
+
+        seen = []
+        cursor = ''
+        while True:
+            with self.assertNumQueries(2):
+                data = self.client.get('/gallery/', {'type': 'image', 'format': 'json', 'cursor': cursor}).json()
+            seen.extend(item['id'] for item in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(set(seen), expected)
+
+
+class GalleryTagTests(TestCase):
+    def test_tag_counts_follow_edits_and_tag_page_lists_items(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            oven = GalleryItem.objects.create(title='Oven', media_type='image', file_path='gallery/oven.jpg', tags='Pizza, wood fire, pizza')
+            GalleryItem.objects.create(title='Bread', media_type='image', file_path='gallery/bread.jpg', tags='Bread, Wood Fire')
+        counts = dict(Tag.objects.values_list('slug', 'item_count'))
+        self.assertEqual(counts, {'pizza': 1, 'wood-fire': 2, 'bread': 1})
+        self.assertEqual(get_tag_cloud()[0]['slug'], 'wood-fire')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            oven.tags = 'Pizza'
+            oven.save()
+            oven.is_active = False
+            oven.save(update_fields=['is_active'])
+        counts = dict(Tag.objects.values_list('slug', 'item_count'))
+        self.assertEqual(counts, {'pizza': 0, 'wood-fire': 1, 'bread': 1})
+        self.assertNotIn('pizza', [entry['slug'] for entry in get_tag_cloud()])
+
+        data = self.client.get('/gallery/tag/wood-fire/', {'type': 'image', 'format': 'json'}).json()
+        self.assertEqual([item['title'] for item in data['results']], ['Bread'])
+        self.assertEqual(self.client.get('/gallery/tag/nope/').status_code, 404)
+
+    def test_admin_actions_on_a_filtered_list_refresh_tag_counts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = GalleryItem.objects.create(title='Oven', media_type='image', file_path='gallery/oven.jpg', tags='Pizza')
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+        changelist = reverse('custom_admin:gallery_galleryitem_changelist')
+        with self.captureOnCommitCallbacks(execute=True):
+            # The list shows active items only; after the update the queryset selects nothing.
+            self.client.post(f'{changelist}?is_active__exact=1', {'action': 'make_inactive', '_selected_action': [item.pk]})
+        self.assertEqual(Tag.objects.get(slug='pizza').item_count, 0)
+
+
+@override_settings(CHUNKED_UPLOAD_ROOT=tempfile.mkdtemp(), CHUNKED_UPLOAD_CHUNK_SIZE=1000)
+class ChunkedUploadTests(MediaTestCase):
+    def test_chunks_are_verified_and_upload_resumes(self):
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+        self.client.force_login(staff)
+        data = os.urandom(2500)
+        upload = self.client.post('/gallery/uploads/', {
+            'filename': 'clip.mp4', 'size': len(data), 'title': 'Clip', 'tags': 'Fire',
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }, content_type='application/json').json()
+        self.assertEqual(upload['chunk_count'], 3)
+
+        def put(index, body, digest=None):
+            return self.client.put(
+                f'/gallery/uploads/{upload["id"]}/chunks/{index}/', body, content_type='application/octet-stream',
+                headers={'X-Chunk-SHA256': digest or hashlib.sha256(body).hexdigest()},
+            )
+
+        chunks = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+        self.assertEqual(put(2, chunks[2]).status_code, 200)
+        self.assertEqual(put(0, chunks[0], digest='0' * 64).status_code, 400)
+        self.assertEqual(put(1, chunks[1][:-1]).status_code, 400)
+        # The connection drops here; the client asks what arrived and sends the rest.
+        status = self.client.get(f'/gallery/uploads/{upload["id"]}/').json()
+        self.assertEqual(status['received'], [2])
+        self.assertEqual(self.client.post(f'/gallery/uploads/{upload["id"]}/complete/').status_code, 400)
+        for index in (0, 1):
+            self.assertEqual(put(index, chunks[index]).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/gallery/uploads/{upload["id"]}/complete/')
+        self.assertEqual(response.status_code, 201)
+        item = GalleryItem.objects.get(pk=response.json()['item'])
+        self.assertEqual((item.title, item.media_type, item.uploaded_by), ('Clip', 'video', staff))
+        with item.file_path.open('rb') as handle:
+            self.assertEqual(handle.read(), data)
+        self.assertIn(hashlib.sha256(data).hexdigest(), item.file_path.name)
@@ -0,0 +1,220 @@
+"""
+Chunked, resumable gallery uploads.
+
+A client opens a ChunkedUpload with the file's name, size and the fields of
+the GalleryItem to create, then PUTs the file in fixed-size chunks, each
+with its SHA-256 in the X-Chunk-SHA256 header. A chunk is streamed to
+CHUNKED_UPLOAD_ROOT/<upload id>/ and renamed into place only once its size
+and hash check out, so the chunk files present are exactly the chunks
+received; an interrupted upload resumes by asking which those are and
+sending the rest. Every request carries at most one chunk, so no worker is
+tied up for the length of a large transfer.
+
+Completing the upload concatenates the chunks with copy_file_range (the
+kernel copies; nothing passes through Python) and hands the assembled file
+to content-addressed storage, which hashes it and moves it into place.
+"""
+import hashlib
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from core.renditions import is_image
+from core.storage import is_blob, media_storage, release
+from core.video import is_video
+
+from .models import ChunkedUpload, GalleryCategory, GalleryItem, MediaType
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+DEFAULT_MAX_SIZE = 4 * 1024 * 1024 * 1024
+ITEM_FIELDS = ('title', 'description', 'category', 'media_type', 'alt_text', 'tags')
+
+
+class UploadError(Exception):
+    pass
+
+
+class AssembledFile(File):
+    """A finished upload on local disk; storages may move it instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_root():
+    return getattr(settings, 'CHUNKED_UPLOAD_ROOT', os.path.join(settings.MEDIA_ROOT, '.partial'))
+
+
+def upload_dir(upload):
+    return os.path.join(upload_root(), str(upload.pk))
+
+
+def _chunk_path(upload, index):
+    return os.path.join(upload_dir(upload), f'{index:06d}')
+
+
+def max_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def _clean_fields(data, filename):
+    fields = {name: str(data.get(name) or '').strip() for name in ITEM_FIELDS}
+    if not fields['media_type']:
+        fields['media_type'] = MediaType.VIDEO if is_video(filename) else MediaType.IMAGE
+    if fields['media_type'] not in MediaType.values:
+        raise UploadError('Invalid media type')
+    if (fields['media_type'] == MediaType.VIDEO and not is_video(filename)) or (
+            fields['media_type'] == MediaType.IMAGE and not is_image(filename)):
+        raise UploadError(f'{filename} is not a supported {fields["media_type"]} file')
+    if fields['category']:
+        if not str(fields['category']).isdigit() or not GalleryCategory.objects.filter(pk=fields['category']).exists():
+            raise UploadError('Unknown category')
+        fields['category'] = int(fields['category'])
+    fields['title'] = fields['title'] or os.path.splitext(filename)[0]
+    return fields
+
+
+def start_upload(user, data):
+    """Open a ChunkedUpload from the client's {'filename', 'size', 'sha256', 'chunk_size', item fields}."""
+    filename = os.path.basename(str(data.get('filename') or ''))
+    try:
+        size = int(data.get('size'))
+        chunk_size = int(data.get('chunk_size') or getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        raise UploadError('size and chunk_size must be integers')
+    if not filename:
+        raise UploadError('filename is required')
+    if not 0 < size <= max_size():
+        raise UploadError(f'size must be between 1 and {max_size()} bytes')
+    chunk_size = min(max(chunk_size, MIN_CHUNK_SIZE), getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    sha256 = str(data.get('sha256') or '').lower()
+    if sha256 and (len(sha256) != 64 or not all(c in '0123456789abcdef' for c in sha256)):
+        raise UploadError('sha256 must be 64 hex digits')
+
+    upload = ChunkedUpload.objects.create(
+        user=user, filename=filename, size=size, chunk_size=chunk_size, sha256=sha256,
+        fields=_clean_fields(data, filename),
+    )
+    os.makedirs(upload_dir(upload), exist_ok=True)
+    return upload
+
+
+def received_chunks(upload):
+    """Indexes of the chunks stored so far."""
+    try:
+        names = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def write_chunk(upload, index, stream, expected_sha256):
+    """Stream chunk ``index`` from ``stream`` to disk, keeping it only if its size and SHA-256 match."""
+    if upload.item_id:
+        raise UploadError('Upload already completed')
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError('Chunk index out of range')
+    expected_sha256 = (expected_sha256 or '').lower()
+    if not expected_sha256:
+        raise UploadError('X-Chunk-SHA256 header is required')
+
+    expected_size = upload.expected_size(index)
+    path = _chunk_path(upload, index)
+    partial = f'{path}.part'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(partial, 'wb') as handle:
+            while size <= expected_size:
+                block = stream.read(min(1 << 16, expected_size + 1 - size))
+                if not block:
+                    break
+                digest.update(block)
+                size += len(block)
+                handle.write(block)
+        if size != expected_size:
+            raise UploadError(f'Chunk {index} should be {expected_size} bytes')
+        if digest.hexdigest() != expected_sha256:
+            raise UploadError(f'Chunk {index} failed its checksum')
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    # Touch the upload so the sweeper sees it is alive.
+    ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+
+
+def _concatenate(paths, target):
+    with open(target, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as source:
+                remaining = os.fstat(source.fileno()).st_size
+                try:
+                    while remaining:
+                        copied = os.copy_file_range(source.fileno(), out.fileno(), remaining)
+                        if not copied:
+                            break
+                        remaining -= copied
+                except (AttributeError, OSError):
+                    # No copy_file_range on this platform or filesystem: copy the rest in userspace.
+                    source.seek(-remaining, os.SEEK_END)
+                    out.seek(0, os.SEEK_END)
+                    shutil.copyfileobj(source, out, 1 << 20)
+
+
+def complete_upload(upload):
+    """Assemble a fully received upload, store it and create its GalleryItem."""
+    with transaction.atomic():
+        # Serialise retries of the same completion.
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.item_id:
+            return upload.item
+        return _complete(upload)
+
+
+def _complete(upload):
+    missing = sorted(set(range(upload.chunk_count)) - set(received_chunks(upload)))
+    if missing:
+        raise UploadError(f'{len(missing)} chunks missing, first {missing[0]}')
+
+    directory = upload_dir(upload)
+    assembled = os.path.join(directory, 'assembled')
+    _concatenate([_chunk_path(upload, index) for index in range(upload.chunk_count)], assembled)
+    if os.path.getsize(assembled) != upload.size:
+        os.remove(assembled)
+        raise UploadError('Assembled file has the wrong size')
+
+    with open(assembled, 'rb') as handle:
+        name = media_storage.save(upload.filename, AssembledFile(handle, name=upload.filename))
+    if upload.sha256 and is_blob(name) and upload.sha256 not in name:
+        release([name])
+        raise UploadError('File failed its checksum')
+
+    fields = dict(upload.fields)
+    item = GalleryItem.objects.create(
+        title=fields['title'][:200],
+        description=fields.get('description') or None,
+        category_id=fields.get('category') or None,
+        media_type=fields['media_type'],
+        alt_text=fields.get('alt_text') or None,
+        tags=fields.get('tags') or None,
+        file_path=name,
+        uploaded_by=upload.user,
+    )
+    upload.item = item
+    upload.save(update_fields=['item', 'updated_at'])
+    shutil.rmtree(directory, ignore_errors=True)
+    return item
+
+
+def discard(uploads):
+    """Delete ``uploads`` and their chunks."""
+    for upload in uploads:
+        shutil.rmtree(upload_dir(upload), ignore_errors=True)
+        upload.delete()
@@ -1,6 +1,11 @@
 from django.urls import path
-from .views import index
+from .views import index, tag, upload_chunk, upload_complete, upload_start, upload_status
 
 urlpatterns = [
     path('', index, name='gallery'),
+    path('tag/<slug:slug>/', tag, name='gallery_tag'),
+    path('uploads/', upload_start, name='gallery_upload_start'),
+    path('uploads/<uuid:upload_id>/', upload_status, name='gallery_upload_status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', upload_chunk, name='gallery_upload_chunk'),
+    path('uploads/<uuid:upload_id>/complete/', upload_complete, name='gallery_upload_complete'),
 ]
@@ -1,31 +1,184 @@
-from django.shortcuts import render
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from gallery.models import GalleryItem
-from blog.models import BlogCategory  # Correct model name
+import json
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_http_methods, require_POST
+
+from core.pagecache import page_tags
+from core import renditions, video
+from core.pagination import InvalidCursor, keyset_paginate
+from gallery import uploads
+from gallery.models import ChunkedUpload, GalleryCategory, GalleryItem, MediaType, Tag
+from gallery.tags import get_tag_cloud
+
+GALLERY_PER_PAGE = 12
+LIST_FIELDS = (
+    'title', 'description', 'file_path', 'file_path_width', 'file_path_height', 'thumbnail_path',
+    'media_type', 'alt_text', 'created_at', 'category__name',
+)
+
+
+def _item_json(item):
+    data = {
+        'id': item.pk,
+        'title': item.title,
+        'description': item.description,
+        'media_type': item.media_type,
+        'category': item.category.name if item.category else None,
+        'alt_text': item.alt_text or item.title,
+        'url': item.file_path.url,
+        'thumbnail': item.thumbnail_path.url if item.thumbnail_path else None,
+    }
+    if item.media_type == MediaType.VIDEO:
+        data['url'] = video.video_for(item.file_path.name)['url']
+    else:
+        metadata = renditions.image_metadata(item.file_path.name) or {}
+        data.update(
+            width=item.file_path_width,
+            height=item.file_path_height,
+            dominant_color=metadata.get('dominant_color'),
+            placeholder=metadata.get('placeholder'),
+        )
+    return data
+
+
+def _prime(items):
+    """Warm the rendition and video caches for a page of items in two queries."""
+    items = list(items)
+    video.prime(item.file_path.name for item in items if item.media_type == MediaType.VIDEO)
+    posters = [video.video_for(item.file_path.name)['poster'] for item in items if item.media_type == MediaType.VIDEO]
+    renditions.prime(
+        [item.file_path.name for item in items if item.media_type == MediaType.IMAGE]
+        + [item.thumbnail_path.name for item in items if item.thumbnail_path]
+        + posters
+    )
 
-def index(request):
-    gallery_items_list = GalleryItem.objects.all().order_by('-created_at')
-    categories = BlogCategory.objects.all()
 
-    paginator = Paginator(gallery_items_list, 9)  # Show 9 items per page
-    page = request.GET.get('page')
+def _items(category, media_type, tag=None):
+    items = (GalleryItem.objects
+        .filter(is_active=True)
+        .select_related('category')
+        .only(*LIST_FIELDS))
+    if tag:
+        # Indexed through GalleryItemTag (tag, item); no icontains over the tags text.
+        items = items.filter(tag_links__tag=tag)
+    if category:
+        items = items.filter(category_id=category)
+    if media_type:
+        items = items.filter(media_type=media_type)
+    return items
 
+
+def _listing(request, tag=None):
     try:
-        gallery_items = paginator.page(page)
-    except PageNotAnInteger:
-        gallery_items = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range, show empty list
-        gallery_items = []
-
-    # If no items, show message flag
-    show_message = False
-    if not gallery_items or (hasattr(gallery_items, '__len__') and len(gallery_items) == 0):
-        show_message = True
+        category = int(request.GET['category']) if request.GET.get('category') else None
+    except ValueError:
+        return HttpResponseBadRequest('Invalid category')
+    media_type = request.GET.get('type')
+    if media_type and media_type not in MediaType.values:
+        return HttpResponseBadRequest('Invalid type')
+
+    # Infinite scroll asks for the next page of one media type as JSON or as rendered items.
+    fmt = request.GET.get('format')
+    if fmt in ('json', 'html'):
+        try:
+            page = keyset_paginate(_items(category, media_type, tag), request.GET.get('cursor'), GALLERY_PER_PAGE)
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor')
+        _prime(page)
+        if fmt == 'json':
+            return JsonResponse({
+                'results': [_item_json(item) for item in page],
+                'next_cursor': page.next_cursor,
+            })
+        return JsonResponse({
+            'html': render_to_string('components/gallery_items.html', {'gallery_items': page}, request=request),
+            'next_cursor': page.next_cursor,
+        })
 
+    # The page itself starts one stream per media type shown.
+    shown = [media_type] if media_type else MediaType.values
+    pages = {kind: keyset_paginate(_items(category, kind, tag), None, GALLERY_PER_PAGE) for kind in shown}
+    _prime(item for page in pages.values() for item in page)
     return render(request, 'gallery.html', {
-        'gallery_items': gallery_items,
-        'categories': categories,
-        'show_message': show_message,
-        'title': 'Gallery',
+        'images': pages.get(MediaType.IMAGE),
+        'videos': pages.get(MediaType.VIDEO),
+        'categories': GalleryCategory.objects.order_by('name'),
+        'selected_category': category,
+        'selected_type': media_type,
+        'tag_cloud': get_tag_cloud(),
+        'selected_tag': tag,
+        'show_message': not any(len(page) for page in pages.values()),
+        'title': f'Gallery: {tag.name}' if tag else 'Gallery',
     })
+
+
+@page_tags('gallery')
+def index(request):
+    return _listing(request)
+
+
+@page_tags('gallery')
+def tag(request, slug):
+    return _listing(request, get_object_or_404(Tag, slug=slug))
+
+
+def _upload_json(upload):
+    return {
+        'id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'chunk_count': upload.chunk_count,
+        'received': uploads.received_chunks(upload),
+        'item': upload.item_id,
+    }
+
+
+def _own_upload(request, upload_id):
+    return get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+
+@staff_member_required
+@require_POST
+def upload_start(request):
+    try:
+        data = json.loads(request.body or b'{}')
+        upload = uploads.start_upload(request.user, data)
+    except (ValueError, uploads.UploadError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(_upload_json(upload), status=201)
+
+
+@staff_member_required
+@require_http_methods(['GET', 'DELETE'])
+def upload_status(request, upload_id):
+    upload = _own_upload(request, upload_id)
+    if request.method == 'DELETE':
+        uploads.discard([upload])
+        return JsonResponse({'deleted': True})
+    return JsonResponse(_upload_json(upload))
+
+
+@staff_member_required
+@require_http_methods(['PUT'])
+def upload_chunk(request, upload_id, index):
+    upload = _own_upload(request, upload_id)
+    try:
+        uploads.write_chunk(upload, index, request, request.headers.get('X-Chunk-SHA256'))
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'index': index})
+
+
+@staff_member_required
+@require_POST
+def upload_complete(request, upload_id):
+    upload = _own_upload(request, upload_id)
+    try:
+        item = uploads.complete_upload(upload)
+    except uploads.UploadError as exc:
+        return JsonResponse({'error': str(exc), 'received': uploads.received_chunks(upload)}, status=400)
+    return JsonResponse({'item': item.pk, 'url': item.file_path.url}, status=201)
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'product',
     'faq',
     'about',
+    'search',
 ]
 
 # Custom User Model
@@ -41,6 +42,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'ovencraft.urls'
@@ -90,5 +92,22 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Absolute site address used in sitemaps and feeds, and where prebuilt sitemaps are written.
+SITE_URL = 'https://ovencraft.in'
+SITEMAP_ROOT = BASE_DIR / 'sitemaps'
+
+# Worker processes resizing uploaded images (core.renditions); 0 renders in-process.
+IMAGE_RENDITION_WORKERS = 2
+# Background threads transcoding uploaded videos with ffmpeg (core.video); 0 processes in-request.
+VIDEO_WORKERS = 1
+# Background threads for follow-up work moved off the request path (core.background); 0 runs it in-request.
+BACKGROUND_WORKERS = 1
+# Chunked gallery uploads (gallery.uploads) are assembled here; keep it on MEDIA_ROOT's filesystem.
+CHUNKED_UPLOAD_ROOT = BASE_DIR / 'uploads-partial'
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024
+
+TEST_RUNNER = 'core.testing.TestRunner'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -1,31 +1,32 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from core import views as core_views  # Add this line
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib.sitemaps.views import sitemap
-from blog.sitemap import BlogSitemap
 from .admin import admin_site
 
-sitemaps = {
-    'blogs': BlogSitemap,
-}
-
 urlpatterns = [
     path("admin/", admin_site.urls),
     path("blogs/", include("blog.urls")),
     path("gallery/", include("gallery.urls")),
     path("contact/", include("contact.urls")),
     path("users/", include("users.urls")),
+    path("search/", include("search.urls")),
+    path("products/", include("product.urls")),
+    path("adminpanel/", include("adminpanel.urls")),
 
     path("", core_views.index, name="home"),  # root URL
     path("about/", core_views.about, name="about"),  # about URL
-    path("products/", core_views.products, name="products"),  # products URL
     path("product-details/", core_views.product_details, name="product-details"),  # product details URL
     path("faq/", core_views.faq, name="faq"),  # added faq URL
     path("privacy-policy/", core_views.privacy_policy, name="privacy-policy"),  # privacy policy URL
 
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path("page-cache/stats/", core_views.page_cache_stats, name="page-cache-stats"),
+
+    path("sitemap.xml", core_views.sitemap, name="sitemap"),
+    re_path(r"^sitemaps/(?P<name>sitemap-[a-z]+-\d+\.xml)$", core_views.sitemap, name="sitemap-shard"),
+    # Content-addressed uploads; the web server can serve MEDIA_ROOT/cas directly with the same headers.
+    re_path(r"^%scas/(?P<path>[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?)$" % settings.MEDIA_URL.lstrip("/"), core_views.media_blob, name="media-blob"),
 ]
 
 if settings.DEBUG:
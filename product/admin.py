@@ -1,9 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
 from django.http import HttpResponse
 import csv
 from datetime import datetime
-from .models import ProductCategory, Product, ProductImage, ProductSpecification
+from adminpanel.bulk import apply_bulk_action
+from core.cloning import clone_objects, copy_label
+from .forms import CatalogImportForm, StockActionForm
+from .importer import CatalogImportError, ZipImages, import_catalog, read_rows
+from .specs import rebuild_spec_index
+from .models import ProductCategory, Product, ProductImage, ProductSpecification, StockReservation
+from .stock import InsufficientStock, release, restock, take
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
@@ -36,8 +45,11 @@ class ProductAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('created_at', 'updated_at', 'image_preview')
     inlines = [ProductImageInline, ProductSpecificationInline]
-    list_editable = ('is_featured', 'is_active', 'stock_quantity')
-    actions = ['make_active', 'make_inactive', 'make_featured', 'remove_featured', 'export_as_csv', 'duplicate_products']
+    list_editable = ('is_featured', 'is_active')
+    actions = ['make_active', 'make_inactive', 'make_featured', 'remove_featured', 'restock_products', 'take_stock',
+               'export_as_csv', 'duplicate_products']
+    action_form = StockActionForm
+    change_list_template = 'admin/product/product/change_list.html'
     
     fieldsets = (
         ('Basic Information', {
@@ -70,28 +82,70 @@ class ProductAdmin(admin.ModelAdmin):
             return format_html('<img src="{}" style="max-height: 100px; max-width: 100px;" />', obj.main_image.url)
         return "No image"
     image_preview.short_description = "Main Image Preview"
+
+    def get_readonly_fields(self, request, obj=None):
+        # Reservations change stock under the form; saving the form would write
+        # back the count it was loaded with. Use the stock actions instead.
+        if obj is not None:
+            return self.readonly_fields + ('stock_quantity',)
+        return self.readonly_fields
     
-    # Bulk Actions
+    # Bulk Actions: the bulk actions also refresh facets, the search index and cached pages.
     def make_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = apply_bulk_action('product', 'activate', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} products were successfully marked as active.')
     make_active.short_description = "Mark selected products as active"
     
     def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = apply_bulk_action('product', 'deactivate', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} products were successfully marked as inactive.')
     make_inactive.short_description = "Mark selected products as inactive"
     
     def make_featured(self, request, queryset):
-        updated = queryset.update(is_featured=True)
+        updated = apply_bulk_action('product', 'feature', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} products were successfully marked as featured.')
     make_featured.short_description = "Mark selected products as featured"
     
     def remove_featured(self, request, queryset):
-        updated = queryset.update(is_featured=False)
+        updated = apply_bulk_action('product', 'unfeature', ids=list(queryset.values_list('pk', flat=True)))['affected']
         self.message_user(request, f'{updated} products were successfully removed from featured.')
     remove_featured.short_description = "Remove selected products from featured"
     
+    def _action_quantity(self, request):
+        try:
+            quantity = self.action_form.base_fields['quantity'].clean(request.POST.get('quantity'))
+        except ValidationError:
+            quantity = None
+        if not quantity:
+            self.message_user(request, 'Enter a quantity of at least 1 for the stock actions.', messages.ERROR)
+        return quantity
+
+    def restock_products(self, request, queryset):
+        quantity = self._action_quantity(request)
+        if not quantity:
+            return
+        ids = sorted(queryset.values_list('pk', flat=True))
+        for pk in ids:
+            restock(pk, quantity)
+        self.message_user(request, f'{quantity} units were added to the stock of {len(ids)} products.')
+    restock_products.short_description = "Add stock to selected products"
+
+    def take_stock(self, request, queryset):
+        quantity = self._action_quantity(request)
+        if not quantity:
+            return
+        taken, short = 0, []
+        for pk, name in queryset.order_by('pk').values_list('pk', 'name'):
+            try:
+                take(pk, quantity)
+                taken += 1
+            except InsufficientStock:
+                short.append(name)
+        self.message_user(request, f'{quantity} units were removed from the stock of {taken} products.')
+        if short:
+            self.message_user(request, f'Fewer than {quantity} units free to remove: {", ".join(short)}', messages.WARNING)
+    take_stock.short_description = "Remove stock from selected products"
+
     def export_as_csv(self, request, queryset):
         meta = self.model._meta
         field_names = [field.name for field in meta.fields]
@@ -108,19 +162,54 @@ class ProductAdmin(admin.ModelAdmin):
     export_as_csv.short_description = "Export selected products as CSV"
     
     def duplicate_products(self, request, queryset):
-        for product in queryset:
-            # Create a copy of the product
-            product.pk = None
-            product.name = f"{product.name} (Copy)"
-            product.slug = f"{product.slug}-copy"
-            product.save()
-        
-        self.message_user(request, f'{queryset.count()} products were successfully duplicated.')
+        copies = clone_objects(
+            queryset,
+            overrides={
+                'name': lambda product: copy_label(product.name, 200),
+                'is_active': False,
+                'is_featured': False,
+            },
+            slug_field='slug',
+            related=['images', 'detailed_specifications'],
+        )
+        rebuild_spec_index([copy.pk for copy in copies])
+        self.message_user(request, f'{len(copies)} products were successfully duplicated as inactive drafts.')
     duplicate_products.short_description = "Duplicate selected products"
 
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='product_product_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a catalog file (and a ZIP of its images) to create and update products in bulk."""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        report = None
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['catalog']
+            try:
+                images = ZipImages(form.cleaned_data['images']) if form.cleaned_data['images'] else None
+                report = import_catalog(read_rows(upload, upload.name), images=images,
+                                        dry_run=form.cleaned_data['dry_run'])
+            except CatalogImportError as exc:
+                form.add_error(None, str(exc))
+            else:
+                self.message_user(request, report.summary(),
+                                  messages.WARNING if report.errors else messages.SUCCESS)
+        return TemplateResponse(request, 'admin/product/product/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import products',
+            'form': form,
+            'report': report,
+        })
+
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ('product', 'alt_text', 'is_primary', 'image_preview')
+    list_select_related = ('product',)
     list_filter = ('is_primary', 'created_at')
     search_fields = ('product__name', 'alt_text')
     readonly_fields = ('image_preview',)
@@ -134,5 +223,28 @@ class ProductImageAdmin(admin.ModelAdmin):
 @admin.register(ProductSpecification)
 class ProductSpecificationAdmin(admin.ModelAdmin):
     list_display = ('product', 'name', 'value')
+    list_select_related = ('product',)
     list_filter = ('product',)
     search_fields = ('product__name', 'name', 'value')
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'quantity', 'reference', 'expires_at', 'confirmed_at', 'created_at')
+    list_filter = ('confirmed_at', 'expires_at')
+    search_fields = ('reference', 'product__name')
+    list_select_related = ('product',)
+    readonly_fields = ('product', 'quantity', 'expires_at', 'confirmed_at', 'created_at')
+    actions = ['release_reservations']
+
+    def has_add_permission(self, request):
+        # Holds take stock; they are made through product.stock.reserve only.
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Deleting a pending hold would lose its units; release it instead.
+        return obj is not None and obj.confirmed_at is not None
+
+    def release_reservations(self, request, queryset):
+        released = sum(release(pk) for pk in queryset.filter(confirmed_at=None).values_list('pk', flat=True))
+        self.message_user(request, f'{released} reservations were released and their stock returned.')
+    release_reservations.short_description = "Release selected reservations"
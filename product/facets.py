@@ -0,0 +1,165 @@
+"""
+Catalog facet counts.
+
+FacetCount holds, for every facet value shown in the catalog sidebar, the
+number of active products having it: category, price band, stock,
+featured, and one ``spec:<name>`` facet per normalized specification name
+(read from the SpecValue index, see product.specs). Instead of
+COUNT queries per facet per request, saves adjust the counts by the
+difference between a product's facet values before and after (two small
+queries when something changed, none when nothing did), and the sidebar
+reads the whole table once, cached until the next change.
+
+Bulk changes that skip save() (queryset.update, bulk_create) call
+``rebuild_facets``, which recounts everything with one GROUP BY per facet.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import FacetCount, Product, ProductCategory, SpecValue
+from .specs import normalize_name, parse_value
+
+FACETS_KEY = 'catalog:facets'
+# Lower edges of the price bands.
+PRICE_BANDS = (0, 25000, 50000, 100000, 200000, 500000)
+
+
+def price_band(price):
+    """'low-high' (or 'low+' for the top band) for a price."""
+    price = Decimal(price or 0)
+    for low, high in zip(PRICE_BANDS, PRICE_BANDS[1:]):
+        if price < high:
+            return f'{low}-{high}'
+    return f'{PRICE_BANDS[-1]}+'
+
+
+def band_range(band):
+    """(min, max or None) of a band from ``price_band``; ValueError for anything else."""
+    for low, high in zip(PRICE_BANDS, PRICE_BANDS[1:] + (None,)):
+        if band == (f'{low}-{high}' if high is not None else f'{low}+'):
+            return Decimal(low), Decimal(high) if high is not None else None
+    raise ValueError(f'Unknown price band {band!r}')
+
+
+def spec_facet(name):
+    return f'spec:{normalize_name(name)}'
+
+
+def spec_values(product_ids):
+    """{product id: {(facet, value), ...}} of the specification facets of ``product_ids``."""
+    values = {pk: set() for pk in product_ids}
+    for product_id, name, value in SpecValue.objects.filter(product_id__in=product_ids).values_list('product_id', 'name', 'value'):
+        values[product_id].add((f'spec:{name}', value))
+    return values
+
+
+def facet_values(product, specs=frozenset()):
+    """The (facet, value) pairs an active ``product`` counts towards."""
+    if not product.is_active:
+        return set()
+    values = {
+        ('price', price_band(product.current_price)),
+        ('stock', 'in' if product.stock_quantity > 0 else 'out'),
+    }
+    if product.category_id:
+        values.add(('category', str(product.category_id)))
+    if product.is_featured:
+        values.add(('featured', 'yes'))
+    return values | set(specs)
+
+
+def adjust(deltas):
+    """Apply {(facet, value): delta}: create missing rows, then one UPDATE per distinct delta."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    FacetCount.objects.bulk_create(
+        [FacetCount(facet=facet, value=value) for facet, value in deltas], ignore_conflicts=True,
+    )
+    by_delta = {}
+    for (facet, value), delta in deltas.items():
+        by_delta.setdefault(delta, Q(pk__in=[]))
+        by_delta[delta] |= Q(facet=facet, value=value)
+    for delta, condition in by_delta.items():
+        FacetCount.objects.filter(condition).update(count=F('count') + delta)
+    transaction.on_commit(invalidate)
+
+
+def diff(before, after):
+    deltas = Counter()
+    deltas.update({key: -1 for key in before - after})
+    deltas.update({key: 1 for key in after - before})
+    return deltas
+
+
+def rebuild_facets():
+    """Recount every facet from the product tables."""
+    counts = Counter()
+    active = Product.objects.filter(is_active=True)
+    for category_id, total in active.exclude(category=None).values_list('category_id').annotate(n=Count('id')):
+        counts['category', str(category_id)] = total
+    counts['featured', 'yes'] = active.filter(is_featured=True).count()
+    counts['stock', 'in'] = active.filter(stock_quantity__gt=0).count()
+    counts['stock', 'out'] = active.filter(stock_quantity=0).count()
+    for band in [price_band(low) for low in PRICE_BANDS]:
+        low, high = band_range(band)
+        prices = active.filter(current_price__gte=low)
+        counts['price', band] = (prices.filter(current_price__lt=high) if high is not None else prices).count()
+    specs = (SpecValue.objects
+        .filter(product__is_active=True)
+        .values_list('name', 'value')
+        .annotate(n=Count('product_id')))
+    for name, value, total in specs:
+        counts[f'spec:{name}', value] = total
+
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(
+            [FacetCount(facet=facet, value=value, count=total) for (facet, value), total in counts.items() if total],
+            batch_size=1000,
+        )
+    transaction.on_commit(invalidate)
+
+
+def invalidate():
+    cache.delete(FACETS_KEY)
+
+
+def _spec_order(entry):
+    _, number, unit = parse_value(entry['value'])
+    return (number is None, unit, number or 0, entry['value'])
+
+
+def get_facets():
+    """
+    {facet: [{'value', 'label', 'count'}, ...]} of every facet value with
+    active products: categories labelled by name (with their slug), price bands in order, and
+    under 'specs' a list of {'name', 'label', 'values'} per specification name, numbers in numeric order.
+    """
+    facets = cache.get(FACETS_KEY)
+    if facets is None:
+        facets = {'category': [], 'price': [], 'stock': [], 'featured': [], 'specs': []}
+        categories = {pk: (name, slug) for pk, name, slug in ProductCategory.objects.values_list('id', 'name', 'slug')}
+        specs = {}
+        for facet, value, count in FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'):
+            entry = {'value': value, 'label': value, 'count': count}
+            if facet == 'category':
+                entry['label'], entry['slug'] = categories.get(int(value), (value, value))
+            if facet.startswith('spec:'):
+                specs.setdefault(facet[len('spec:'):], []).append(entry)
+            else:
+                facets.setdefault(facet, []).append(entry)
+        facets['price'].sort(key=lambda entry: band_range(entry['value'])[0])
+        facets['category'].sort(key=lambda entry: entry['label'])
+        for values in specs.values():
+            values.sort(key=_spec_order)
+        facets['specs'] = [
+            {'name': name, 'label': name.replace('-', ' ').capitalize(), 'values': values}
+            for name, values in sorted(specs.items())
+        ]
+        cache.set(FACETS_KEY, facets, None)
+    return facets
@@ -0,0 +1,12 @@
+from django import forms
+from django.contrib.admin.helpers import ActionForm
+
+
+class CatalogImportForm(forms.Form):
+    catalog = forms.FileField(help_text="CSV, JSON or XLSX, one product per row, matched by slug")
+    images = forms.FileField(required=False, help_text="Optional ZIP of the files named in main_image and images")
+    dry_run = forms.BooleanField(required=False, initial=True, help_text="Only report what would change")
+
+
+class StockActionForm(ActionForm):
+    quantity = forms.IntegerField(required=False, min_value=1, help_text="Units for the stock actions")
@@ -0,0 +1,72 @@
+"""
+Cached fragments of the product detail page.
+
+The specification table and the image gallery are the only parts of
+/products/<slug>/ that need a product's related rows. Each is rendered
+once and cached per product until product.signals deletes it, when the
+product, one of its images or one of its specifications changes. A page
+whose fragments are cached costs the product query alone; a miss adds one
+prefetch query per relation the missing fragments need.
+"""
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import renditions
+
+from .models import ProductImage, ProductSpecification
+from .specs import json_specs, normalize_name
+
+# fragment -> (template, relations it renders)
+FRAGMENTS = {
+    'specs': ('components/product_specs.html', ('detailed_specifications',)),
+    'gallery': ('components/product_gallery.html', ('images',)),
+}
+PREFETCHES = {
+    'detailed_specifications': Prefetch('detailed_specifications', queryset=ProductSpecification.objects.order_by('pk')),
+    'images': Prefetch('images', queryset=ProductImage.objects.order_by('-is_primary', 'pk')),
+}
+
+
+def fragment_key(product_id, name):
+    return f'product:{product_id}:{name}'
+
+
+def invalidate_fragments(product_id):
+    cache.delete_many([fragment_key(product_id, name) for name in FRAGMENTS])
+
+
+def spec_rows(product):
+    """(name, value) rows of the spec table: the specification rows, then JSON specifications not among them."""
+    rows = [(spec.name, spec.value) for spec in product.detailed_specifications.all()]
+    named = {normalize_name(name) for name, _ in rows}
+    rows += [(name, value) for name, value in json_specs(product.specifications)
+             if value and normalize_name(name) not in named]
+    return rows
+
+
+def _complete(name, product):
+    # A gallery rendered before its images are processed holds plain <img>
+    # fallbacks; leave it uncached until every image has renditions.
+    return name != 'gallery' or all(renditions.renditions_for(image.image.name) for image in product.images.all())
+
+
+def get_fragments(product):
+    """{fragment: html} for ``product``, rendering and caching the ones not cached."""
+    keys = {name: fragment_key(product.pk, name) for name in FRAGMENTS}
+    cached = cache.get_many(list(keys.values()))
+    fragments = {name: cached[key] for name, key in keys.items() if key in cached}
+    missing = [name for name in FRAGMENTS if name not in fragments]
+    if missing:
+        relations = {relation for name in missing for relation in FRAGMENTS[name][1]}
+        prefetch_related_objects([product], *(PREFETCHES[relation] for relation in sorted(relations)))
+        if 'images' in relations:
+            renditions.prime(image.image.name for image in product.images.all())
+        context = {'product': product}
+        if 'detailed_specifications' in relations:
+            context['specs'] = spec_rows(product)
+        for name in missing:
+            fragments[name] = render_to_string(FRAGMENTS[name][0], context)
+        cache.set_many({keys[name]: fragments[name] for name in missing if _complete(name, product)}, None)
+    return {name: mark_safe(html) for name, html in fragments.items()}
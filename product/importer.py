@@ -0,0 +1,476 @@
+"""
+Catalog import.
+
+Reads products from a CSV, JSON or XLSX file, one product per row keyed by
+slug, and brings the catalog in line with it: rows are diffed against the
+existing products in chunks and only what differs is written, with one
+bulk_create and one bulk_update per chunk instead of a save() per product.
+Columns absent from the file leave their fields untouched; unknown columns
+are ignored, except ``spec:<name>`` columns, which set one entry of
+Product.specifications.
+
+Images are named relative to an image source (a directory, or a ZIP
+uploaded with the file). A file is hashed and compared with the product's
+content-addressed image before anything is stored, so re-importing the same
+catalog stores nothing. New images go through media_storage and get their
+renditions once the import commits.
+
+bulk_create and bulk_update send no signals, so the work the signals would
+have done (spec index, facet counts, search index, renditions, page cache,
+sitemaps) is done here, once for the whole import. A dry run does the
+parsing and diffing and reports what would change without writing.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core import renditions, sitemaps
+from core.pagecache import purge
+from core.storage import is_blob, media_storage, release
+from search.indexing import SearchKind, index_objects
+
+from . import stock
+from .facets import rebuild_facets
+from .fragments import FRAGMENTS, fragment_key
+from .models import Product, ProductCategory, ProductImage
+from .specs import rebuild_spec_index
+
+BATCH_SIZE = 500
+TEXT_FIELDS = (
+    'name', 'short_description', 'description', 'features', 'dimensions', 'warranty_period',
+    'meta_title', 'meta_description', 'meta_keywords',
+)
+DECIMAL_FIELDS = ('price', 'sale_price', 'weight')
+BOOLEAN_FIELDS = ('is_featured', 'is_active')
+TRUE = {'1', 'true', 'yes', 'y'}
+FALSE = {'0', 'false', 'no', 'n', ''}
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+class ImportReport:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.created = []
+        self.updated = []
+        self.unchanged = 0
+        self.categories = []
+        self.images = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def summary(self):
+        verb = 'Would import' if self.dry_run else 'Imported'
+        return (f'{verb}: {len(self.created)} created, {len(self.updated)} updated, {self.unchanged} unchanged, '
+                f'{len(self.categories)} new categories, {self.images} images; {len(self.errors)} rows with errors.')
+
+
+# Reading
+
+def read_rows(file, name):
+    """(line, {column: value}) for each product in a CSV, JSON or XLSX ``file``, by the extension of ``name``."""
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.csv':
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        return [(line, row) for line, row in enumerate(csv.DictReader(text), start=2)]
+    if extension == '.json':
+        try:
+            data = json.load(file)
+        except ValueError as exc:
+            raise CatalogImportError(f'Invalid JSON: {exc}')
+        if isinstance(data, dict):
+            data = data.get('products')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise CatalogImportError('JSON must be a list of products or {"products": [...]}')
+        return list(enumerate(data, start=1))
+    if extension == '.xlsx':
+        return _read_xlsx(file)
+    raise CatalogImportError(f'Unsupported file type {extension or name!r}; use .csv, .json or .xlsx')
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogImportError('XLSX import needs openpyxl installed; export the sheet as CSV instead')
+    sheet = load_workbook(file, read_only=True, data_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(cell or '').strip() for cell in next(rows, ())]
+    return [
+        (line, {column: '' if cell is None else cell for column, cell in zip(header, row) if column})
+        for line, row in enumerate(rows, start=2)
+        if any(cell not in (None, '') for cell in row)
+    ]
+
+
+class DirectoryImages:
+    """Image files under a local directory."""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+
+    def open(self, name):
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return open(path, 'rb')
+
+
+class ZipImages:
+    """Image files inside a ZIP archive."""
+
+    def __init__(self, file):
+        try:
+            self.archive = zipfile.ZipFile(file)
+        except zipfile.BadZipFile:
+            raise CatalogImportError('The images file is not a ZIP archive')
+
+    def open(self, name):
+        try:
+            return self.archive.open(name.lstrip('/'))
+        except KeyError:
+            return None
+
+
+# Parsing
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _decimal(value, field):
+    value = _text(value).replace(',', '')
+    if not value:
+        return None
+    try:
+        return Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'{field} is not a number: {value!r}')
+
+
+def _boolean(value, field):
+    if isinstance(value, bool):
+        return value
+    value = _text(value).lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise ValueError(f'{field} is not yes/no: {value!r}')
+
+
+def _image_list(value):
+    if isinstance(value, list):
+        return [_text(name) for name in value if _text(name)]
+    return [name.strip() for name in _text(value).split('|') if name.strip()]
+
+
+def _check_fields(data):
+    """
+    Hold parsed values to their Product field's limits (max_length,
+    max_digits, the integer range), so a value the database would refuse is
+    reported against its row instead of aborting the whole import.
+    """
+    for name in (*TEXT_FIELDS, *DECIMAL_FIELDS, 'stock_quantity'):
+        if name not in data:
+            continue
+        field = Product._meta.get_field(name)
+        if field.null and data[name] == '':
+            # NULL, as the admin form saves it, so re-importing compares equal.
+            data[name] = None
+        try:
+            field.run_validators(data[name])
+        except ValidationError as exc:
+            raise ValueError(f'{name}: {" ".join(exc.messages)}')
+
+
+def parse_row(row):
+    """The typed product fields of one row, only for the columns present; ValueError if a value is invalid."""
+    data = {}
+    for field in TEXT_FIELDS:
+        if field in row:
+            data[field] = _text(row[field])
+    for field in DECIMAL_FIELDS:
+        if field in row:
+            data[field] = _decimal(row[field], field)
+    if 'stock_quantity' in row:
+        stock = _text(row['stock_quantity']) or '0'
+        if not stock.isdigit():
+            raise ValueError(f'stock_quantity is not a whole number: {stock!r}')
+        data['stock_quantity'] = int(stock)
+    for field in BOOLEAN_FIELDS:
+        if field in row:
+            data[field] = _boolean(row[field], field)
+    if 'category' in row:
+        data['category'] = _text(row['category'])
+
+    if 'specifications' in row:
+        specs = row['specifications'] or {}
+        if isinstance(specs, str):
+            try:
+                specs = json.loads(specs)
+            except ValueError:
+                raise ValueError('specifications is not valid JSON')
+        if not isinstance(specs, dict):
+            raise ValueError('specifications must be a JSON object')
+        data['specifications'] = specs
+    # spec:<name> columns set single entries, on top of the existing specifications.
+    columns = {
+        str(column)[len('spec:'):].strip(): _text(value)
+        for column, value in row.items() if str(column).startswith('spec:') and _text(value)
+    }
+    if columns:
+        data['spec_columns'] = columns
+
+    if 'main_image' in row:
+        data['main_image'] = _text(row['main_image'])
+    if 'images' in row:
+        data['images'] = _image_list(row['images'])
+
+    data['slug'] = slugify(_text(row.get('slug')) or data.get('name', ''))[:50]
+    if not data['slug']:
+        raise ValueError('slug or name is required')
+    if 'price' in data and data['price'] is None:
+        raise ValueError('price is required')
+    _check_fields(data)
+    return data
+
+
+# Images
+
+def _digest(images, name):
+    """SHA-256 of image ``name`` from ``images``; ValueError if it is missing."""
+    if images is None:
+        raise ValueError(f'image {name!r} given but no image directory or archive')
+    handle = images.open(name)
+    if handle is None:
+        raise ValueError(f'image {name!r} not found')
+    digest = hashlib.sha256()
+    with handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _same_file(stored, digest):
+    return is_blob(stored) and digest in str(stored)
+
+
+def _store(images, name):
+    with images.open(name) as handle:
+        return media_storage.save(os.path.basename(name), File(handle, name=os.path.basename(name)))
+
+
+# Importing
+
+class _Plan:
+    def __init__(self):
+        self.creates = []      # (line, data)
+        self.updates = []      # (line, product, {field: value})
+        self.images = {}       # product slug -> (line, [names]) for gallery replacements
+        self.main_images = {}  # product slug -> name
+
+
+def _categories(names, report, dry_run):
+    """{name or slug in the file: category id}, creating missing categories."""
+    found = {}
+    for pk, name, slug in ProductCategory.objects.values_list('pk', 'name', 'slug'):
+        found.setdefault(name.lower(), pk)
+        found.setdefault(slug, pk)
+    resolved = {}
+    for name in names:
+        pk = found.get(name.lower()) or found.get(slugify(name))
+        if pk is None:
+            report.categories.append(name)
+            if not dry_run:
+                pk = ProductCategory.objects.create(name=name[:100]).pk
+            found[name.lower()] = pk
+        resolved[name] = pk
+    return resolved
+
+
+def _diff(rows, images, report, plan):
+    slugs = [data['slug'] for _, data in rows]
+    existing = {product.slug: product for product in Product.objects.filter(slug__in=slugs)}
+    galleries = {}
+    for product_id, image in (ProductImage.objects
+            .filter(product__slug__in=slugs).order_by('product_id', '-is_primary', 'pk')
+            .values_list('product_id', 'image')):
+        galleries.setdefault(product_id, []).append(image)
+
+    for line, data in rows:
+        product = existing.get(data['slug'])
+        if 'spec_columns' in data:
+            base = data.get('specifications', product.specifications if product else {})
+            data['specifications'] = {**(base if isinstance(base, dict) else {}), **data.pop('spec_columns')}
+        try:
+            main_digest = _digest(images, data['main_image']) if data.get('main_image') else None
+            gallery = [(name, _digest(images, name)) for name in data.get('images', ())]
+        except ValueError as exc:
+            report.error(line, str(exc))
+            continue
+
+        if product is None:
+            if not data.get('name') or data.get('price') is None or not main_digest:
+                report.error(line, 'new products need name, price and main_image')
+                continue
+            plan.creates.append((line, data))
+            plan.main_images[data['slug']] = data['main_image']
+            if gallery:
+                plan.images[data['slug']] = (line, [name for name, _ in gallery])
+            continue
+
+        changes = {
+            field: value for field, value in data.items()
+            if field not in ('slug', 'category', 'main_image', 'images') and getattr(product, field) != value
+        }
+        if 'category' in data and product.category_id != data['category']:
+            changes['category_id'] = data['category']
+        if main_digest and not _same_file(product.main_image.name, main_digest):
+            plan.main_images[data['slug']] = data['main_image']
+            changes['main_image'] = data['main_image']
+        if 'images' in data:
+            current = galleries.get(product.pk, [])
+            if len(current) != len(gallery) or not all(
+                    _same_file(stored, digest) for stored, (_, digest) in zip(current, gallery)):
+                plan.images[data['slug']] = (line, [name for name, _ in gallery])
+                changes.setdefault('images', True)
+        if changes:
+            plan.updates.append((line, product, changes))
+        else:
+            report.unchanged += 1
+
+
+def import_catalog(rows, images=None, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Create and update products from ``rows`` (see ``read_rows``), with
+    image names resolved through ``images`` (DirectoryImages or ZipImages).
+    Invalid rows are skipped and reported; returns an ImportReport.
+    """
+    report = ImportReport(dry_run)
+    parsed = []
+    seen = set()
+    for line, row in rows:
+        try:
+            data = parse_row(row)
+        except ValueError as exc:
+            report.error(line, str(exc))
+            continue
+        if data['slug'] in seen:
+            report.error(line, f'duplicate slug {data["slug"]!r}')
+            continue
+        seen.add(data['slug'])
+        parsed.append((line, data))
+
+    with transaction.atomic():
+        categories = _categories({data['category'] for _, data in parsed if data.get('category')}, report, dry_run)
+        for _, data in parsed:
+            if 'category' in data:
+                data['category'] = categories.get(data['category']) if data['category'] else None
+
+        plan = _Plan()
+        for start in range(0, len(parsed), batch_size):
+            _diff(parsed[start:start + batch_size], images, report, plan)
+        report.created = [data['slug'] for _, data in plan.creates]
+        report.updated = [product.slug for _, product, _ in plan.updates]
+        report.images = len(plan.main_images) + sum(len(names) for _, names in plan.images.values())
+        if not dry_run:
+            _apply(plan, images, batch_size, report)
+    return report
+
+
+def _apply(plan, images, batch_size, report):
+    stored = {}
+    replaced = []
+
+    def store(name):
+        # Once per file: rows sharing an image share its blob (release() recounts bulk references).
+        if name not in stored:
+            stored[name] = _store(images, name)
+        return stored[name]
+
+    new = []
+    for _, data in plan.creates:
+        fields = {field: value for field, value in data.items() if field not in ('category', 'main_image', 'images')}
+        product = Product(category_id=data.get('category'), main_image=store(data['main_image']), **fields)
+        product.current_price = product.sale_price if product.sale_price is not None else product.price
+        new.append(product)
+    Product.objects.bulk_create(new, batch_size=batch_size)
+
+    by_fields = {}
+    stock_deltas = {}
+    for line, product, changes in plan.updates:
+        for field, value in changes.items():
+            if field == 'main_image':
+                replaced.append(product.main_image.name)
+                value = store(value)
+            if field == 'stock_quantity':
+                stock_deltas[product.pk] = (line, value - product.stock_quantity)
+            elif field != 'images':
+                setattr(product, field, value)
+        product.current_price = product.sale_price if product.sale_price is not None else product.price
+        fields = {field for field in changes if field not in ('images', 'stock_quantity')}
+        if fields & {'price', 'sale_price'}:
+            fields.add('current_price')
+        if fields:
+            by_fields.setdefault(frozenset(fields | {'updated_at'}), []).append(product)
+    now = timezone.now()
+    for fields, products in by_fields.items():
+        for product in products:
+            product.updated_at = now
+        Product.objects.bulk_update(products, list(fields), batch_size=batch_size)
+    # In product id order, like the reservation sweeper, so the row locks are taken in one order.
+    for pk in sorted(stock_deltas):
+        line, delta = stock_deltas[pk]
+        try:
+            if delta > 0:
+                stock.restock(pk, delta)
+            elif delta < 0:
+                stock.take(pk, -delta)
+        except stock.InsufficientStock:
+            report.error(line, f'stock_quantity not lowered: {-delta} units are no longer free to remove')
+
+    products = {product.slug: product for product in new}
+    products.update((product.slug, product) for _, product, _ in plan.updates)
+    if plan.images:
+        ids = [products[slug].pk for slug in plan.images]
+        # Per-object deletes, so the signals release each old image and its renditions.
+        for image in ProductImage.objects.filter(product_id__in=ids):
+            image.delete()
+        ProductImage.objects.bulk_create([
+            ProductImage(product=products[slug], image=store(name), is_primary=index == 0)
+            for slug, (_, names) in plan.images.items() for index, name in enumerate(names)
+        ], batch_size=batch_size)
+
+    ids = [product.pk for product in products.values()]
+    if not ids:
+        return
+    rebuild_spec_index(ids)
+    rebuild_facets()
+    transaction.on_commit(lambda: _after_import(ids, list(stored.values()), replaced))
+
+
+def _after_import(ids, stored, replaced):
+    """What the save() signals would have done for each imported product, done once."""
+    for start in range(0, len(ids), BATCH_SIZE):
+        index_objects(SearchKind.PRODUCT, Product.objects.filter(pk__in=ids[start:start + BATCH_SIZE]))
+    cache.delete_many([fragment_key(pk, name) for pk in ids for name in FRAGMENTS])
+    release(replaced)
+    purge('products')
+    sitemaps.queue_refresh('products')
+    renditions.generate_renditions(stored)
@@ -0,0 +1,148 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from core.pagination import keyset_paginate
+from product import facets
+from product.models import Product, ProductCategory, ProductSpecification
+from product.specs import rebuild_spec_index
+from product.views import PRODUCTS_PER_PAGE, SORTS, CatalogFilters, _products
+
+CATEGORIES = ('Woodfire Ovens', 'Gas Ovens', 'Hybrid Ovens', 'Accessories', 'Tools', 'Fuel')
+SPECS = {
+    'Cooking Surface': ('24 inch', '29 inch', '36 inch', '42 inch', '48 inch'),
+    'Fuel': ('Wood', 'Gas', 'Hybrid'),
+    'Max Temperature': ('450 °C', '500 °C', '550 °C'),
+    'Finish': ('Stainless Steel', 'Copper', 'Tiled', 'Stone'),
+}
+SCENARIOS = {
+    'all products': {},
+    'category': {'category': 'bench-woodfire-ovens'},
+    'price band + in stock': {'price': '50000-100000', 'in_stock': '1'},
+    'featured, by price': {'featured': '1', 'sort': 'price'},
+    'spec equality': {'spec': ['Cooking Surface:42 inch']},
+    'spec range': {'spec': ['cooking-surface:30..40in']},
+    'open spec range, by price': {'spec': ['max-temperature:500 °C..'], 'sort': 'price'},
+    'category + two specs': {'category': 'bench-gas-ovens', 'spec': ['Fuel:Gas', 'Finish:Copper']},
+}
+
+
+class _Params(dict):
+    def getlist(self, key):
+        value = self.get(key, [])
+        return value if isinstance(value, list) else [value]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic catalog and time the catalog queries against it (rolled back unless --keep)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--runs', type=int, default=20, help="Repetitions per measurement")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded products")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, products=50000, runs=20, keep=False, seed=1, **options):
+        random.seed(seed)
+        try:
+            with transaction.atomic():
+                self._seed(products)
+                self._report(runs)
+                if not keep:
+                    raise Rollback
+        except Rollback:
+            facets.invalidate()
+            self.stdout.write('Seeded catalog rolled back.')
+
+    def _seed(self, count):
+        started = time.perf_counter()
+        categories = ProductCategory.objects.bulk_create([
+            ProductCategory(name=f'{name} (benchmark)', slug=f'bench-{name.lower().replace(" ", "-")}')
+            for name in CATEGORIES
+        ])
+        batch = 2000
+        for start in range(0, count, batch):
+            rows = []
+            for i in range(start, min(start + batch, count)):
+                price = Decimal(random.randrange(5000, 800000, 500))
+                sale = price * Decimal('0.85') if random.random() < 0.15 else None
+                rows.append(Product(
+                    category=random.choice(categories), name=f'Benchmark product {i}', slug=f'benchmark-product-{i}',
+                    short_description='Seeded for benchmarking.', description='Seeded for benchmarking.',
+                    price=price, sale_price=sale, current_price=sale if sale is not None else price,
+                    main_image='products/benchmark.jpg', is_featured=random.random() < 0.05,
+                    is_active=random.random() < 0.95, stock_quantity=random.choice((0, 0, 3, 10, 25)),
+                ))
+            created = Product.objects.bulk_create(rows)
+            ProductSpecification.objects.bulk_create([
+                ProductSpecification(product=product, name=name, value=random.choice(values))
+                for product in created for name, values in SPECS.items()
+            ], batch_size=5000)
+        rebuild_spec_index(Product.objects.filter(category__in=categories).values_list('pk', flat=True))
+        facets.rebuild_facets()
+        self.stdout.write(f'Seeded {count} products in {time.perf_counter() - started:.1f}s.')
+
+    def _time(self, function, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), max(timings)
+
+    def _line(self, label, runs, function):
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        median, worst = self._time(function, runs)
+        self.stdout.write(f'  {label:<34} {median:8.2f} ms median {worst:8.2f} ms max {len(queries):3d} queries')
+
+    def _count_facets(self):
+        """What the summary table replaces: one COUNT per facet, every request."""
+        active = Product.objects.filter(is_active=True)
+        list(active.values('category').annotate(n=Count('id')))
+        active.filter(is_featured=True).count()
+        active.filter(stock_quantity__gt=0).count()
+        for low, high in zip(facets.PRICE_BANDS, facets.PRICE_BANDS[1:]):
+            active.filter(current_price__gte=low, current_price__lt=high).count()
+        list(ProductSpecification.objects.filter(product__is_active=True)
+             .values('name', 'value').annotate(n=Count('product', distinct=True)))
+
+    def _report(self, runs):
+        self.stdout.write('Facets:')
+        self._line('summary table (cold cache)', runs, lambda: (facets.invalidate(), facets.get_facets()))
+        self._line('summary table (cached)', runs, facets.get_facets)
+        self._line('COUNT per facet', max(1, runs // 4), self._count_facets)
+
+        self.stdout.write('Listings (first page, then 10 pages deep):')
+        for label, params in SCENARIOS.items():
+            filters = CatalogFilters(_Params(params))
+            ordering = SORTS[filters.sort]
+            self._line(label, runs, lambda: keyset_paginate(_products(filters), None, PRODUCTS_PER_PAGE, ordering))
+
+            def deep(filters=filters, ordering=ordering):
+                cursor = None
+                for _ in range(10):
+                    cursor = keyset_paginate(_products(filters), cursor, PRODUCTS_PER_PAGE, ordering).next_cursor
+                    if not cursor:
+                        break
+            self._line(f'{label}, page 10', max(1, runs // 4), deep)
+
+        self.stdout.write('Writes:')
+        product = Product.objects.filter(is_active=True).first()
+
+        def reprice():
+            product.sale_price = None if product.sale_price else product.price * Decimal('0.5')
+            product.save()
+        self._line('product save with facet update', runs, reprice)
+        cache.delete(facets.FACETS_KEY)
@@ -0,0 +1,34 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.importer import CatalogImportError, DirectoryImages, ZipImages, import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = "Create and update products from a CSV, JSON or XLSX catalog file, matched by slug"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file (.csv, .json or .xlsx)")
+        parser.add_argument('--images', help="Directory or ZIP archive the image columns are relative to")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, path, images=None, dry_run=False, batch_size=500, **options):
+        started = time.perf_counter()
+        try:
+            if images and os.path.isdir(images):
+                images = DirectoryImages(images)
+            elif images:
+                images = ZipImages(images)
+            with open(path, 'rb') as handle:
+                rows = read_rows(handle, path)
+            report = import_catalog(rows, images=images, dry_run=dry_run, batch_size=batch_size)
+        except (CatalogImportError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        for line, message in report.errors:
+            self.stderr.write(f'Row {line}: {message}')
+        style = self.style.WARNING if report.errors else self.style.SUCCESS
+        self.stdout.write(style(f'{report.summary()} ({time.perf_counter() - started:.1f}s)'))
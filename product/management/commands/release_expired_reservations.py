@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from product import stock
+
+
+class Command(BaseCommand):
+    help = "Return the stock of reservations that expired without being confirmed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=stock.SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, batch_size=stock.SWEEP_BATCH_SIZE, **options):
+        released = stock.release_expired(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations.'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:09
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_product_dimensions_product_meta_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='main_image',
+            field=models.ImageField(storage=core.storage.ContentAddressedStorage(), upload_to='products/'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=core.storage.ContentAddressedStorage(), upload_to='products/gallery/'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:22
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+from product.facets import price_band, spec_facet
+
+
+def fill_catalog(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductSpecification = apps.get_model('product', 'ProductSpecification')
+    FacetCount = apps.get_model('product', 'FacetCount')
+    Product.objects.update(current_price=Coalesce('sale_price', 'price'))
+
+    counts = Counter()
+    active = Product.objects.filter(is_active=True)
+    for category_id, featured, stock, price in active.values_list('category_id', 'is_featured', 'stock_quantity', 'current_price').iterator():
+        counts['price', price_band(price)] += 1
+        counts['stock', 'in' if stock > 0 else 'out'] += 1
+        if category_id:
+            counts['category', str(category_id)] += 1
+        if featured:
+            counts['featured', 'yes'] += 1
+    specs = set(ProductSpecification.objects.filter(product__is_active=True).values_list('product_id', 'name', 'value'))
+    for _, name, value in {(pk, spec_facet(name), value.strip()[:255]) for pk, name, value in specs if name and value}:
+        counts[name, value] += 1
+    FacetCount.objects.bulk_create(
+        [FacetCount(facet=facet, value=value, count=total) for (facet, value), total in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(help_text='category, price, stock, featured or spec:<name>', max_length=110)),
+                ('value', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', 'value'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='current_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'current_price', 'id'], name='product_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'category', 'current_price', 'id'], name='product_category_price_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='unique_facet_value'),
+        ),
+        migrations.RunPython(fill_catalog, migrations.RunPython.noop),
+    ]
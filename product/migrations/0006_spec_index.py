@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:28
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from product.specs import entries
+
+
+def index_specifications(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductSpecification = apps.get_model('product', 'ProductSpecification')
+    SpecValue = apps.get_model('product', 'SpecValue')
+    FacetCount = apps.get_model('product', 'FacetCount')
+
+    rows = {}
+    for product_id, name, value in ProductSpecification.objects.values_list('product_id', 'name', 'value').iterator():
+        rows.setdefault(product_id, []).append((name, value))
+    counts = Counter()
+    batch = []
+    for product_id, active, specifications in Product.objects.values_list('pk', 'is_active', 'specifications').iterator():
+        for (name, value), (label, number, unit) in entries(specifications, rows.get(product_id, ())).items():
+            batch.append(SpecValue(product_id=product_id, name=name, value=value, label=label, number=number, unit=unit))
+            if active:
+                counts[f'spec:{name}', value] += 1
+        if len(batch) >= 1000:
+            SpecValue.objects.bulk_create(batch)
+            batch = []
+    SpecValue.objects.bulk_create(batch)
+
+    # Spec facets move to the normalized names, and now include the JSON specifications.
+    FacetCount.objects.filter(facet__startswith='spec:').delete()
+    FacetCount.objects.bulk_create(
+        [FacetCount(facet=facet, value=value, count=total) for (facet, value), total in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_catalog_facets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='facetcount',
+            name='facet',
+            field=models.CharField(help_text='category, price, stock, featured or spec:<normalized name>', max_length=110),
+        ),
+        migrations.CreateModel(
+            name='SpecValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Normalized name, e.g. cooking-surface', max_length=100)),
+                ('label', models.CharField(max_length=100)),
+                ('value', models.CharField(help_text='Canonical display value, e.g. 42 in', max_length=255)),
+                ('number', models.DecimalField(blank=True, decimal_places=4, help_text='Numeric value in the base unit', max_digits=16, null=True)),
+                ('unit', models.CharField(blank=True, help_text='Base unit of number, e.g. cm', max_length=20)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spec_values', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'value', 'product'], name='spec_value_idx'), models.Index(fields=['name', 'unit', 'number', 'product'], name='spec_number_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'name', 'value'), name='unique_product_spec_value')],
+            },
+        ),
+        migrations.RunPython(index_specifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:38
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_spec_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('reference', models.CharField(blank=True, help_text='Order or quote the units are held for', max_length=100)),
+                ('expires_at', models.DateTimeField()),
+                ('confirmed_at', models.DateTimeField(blank=True, help_text='Set once the units are sold; no longer expires', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='product.product')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('confirmed_at__isnull', True)), fields=['expires_at'], name='reservation_pending_idx')],
+            },
+        ),
+    ]
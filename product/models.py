@@ -1,6 +1,11 @@
+import uuid
+
 from django.db import models
+from django.urls import reverse
 from django.utils.text import slugify
 
+from core.storage import media_storage
+
 class ProductCategory(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
@@ -30,7 +35,12 @@ class Product(models.Model):
     specifications = models.JSONField(default=dict, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    main_image = models.ImageField(upload_to='products/')
+    # sale_price when set, else price; what the catalog filters and sorts on.
+    current_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    main_image = models.ImageField(upload_to='products/', storage=media_storage)
+    # Filled in by core.renditions once the upload is processed.
+    main_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    main_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     
@@ -51,20 +61,40 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.current_price = self.sale_price if self.sale_price is not None else self.price
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'sale_price'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'current_price'}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
+    def get_absolute_url(self):
+        return reverse('product_detail', args=[self.slug])
+
+    class Meta:
+        indexes = [
+            # Catalog listings: newest first or by price, optionally within a category.
+            models.Index(fields=['is_active', '-created_at', '-id'], name='product_active_created_idx'),
+            models.Index(fields=['is_active', 'current_price', 'id'], name='product_active_price_idx'),
+            models.Index(fields=['is_active', 'category', 'current_price', 'id'], name='product_category_price_idx'),
+        ]
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='products/gallery/')
+    image = models.ImageField(upload_to='products/gallery/', storage=media_storage)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Image for {self.product.name}"
+        # The product's name only when it is already loaded; listing images must not fetch each product.
+        if ProductImage.product.is_cached(self):
+            return f"Image for {self.product.name}"
+        return f"Image for product #{self.product_id}"
 
 class ProductSpecification(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='detailed_specifications')
@@ -74,4 +104,58 @@ class ProductSpecification(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.name} - {self.product.name}"
+        if ProductSpecification.product.is_cached(self):
+            return f"{self.name} - {self.product.name}"
+        return f"{self.name} - product #{self.product_id}"
+
+class StockReservation(models.Model):
+    """Units of a product held out of stock_quantity until confirmed or expired; see product.stock."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    reference = models.CharField(max_length=100, blank=True, help_text="Order or quote the units are held for")
+    expires_at = models.DateTimeField()
+    confirmed_at = models.DateTimeField(null=True, blank=True, help_text="Set once the units are sold; no longer expires")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} × product #{self.product_id}"
+
+    class Meta:
+        indexes = [
+            # The sweeper's scan: unconfirmed holds by expiry.
+            models.Index(fields=['expires_at'], condition=models.Q(confirmed_at__isnull=True), name='reservation_pending_idx'),
+        ]
+
+class SpecValue(models.Model):
+    """One normalized specification of a product, from its JSON or its rows; maintained by product.specs."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='spec_values')
+    name = models.CharField(max_length=100, help_text="Normalized name, e.g. cooking-surface")
+    label = models.CharField(max_length=100)
+    value = models.CharField(max_length=255, help_text="Canonical display value, e.g. 42 in")
+    number = models.DecimalField(max_digits=16, decimal_places=4, null=True, blank=True, help_text="Numeric value in the base unit")
+    unit = models.CharField(max_length=20, blank=True, help_text="Base unit of number, e.g. cm")
+
+    def __str__(self):
+        return f"{self.label}: {self.value}"
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['product', 'name', 'value'], name='unique_product_spec_value')]
+        indexes = [
+            # Equality filters and facet counts; ranges and numeric equality.
+            models.Index(fields=['name', 'value', 'product'], name='spec_value_idx'),
+            models.Index(fields=['name', 'unit', 'number', 'product'], name='spec_number_idx'),
+        ]
+
+class FacetCount(models.Model):
+    """Active products per catalog facet value, kept up to date by product.facets."""
+    facet = models.CharField(max_length=110, help_text="category, price, stock, featured or spec:<normalized name>")
+    value = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.facet}={self.value} ({self.count})"
+
+    class Meta:
+        ordering = ['facet', 'value']
+        constraints = [models.UniqueConstraint(fields=['facet', 'value'], name='unique_facet_value')]
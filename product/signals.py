@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import facets
+from .fragments import invalidate_fragments
+from .models import Product, ProductCategory, ProductImage, ProductSpecification
+from .specs import sync_product_specs
+
+# Products being deleted: their specifications go first in the cascade, and
+# the product's own facets (specifications included) are removed in one go.
+_deleting = set()
+
+
+def _product_facets(product):
+    return facets.facet_values(product, facets.spec_values([product.pk])[product.pk])
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    previous = Product.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._facets_before = _product_facets(previous) if previous else set()
+    instance._specs_changed = previous is None or previous.specifications != instance.specifications
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    if getattr(instance, '_specs_changed', True):
+        sync_product_specs(instance.pk)
+    facets.adjust(facets.diff(getattr(instance, '_facets_before', set()), _product_facets(instance)))
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    _deleting.add(instance.pk)
+    instance._facets_before = _product_facets(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    _deleting.discard(instance.pk)
+    facets.adjust(facets.diff(getattr(instance, '_facets_before', set()), set()))
+
+
+def _spec_facets(product_id):
+    if not Product.objects.filter(pk=product_id, is_active=True).exists():
+        return set()
+    return facets.spec_values([product_id])[product_id]
+
+
+@receiver(pre_save, sender=ProductSpecification)
+@receiver(pre_delete, sender=ProductSpecification)
+def specification_changing(sender, instance, **kwargs):
+    if instance.product_id not in _deleting:
+        instance._facets_before = _spec_facets(instance.product_id)
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def specification_changed(sender, instance, **kwargs):
+    if instance.product_id not in _deleting:
+        sync_product_specs(instance.product_id)
+        facets.adjust(facets.diff(getattr(instance, '_facets_before', set()), _spec_facets(instance.product_id)))
+
+
+@receiver(post_delete, sender=ProductCategory)
+def category_deleted(sender, instance, **kwargs):
+    # Its products were moved to no category with a bulk UPDATE.
+    facets.rebuild_facets()
+
+
+def _fragments_changed(sender, instance, **kwargs):
+    product_id = instance.pk if sender is Product else instance.product_id
+    transaction.on_commit(lambda: invalidate_fragments(product_id))
+
+
+for model in (Product, ProductImage, ProductSpecification):
+    post_save.connect(_fragments_changed, sender=model, dispatch_uid=f'fragments_save_{model._meta.label_lower}')
+    post_delete.connect(_fragments_changed, sender=model, dispatch_uid=f'fragments_delete_{model._meta.label_lower}')
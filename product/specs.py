@@ -0,0 +1,186 @@
+"""
+Specification index.
+
+A product's specifications come from two places: the free-form
+Product.specifications JSON and its ProductSpecification rows. Neither can
+be filtered without scanning, and the same spec is spelled many ways
+("Cooking Surface: 42 inch", "cooking_surface: 42\"").
+
+SpecValue holds one row per distinct specification of a product, from
+either source, with the name normalized to a slug, the value to a
+canonical display form ("42 in") and, when it reads as a number, the
+number converted to a base unit (lengths in cm, temperatures in °C, ...).
+Equality filters use the (name, value) index, numeric equality and ranges
+the (name, unit, number) index, so "42 inch ovens" and "500 to 550 °C"
+are index range scans whatever unit the product was entered in.
+
+Saves resync the product's rows (see product.signals); bulk writes that
+skip save() call ``rebuild_spec_index``.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.utils.text import slugify
+
+from .models import Product, ProductSpecification, SpecValue
+
+MAX_NAME_LENGTH = 100
+MAX_VALUE_LENGTH = 255
+NUMBER_PLACES = Decimal('0.0001')
+
+# alias: (display unit, base unit, factor, shift); base = (number + shift) * factor
+_UNITS = {}
+for aliases, display, base, factor, shift in (
+    (('mm', 'millimeter', 'millimeters', 'millimetre', 'millimetres'), 'mm', 'cm', Decimal('0.1'), 0),
+    (('cm', 'centimeter', 'centimeters', 'centimetre', 'centimetres'), 'cm', 'cm', Decimal(1), 0),
+    (('m', 'meter', 'meters', 'metre', 'metres'), 'm', 'cm', Decimal(100), 0),
+    (('in', 'inch', 'inches', '"', '″', "''"), 'in', 'cm', Decimal('2.54'), 0),
+    (('ft', 'foot', 'feet', "'", '′'), 'ft', 'cm', Decimal('30.48'), 0),
+    (('c', '°c', 'ºc', '℃', 'deg c', 'degc', 'celsius', 'degrees c', 'degrees celsius'), '°C', 'c', Decimal(1), 0),
+    (('f', '°f', 'ºf', '℉', 'deg f', 'degf', 'fahrenheit', 'degrees f', 'degrees fahrenheit'), '°F', 'c', Decimal(5) / 9, -32),
+    (('g', 'gram', 'grams'), 'g', 'kg', Decimal('0.001'), 0),
+    (('kg', 'kgs', 'kilogram', 'kilograms'), 'kg', 'kg', Decimal(1), 0),
+    (('lb', 'lbs', 'pound', 'pounds'), 'lb', 'kg', Decimal('0.45359237'), 0),
+    (('s', 'sec', 'secs', 'second', 'seconds'), 's', 'min', Decimal(1) / 60, 0),
+    (('min', 'mins', 'minute', 'minutes'), 'min', 'min', Decimal(1), 0),
+    (('h', 'hr', 'hrs', 'hour', 'hours'), 'h', 'min', Decimal(60), 0),
+    (('w', 'watt', 'watts'), 'W', 'w', Decimal(1), 0),
+    (('kw', 'kilowatt', 'kilowatts'), 'kW', 'w', Decimal(1000), 0),
+    (('ml', 'millilitre', 'millilitres', 'milliliter', 'milliliters'), 'mL', 'l', Decimal('0.001'), 0),
+    (('l', 'litre', 'litres', 'liter', 'liters'), 'L', 'l', Decimal(1), 0),
+    (('btu', 'btus', 'btu/h', 'btu/hr'), 'BTU', 'btu', Decimal(1), 0),
+    (('%', 'percent'), '%', '%', Decimal(1), 0),
+):
+    for alias in aliases:
+        _UNITS[alias] = (display, base, factor, shift)
+
+_NUMBER = re.compile(
+    r'^\s*(?P<number>[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|[-+]?\.\d+)'
+    r'\s*-?\s*(?P<unit>[^\d\s][^\d]{0,19}?)?\s*$'
+)
+
+
+def normalize_name(name):
+    """The index key of a specification name: 'Cooking Surface' and 'cooking_surface' both give 'cooking-surface'."""
+    return slugify(str(name).replace('_', ' '))[:MAX_NAME_LENGTH]
+
+
+def parse_value(value):
+    """
+    (display value, number in base unit or None, base unit) of a raw
+    specification value; '42-inch' gives ('42 in', Decimal('106.68'), 'cm').
+    Numbers with a unit not in the table keep it as their own base unit.
+    """
+    text = ' '.join(str(value).split())[:MAX_VALUE_LENGTH]
+    match = _NUMBER.match(text)
+    if not match:
+        return text, None, ''
+    try:
+        number = Decimal(match['number'].replace(',', ''))
+    except InvalidOperation:
+        return text, None, ''
+    unit = (match['unit'] or '').strip().rstrip('.')
+    if unit.lower() in _UNITS:
+        display, base, factor, shift = _UNITS[unit.lower()]
+    elif not unit:
+        display, base, factor, shift = '', '', 1, 0
+    elif re.fullmatch(r'[^\W\d_][\w /]*', unit):
+        display, base, factor, shift = unit, unit.lower(), 1, 0
+    else:
+        return text, None, ''
+    converted = ((number + shift) * factor).quantize(NUMBER_PLACES)
+    shown = format(number.normalize(), 'f')
+    if display:
+        shown += display if display == '%' else f' {display}'
+    return shown, converted, base
+
+
+def parse_bound(text):
+    """(number in base unit, base unit) for a range bound such as '36in'; ValueError if it is not a number."""
+    _, number, unit = parse_value(text)
+    if number is None:
+        raise ValueError(f'Invalid number {text!r}')
+    return number, unit
+
+
+def _scalar(value):
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    if value is None or isinstance(value, (dict, list)):
+        return ''
+    return str(value)
+
+
+def json_specs(specifications):
+    """(label, raw value) pairs of a Product.specifications value, flattening nested objects and lists."""
+    if isinstance(specifications, list):
+        for entry in specifications:
+            if isinstance(entry, dict) and 'name' in entry:
+                yield str(entry['name']), _scalar(entry.get('value'))
+        return
+    if not isinstance(specifications, dict):
+        return
+    for label, value in specifications.items():
+        if isinstance(value, dict):
+            for child, child_value in json_specs(value):
+                yield f'{label} {child}', child_value
+        elif isinstance(value, list):
+            for item in value:
+                yield str(label), _scalar(item)
+        else:
+            yield str(label), _scalar(value)
+
+
+def entries(specifications, rows):
+    """
+    {(name, value): (label, number, unit)} of a product's specifications
+    from its JSON and its (name, value) specification rows, the rows
+    winning on duplicates.
+    """
+    found = {}
+    for label, raw in [*json_specs(specifications), *rows]:
+        name = normalize_name(label)
+        if not name or not str(raw or '').strip():
+            continue
+        value, number, unit = parse_value(raw)
+        found[name, value] = (' '.join(str(label).replace('_', ' ').split())[:MAX_NAME_LENGTH], number, unit)
+    return found
+
+
+def sync_product_specs(product_id):
+    """Bring ``product_id``'s SpecValue rows in line with its specifications."""
+    specifications = Product.objects.filter(pk=product_id).values_list('specifications', flat=True).first()
+    rows = ProductSpecification.objects.filter(product_id=product_id).values_list('name', 'value')
+    wanted = entries(specifications, rows)
+    current = {
+        (name, value): pk
+        for pk, name, value in SpecValue.objects.filter(product_id=product_id).values_list('pk', 'name', 'value')
+    }
+    removed = [pk for key, pk in current.items() if key not in wanted]
+    if removed:
+        SpecValue.objects.filter(pk__in=removed).delete()
+    SpecValue.objects.bulk_create([
+        SpecValue(product_id=product_id, name=name, value=value, label=label, number=number, unit=unit)
+        for (name, value), (label, number, unit) in wanted.items() if (name, value) not in current
+    ])
+
+
+def rebuild_spec_index(product_ids=None, batch_size=500):
+    """Rebuild the SpecValue rows of ``product_ids`` (or of every product) from scratch."""
+    products = Product.objects.order_by('pk')
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    products = products.values_list('pk', 'specifications').iterator(chunk_size=batch_size)
+    while batch := list(islice(products, batch_size)):
+        ids = [product_id for product_id, _ in batch]
+        rows = {product_id: [] for product_id in ids}
+        for product_id, name, value in (ProductSpecification.objects
+                .filter(product_id__in=ids).values_list('product_id', 'name', 'value')):
+            rows[product_id].append((name, value))
+        SpecValue.objects.filter(product_id__in=ids).delete()
+        SpecValue.objects.bulk_create([
+            SpecValue(product_id=product_id, name=name, value=value, label=label, number=number, unit=unit)
+            for product_id, specifications in batch
+            for (name, value), (label, number, unit) in entries(specifications, rows[product_id]).items()
+        ], batch_size=1000)
@@ -0,0 +1,137 @@
+"""
+Stock reservations.
+
+Product.stock_quantity is the number of units free to sell. Every change
+to it here is a single conditional UPDATE; nothing reads the count, does
+arithmetic in Python and writes it back. Taking units is
+``UPDATE ... SET stock_quantity = stock_quantity - n WHERE stock_quantity >= n``:
+the database checks and decrements under the row lock in one statement,
+so two buyers of the last unit cannot both succeed. The lock lasts only
+as long as that short transaction, so concurrent reservations of one SKU
+queue for microseconds, not for the length of a checkout.
+
+``reserve`` takes units into a StockReservation that expires. ``confirm``
+makes the hold permanent once the order goes through, and ``release``
+returns the units. ``release_expired`` (the release_expired_reservations
+command, run from cron) returns the units of holds nobody confirmed. Each
+hold is given back at most once: whichever of release and the sweeper
+deletes the row is the one that credits the stock.
+
+These writes send no signals, so the stock facet and cached pages are
+updated here, and only when a product's stock crosses zero.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.pagecache import purge
+
+from . import facets
+from .models import Product, StockReservation
+
+DEFAULT_TTL = timedelta(minutes=15)
+SWEEP_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def reservation_ttl():
+    return getattr(settings, 'STOCK_RESERVATION_TTL', DEFAULT_TTL)
+
+
+def _crossed_zero(product_id, delta):
+    """After changing a product's stock by ``delta``, fix the stock facet and pages if it crossed zero."""
+    remaining, active = Product.objects.filter(pk=product_id).values_list('stock_quantity', 'is_active').get()
+    before = remaining - delta
+    if (remaining > 0) == (before > 0):
+        return
+    if active:
+        status = {True: 'in', False: 'out'}
+        facets.adjust({('stock', status[before > 0]): -1, ('stock', status[remaining > 0]): 1})
+    transaction.on_commit(lambda: purge('products'))
+
+
+def take(product_id, quantity):
+    """Remove ``quantity`` units from stock outright; InsufficientStock if fewer are available."""
+    if quantity <= 0:
+        raise ValueError('quantity must be positive')
+    with transaction.atomic():
+        taken = (Product.objects
+            .filter(pk=product_id, stock_quantity__gte=quantity)
+            .update(stock_quantity=F('stock_quantity') - quantity))
+        if not taken:
+            raise InsufficientStock(f'Fewer than {quantity} units of product #{product_id} in stock')
+        _crossed_zero(product_id, -quantity)
+
+
+def restock(product_id, quantity):
+    """Return ``quantity`` units to stock."""
+    if quantity <= 0:
+        raise ValueError('quantity must be positive')
+    with transaction.atomic():
+        Product.objects.filter(pk=product_id).update(stock_quantity=F('stock_quantity') + quantity)
+        _crossed_zero(product_id, quantity)
+
+
+def reserve(product_id, quantity, reference='', ttl=None):
+    """Hold ``quantity`` units for ``ttl`` (STOCK_RESERVATION_TTL); the StockReservation, or InsufficientStock."""
+    with transaction.atomic():
+        take(product_id, quantity)
+        return StockReservation.objects.create(
+            product_id=product_id, quantity=quantity, reference=reference,
+            expires_at=timezone.now() + (ttl or reservation_ttl()),
+        )
+
+
+def confirm(reservation_id):
+    """Make a pending, unexpired hold permanent; False if it has expired or was released."""
+    now = timezone.now()
+    return bool(StockReservation.objects
+        .filter(pk=reservation_id, confirmed_at=None, expires_at__gt=now)
+        .update(confirmed_at=now))
+
+
+def release(reservation_id):
+    """Give a pending hold's units back; False if it was already confirmed, released or swept."""
+    with transaction.atomic():
+        reservation = StockReservation.objects.filter(pk=reservation_id, confirmed_at=None).values_list(
+            'product_id', 'quantity').first()
+        if reservation is None:
+            return False
+        # Only the caller whose DELETE removes the row credits the stock.
+        deleted, _ = StockReservation.objects.filter(pk=reservation_id, confirmed_at=None).delete()
+        if not deleted:
+            return False
+        restock(*reservation)
+        return True
+
+
+def release_expired(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Release every pending hold that has expired; returns how many were released."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            # SKIP LOCKED: holds being confirmed or released right now are left
+            # for the next run instead of making the sweeper wait on them.
+            expired = list(StockReservation.objects
+                .select_for_update(skip_locked=True)
+                .filter(confirmed_at=None, expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('pk', 'product_id', 'quantity')[:batch_size])
+            if not expired:
+                return released
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in expired]).delete()
+            returned = Counter()
+            for _, product_id, quantity in expired:
+                returned[product_id] += quantity
+            # In product id order, so concurrent sweepers lock products in the same order.
+            for product_id in sorted(returned):
+                restock(product_id, returned[product_id])
+            released += len(expired)
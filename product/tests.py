@@ -1,3 +1,311 @@
-from django.test import TestCase
+import base64
+import io
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.models import ImageRendition
+from core.pagecache import purge
+from core.testing import MediaTestCase
+from users.models import User
+from . import stock
+from .facets import get_facets
+from .importer import import_catalog
+from .models import (
+    FacetCount, Product, ProductCategory, ProductImage, ProductSpecification, SpecValue, StockReservation,
+)
+
+
+def _product(slug, quantity):
+    return Product.objects.create(name=slug, slug=slug, short_description='x', description='x', price=1000,
+                                  main_image=f'products/{slug}.jpg', stock_quantity=quantity)
+
+
+class ProductCatalogTests(MediaTestCase):
+    def test_facet_counts_follow_saves_and_filter_the_listing(self):
+        def count(facet, value):
+            return FacetCount.objects.filter(facet=facet, value=value).values_list('count', flat=True).first() or 0
+
+        ovens = ProductCategory.objects.create(name='Ovens', slug='ovens')
+        tools = ProductCategory.objects.create(name='Tools', slug='tools')
+        with self.captureOnCommitCallbacks(execute=True):
+            big = Product.objects.create(category=ovens, name='Big', slug='big', short_description='x', description='x',
+                                         price=120000, main_image='products/big.jpg', stock_quantity=2)
+            Product.objects.create(category=ovens, name='Small', slug='small', short_description='x', description='x',
+                                   price=40000, sale_price=30000, main_image='products/small.jpg')
+            Product.objects.create(category=tools, name='Peel', slug='peel', short_description='x', description='x',
+                                   price=2000, main_image='products/peel.jpg', stock_quantity=9)
+            ProductSpecification.objects.create(product=big, name='Fuel', value='Wood')
+        self.assertEqual(count('category', str(ovens.pk)), 2)
+        self.assertEqual(count('price', '100000-200000'), 1)
+        self.assertEqual(count('stock', 'in'), 2)
+        self.assertEqual(count('spec:fuel', 'Wood'), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            big.is_active = False
+            big.save()
+        self.assertEqual(count('category', str(ovens.pk)), 1)
+        self.assertEqual(count('spec:fuel', 'Wood'), 0)
+        self.assertEqual([entry['count'] for entry in get_facets()['category']], [1, 1])
+
+        response = self.client.get('/products/', {'category': 'ovens', 'format': 'json'})
+        self.assertEqual([product['slug'] for product in response.json()['results']], ['small'])
+        response = self.client.get('/products/', {'sort': 'price', 'format': 'json'})
+        self.assertEqual([product['slug'] for product in response.json()['results']], ['peel', 'small'])
+        self.assertEqual(self.client.get('/products/', {'spec': 'nocolon'}).status_code, 400)
+        for bad in ({'price': 'a-b'}, {'price': '1-2'}, {'min_price': 'NaN'}, {'min_price': 'sNaN'},
+                    {'max_price': 'Infinity'}, {'min_price': '1e999999'}):
+            self.assertEqual(self.client.get('/products/', bad).status_code, 400, bad)
+        for cursor in ('[1,2]', '[{},1]', '[null,1]', '["2025-01-01T00:00:00",{}]'):
+            token = base64.urlsafe_b64encode(cursor.encode()).decode().rstrip('=')
+            self.assertEqual(self.client.get('/products/', {'cursor': token}).status_code, 400, cursor)
+        def slugs(**params):
+            response = self.client.get('/products/', {'sort': 'price', 'format': 'json', **params})
+            return [product['slug'] for product in response.json()['results']]
+
+        # An explicit max_price includes the bound; a band leaves out its upper edge.
+        self.assertEqual(slugs(min_price='2000', max_price='30000'), ['peel', 'small'])
+        self.assertEqual(slugs(min_price='1999.991', max_price='29999.999'), ['peel'])
+        self.assertEqual(slugs(price='0-25000'), ['peel'])
+
+    def test_admin_actions_purge_cached_catalog_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = _product('forno', 1)
+        self.client.get('/products/')
+        self.assertEqual(self.client.get('/products/')['X-Page-Cache'], 'HIT')
+
+        admin = Client()
+        admin.force_login(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.post(reverse('custom_admin:product_product_changelist'),
+                       {'action': 'make_inactive', '_selected_action': [product.pk]})
+        response = self.client.get('/products/')
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, '/products/forno/')
+        self.assertFalse(FacetCount.objects.filter(facet='stock', value='in').exists())
+
+    def test_spec_index_merges_sources_and_filters_by_unit(self):
+        def create(slug, **fields):
+            return Product.objects.create(name=slug, slug=slug, short_description='x', description='x', price=1000,
+                                          main_image=f'products/{slug}.jpg', **fields)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            metric = create('metric', specifications={'Cooking Surface': '106.68 cm', 'Fuel': ['Wood', 'Gas']})
+            imperial = create('imperial')
+            ProductSpecification.objects.create(product=imperial, name='cooking_surface', value='42-inch')
+            create('small', specifications={'cooking surface': '24"', 'Max temperature': '932 °F'})
+        self.assertEqual(
+            set(SpecValue.objects.filter(product=metric).values_list('name', 'value', 'number', 'unit')),
+            {('cooking-surface', '106.68 cm', Decimal('106.68'), 'cm'), ('fuel', 'Wood', None, ''), ('fuel', 'Gas', None, '')},
+        )
+
+        def slugs(*specs):
+            response = self.client.get('/products/', {'spec': specs, 'sort': 'price', 'format': 'json'})
+            return sorted(product['slug'] for product in response.json()['results'])
+
+        self.assertEqual(slugs('Cooking Surface:42 inch'), ['imperial', 'metric'])
+        self.assertEqual(slugs('cooking-surface:30..50 in'), ['imperial', 'metric'])
+        self.assertEqual(slugs('cooking-surface:..70cm'), ['small'])
+        self.assertEqual(slugs('max-temperature:500 °C..'), ['small'])
+        self.assertEqual(slugs('fuel:Gas', 'cooking-surface:40in..'), ['metric'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            metric.specifications = {'Fuel': 'Wood'}
+            metric.save()
+        self.assertEqual(slugs('fuel:Gas'), [])
+        self.assertEqual(self.client.get('/products/', {'spec': 'cooking-surface:1in..2kg'}).status_code, 400)
+
+    def test_detail_page_caches_fragments_until_the_product_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Forno', slug='forno', short_description='x', description='x',
+                                             price=90000, main_image='products/forno.jpg',
+                                             specifications={'Fuel': 'Wood'})
+            for name in ('a.jpg', 'b.jpg'):
+                ProductImage.objects.create(product=product, image=f'products/gallery/{name}')
+            spec = ProductSpecification.objects.create(product=product, name='Cooking Surface', value='42 inch')
+        # The gallery is cached once its images have renditions.
+        for name in ('a', 'b'):
+            ImageRendition.objects.create(source=f'products/gallery/{name}.jpg', width=480, height=360, format='jpeg',
+                                          file=f'renditions/{name}-480.jpg', size=1)
+        cache.clear()
+
+        with self.assertNumQueries(5):
+            response = self.client.get(product.get_absolute_url())
+        self.assertContains(response, '<th scope="row">Cooking Surface</th>', html=False)
+        self.assertContains(response, 'renditions/b-480.jpg')
+        purge('products')
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get('/products/forno/'), '42 inch')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            spec.value = '48 inch'
+            spec.save()
+        purge('products')
+        self.assertContains(self.client.get('/products/forno/'), '48 inch')
+        self.assertEqual(self.client.get('/products/missing/').status_code, 404)
+
+        image = ProductImage.objects.first()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(image), f'Image for product #{product.pk}')
+
+    def test_import_diffs_by_slug_and_stores_each_image_once(self):
+        images = tempfile.mkdtemp()
+        Image.new('RGB', (64, 48), (200, 40, 20)).save(os.path.join(images, 'forno.jpg'), 'JPEG')
+        catalog = os.path.join(images, 'catalog.csv')
+
+        def run(body, *args):
+            with open(catalog, 'w') as handle:
+                handle.write('slug,name,category,price,sale_price,stock_quantity,main_image,spec:Cooking Surface\n' + body)
+            out, err = io.StringIO(), io.StringIO()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('import_products', catalog, '--images', images, *args, stdout=out, stderr=err)
+            return out.getvalue() + err.getvalue()
+
+        rows = 'forno,Forno,Ovens,90000,,3,forno.jpg,42 inch\npeel,Peel,Tools,abc,,1,forno.jpg,\n'
+        self.assertIn('Would import: 1 created', run(rows, '--dry-run'))
+        self.assertFalse(Product.objects.exists())
+
+        output = run(rows)
+        self.assertIn('1 created, 0 updated', output)
+        self.assertIn('Row 3: price is not a number', output)
+        forno = Product.objects.get(slug='forno')
+        self.assertEqual((forno.category, forno.current_price, forno.stock_quantity),
+                         (ProductCategory.objects.get(name='Ovens'), 90000, 3))
+        self.assertRegex(forno.main_image.name, r'^cas/')
+        self.assertTrue(ImageRendition.objects.filter(source=forno.main_image.name).exists())
+        self.assertTrue(SpecValue.objects.filter(product=forno, name='cooking-surface', value='42 in').exists())
+
+        self.assertIn('0 created, 0 updated, 1 unchanged', run('forno,Forno,Ovens,90000,,3,forno.jpg,42 inch\n'))
+        self.assertIn('0 created, 1 updated', run('forno,Forno,Ovens,90000,75000,3,forno.jpg,42 inch\n'))
+        self.assertEqual(Product.objects.get(slug='forno').current_price, 75000)
+        self.assertEqual(self.client.get('/products/', {'price': '50000-100000', 'format': 'json'}).json()['results'][0]['slug'], 'forno')
+
+        # New stock counts go through the stock service as differences.
+        stock.reserve(forno.pk, 1)
+        with mock.patch('product.stock.restock', wraps=stock.restock) as restocked:
+            self.assertIn('0 created, 1 updated', run('forno,Forno,Ovens,90000,75000,5,forno.jpg,42 inch\n'))
+        restocked.assert_called_once_with(forno.pk, 3)
+        self.assertEqual(Product.objects.get(slug='forno').stock_quantity, 5)
+
+    def test_import_reports_values_the_fields_cannot_hold(self):
+        Product.objects.create(name='Peel', slug='peel', short_description='x', description='x',
+                               price=20, main_image='products/peel.jpg')
+        rows = [
+            (2, {'slug': 'peel', 'features': '', 'meta_description': 'Long handled'}),
+            (3, {'slug': 'tray', 'name': 'P' * 201}),
+            (4, {'slug': 'brush', 'name': 'Brush', 'price': '123456789.00'}),
+            (5, {'slug': 'cover', 'name': 'Cover', 'price': '10', 'meta_title': 'T' * 61}),
+            (6, {'slug': 'stand', 'name': 'Stand', 'price': '10', 'stock_quantity': '9' * 20}),
+            (7, {'slug': 'fuel', 'name': 'Fuel', 'price': '10', 'weight': 'NaN'}),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_catalog(rows)
+        self.assertEqual([message.split(':')[0] for _, message in report.errors],
+                         ['name', 'price', 'meta_title', 'stock_quantity', 'weight'])
+        self.assertIn('Ensure this value has at most 200 characters', report.errors[0][1])
+        self.assertEqual(report.updated, ['peel'])
+        peel = Product.objects.get(slug='peel')
+        self.assertEqual((peel.name, peel.price, peel.features, peel.meta_description),
+                         ('Peel', 20, None, 'Long handled'))
+
+        # A blank nullable column matches the NULL stored for it.
+        report = import_catalog([(2, {'slug': 'peel', 'features': '', 'meta_description': 'Long handled'})])
+        self.assertEqual((report.updated, report.unchanged), ([], 1))
+
+
+class StockReservationTests(TestCase):
+    def test_holds_expire_back_into_stock_once(self):
+        product = _product('forno', 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = stock.reserve(product.pk, 1, reference='order-1')
+            lapsed = stock.reserve(product.pk, 2, ttl=timedelta(minutes=-1))
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 0)
+        self.assertEqual(FacetCount.objects.get(facet='stock', value='out').count, 1)
+        with self.assertRaises(stock.InsufficientStock):
+            stock.reserve(product.pk, 1)
+
+        self.assertTrue(stock.confirm(kept.pk))
+        self.assertFalse(stock.confirm(lapsed.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(stock.release_expired(), 1)
+        self.assertFalse(stock.release(lapsed.pk))
+        self.assertFalse(stock.release(kept.pk))
+        self.assertEqual(stock.release_expired(), 0)
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 2)
+        self.assertEqual(list(StockReservation.objects.values_list('pk', flat=True)), [kept.pk])
+        self.assertEqual({entry['value']: entry['count'] for entry in get_facets()['stock']}.get('in'), 1)
+
+    def test_admin_changes_stock_only_through_the_stock_service(self):
+        product = _product('forno', 3)
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+        change = self.client.get(reverse('custom_admin:product_product_change', args=[product.pk]))
+        self.assertNotContains(change, 'name="stock_quantity"')
+
+        stock.reserve(product.pk, 2)
+        changelist = reverse('custom_admin:product_product_changelist')
+        for action, quantity in (('take_stock', 2), ('restock_products', 5), ('take_stock', '')):
+            self.client.post(changelist, {'action': action, '_selected_action': [product.pk], 'quantity': quantity})
+        product.refresh_from_db()
+        # 3 - 2 held; taking 2 more is refused, restocking 5 is not, and no quantity does nothing.
+        self.assertEqual(product.stock_quantity, 6)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class StockConcurrencyTests(TransactionTestCase):
+    THREADS = 24
+    STOCK = 10
+
+    def test_concurrent_reservations_never_oversell(self):
+        product = _product('last-ovens', self.STOCK)
+        start = threading.Barrier(self.THREADS)
+        held, refused, errors, waits = [], [], [], []
+
+        def buyer():
+            try:
+                start.wait()
+                started = time.perf_counter()
+                try:
+                    held.append(stock.reserve(product.pk, 1, ttl=timedelta(minutes=5)).pk)
+                except stock.InsufficientStock:
+                    refused.append(1)
+                waits.append(time.perf_counter() - started)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(held), self.STOCK)
+        self.assertEqual(len(refused), self.THREADS - self.STOCK)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 0)
+        self.assertEqual(sum(StockReservation.objects.values_list('quantity', flat=True)), self.STOCK)
+        # Each hold locks the row for one short transaction; nobody queues
+        # behind a whole checkout.
+        self.assertLess(max(waits), 5)
+
+        StockReservation.objects.filter(pk__in=held[:4]).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(stock.release_expired(), 4)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 4)
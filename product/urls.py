@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import product_detail, product_list
+
+urlpatterns = [
+    path('', product_list, name='products'),
+    path('<slug:slug>/', product_detail, name='product_detail'),
+]
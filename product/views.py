@@ -1,3 +1,191 @@
-from django.shortcuts import render
+import re
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal, InvalidOperation
 
-# Create your views here.
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+
+from core import renditions
+from core.pagecache import page_tags
+from core.pagination import InvalidCursor, keyset_paginate
+from product.facets import band_range, get_facets
+from product.fragments import get_fragments
+from product.models import Product, SpecValue
+from product.specs import normalize_name, parse_bound, parse_value
+
+PRODUCTS_PER_PAGE = 12
+SORTS = {
+    'newest': ('-created_at', '-id'),
+    'price': ('current_price', 'id'),
+    '-price': ('-current_price', '-id'),
+}
+LIST_FIELDS = (
+    'name', 'slug', 'short_description', 'price', 'sale_price', 'current_price', 'main_image',
+    'main_image_width', 'main_image_height', 'stock_quantity', 'is_featured', 'created_at',
+    'category__name', 'category__slug',
+)
+# Price bounds beyond what current_price (10 digits, 2 decimal places) holds are rejected.
+PRICE_LIMIT = Decimal(10) ** 8
+CENT = Decimal('0.01')
+
+
+def _unit_of(bound):
+    return re.sub(r'^[-+]?[\d,.]+', '', bound)
+
+
+class CatalogFilters:
+    """
+    The catalog filters in a query string; ValueError for malformed ones.
+
+    ``spec`` repeats as ``name:value`` for equality ('cooking-surface:42 in',
+    which also matches products entered as 106.68 cm) or ``name:low..high``
+    for a range with either end open ('max-temperature:500 °C..').
+    """
+
+    def __init__(self, params):
+        self.category = params.get('category') or ''
+        # Prices are whole cents, so rounding the bounds inwards to cents selects the same products.
+        self.min_price = self._price(params.get('min_price'), ROUND_CEILING)
+        self.max_price = self._price(params.get('max_price'), ROUND_FLOOR)
+        self.max_inclusive = True
+        self.price_band = params.get('price') or ''
+        if self.price_band:
+            # Bands are half-open, so a price on an edge falls in exactly one.
+            self.min_price, self.max_price = band_range(self.price_band)
+            self.max_inclusive = False
+        self.in_stock = params.get('in_stock') == '1'
+        self.featured = params.get('featured') == '1'
+        self.spec_tokens = params.getlist('spec')
+        self.specs = [self._spec(token) for token in self.spec_tokens]
+        self.sort = params.get('sort') or 'newest'
+        if self.sort not in SORTS:
+            raise ValueError('Invalid sort')
+
+    @staticmethod
+    def _spec(token):
+        """The SpecValue lookups of one spec filter."""
+        name, separator, value = token.partition(':')
+        name = normalize_name(name)
+        if not separator or not name or not value.strip():
+            raise ValueError(f'Invalid spec filter {token!r}')
+        if '..' not in value:
+            value, number, unit = parse_value(value)
+            if number is None:
+                return {'name': name, 'value': value}
+            return {'name': name, 'unit': unit, 'number': number}
+        low, high = (bound.strip() for bound in value.split('..', 1))
+        if not low and not high:
+            raise ValueError(f'Invalid spec filter {token!r}')
+        # '36..48 in': a bare number takes the unit of the other bound.
+        if low and high:
+            low_unit, high_unit = _unit_of(low), _unit_of(high)
+            low, high = low if low_unit else low + high_unit, high if high_unit else high + low_unit
+        lookups = {'name': name}
+        units = set()
+        for bound, lookup in ((low, 'number__gte'), (high, 'number__lte')):
+            if bound:
+                lookups[lookup], unit = parse_bound(bound)
+                units.add(unit)
+        if len(units) > 1:
+            raise ValueError(f'Mismatched units in {token!r}')
+        # Without a unit, any unit matches.
+        if units != {''}:
+            lookups['unit'] = units.pop()
+        return lookups
+
+    @staticmethod
+    def _price(value, rounding):
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(f'Invalid price {value!r}')
+        if not price.is_finite() or abs(price) >= PRICE_LIMIT:
+            raise ValueError(f'Invalid price {value!r}')
+        return price.quantize(CENT, rounding=rounding)
+
+    def apply(self, products):
+        if self.category:
+            products = products.filter(category__slug=self.category)
+        if self.min_price is not None:
+            products = products.filter(current_price__gte=self.min_price)
+        if self.max_price is not None:
+            lookup = 'current_price__lte' if self.max_inclusive else 'current_price__lt'
+            products = products.filter(**{lookup: self.max_price})
+        if self.in_stock:
+            products = products.filter(stock_quantity__gt=0)
+        if self.featured:
+            products = products.filter(is_featured=True)
+        # IN rather than a correlated EXISTS: the subquery is one range scan of
+        # the spec index instead of one per candidate product.
+        for lookups in self.specs:
+            products = products.filter(pk__in=SpecValue.objects.filter(**lookups).values('product_id'))
+        return products
+
+    @property
+    def selected_specs(self):
+        return set(self.spec_tokens)
+
+
+def _products(filters):
+    products = (Product.objects
+        .filter(is_active=True)
+        .select_related('category')
+        .only(*LIST_FIELDS))
+    return filters.apply(products)
+
+
+def _product_json(product):
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'slug': product.slug,
+        'url': product.get_absolute_url(),
+        'short_description': product.short_description,
+        'category': product.category.name if product.category else None,
+        'price': str(product.price),
+        'sale_price': str(product.sale_price) if product.sale_price is not None else None,
+        'in_stock': product.stock_quantity > 0,
+        'is_featured': product.is_featured,
+        'image': product.main_image.url if product.main_image else None,
+        'image_width': product.main_image_width,
+        'image_height': product.main_image_height,
+    }
+
+
+@page_tags('products')
+def product_list(request):
+    try:
+        filters = CatalogFilters(request.GET)
+        page = keyset_paginate(_products(filters), request.GET.get('cursor'), PRODUCTS_PER_PAGE, SORTS[filters.sort])
+    except (ValueError, InvalidCursor):
+        return HttpResponseBadRequest('Invalid filter')
+    renditions.prime(product.main_image.name for product in page)
+
+    fmt = request.GET.get('format')
+    if fmt == 'json':
+        return JsonResponse({'results': [_product_json(product) for product in page], 'next_cursor': page.next_cursor})
+    if fmt == 'html':
+        return JsonResponse({
+            'html': render_to_string('components/product_cards.html', {'products': page}, request=request),
+            'next_cursor': page.next_cursor,
+        })
+    return render(request, 'products.html', {
+        'products': page,
+        'facets': get_facets(),
+        'filters': filters,
+        'title': 'Products',
+    })
+
+
+@page_tags('products')
+def product_detail(request, slug):
+    product = get_object_or_404(Product.objects.select_related('category'), slug=slug, is_active=True)
+    renditions.prime([product.main_image.name])
+    return render(request, 'product_detail.html', {
+        'product': product,
+        'fragments': get_fragments(product),
+        'title': product.meta_title or product.name,
+        'og_description': product.meta_description or product.short_description,
+    })
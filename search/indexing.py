@@ -0,0 +1,306 @@
+"""
+Inverted index over blogs, products, FAQs and gallery items.
+
+Each searchable object becomes one SearchDocument (what a result shows)
+plus one SearchTerm row per distinct token, weighted by which fields the
+token appears in. Queries aggregate matching SearchTerm rows per document,
+so a search is a single indexed scan of the terms table regardless of how
+many content types are involved.
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+from blog.models import Blog
+from core.text import tokenize
+from faq.models import FAQ
+from gallery.models import GalleryItem
+from product.models import Product
+from .models import SearchDocument, SearchKind, SearchTerm, SearchVocabulary
+
+MAX_TERM_LENGTH = 64
+MIN_TERM_LENGTH = 2
+# Shortest trailing token expanded as a prefix, and the most terms it expands to.
+MIN_PREFIX_LENGTH = 3
+PREFIX_EXPANSIONS = 20
+# Query terms found in more than this share of documents are dropped when the
+# query has rarer terms too; they barely change the ranking but dominate the cost.
+COMMON_TERM_RATIO = 0.5
+DOCUMENT_TOTAL_CACHE_KEY = 'search:document_total'
+
+
+def _file_url(field):
+    return field.url if field else ''
+
+
+def _blog_entry(blog):
+    return {
+        'visible': blog.is_published,
+        'title': blog.title,
+        'url': f'/blogs/{blog.slug}/',
+        'summary': blog.excerpt or blog.content,
+        'image': _file_url(blog.featured_image),
+        'fields': [(blog.title, 3.0), (blog.meta_keywords, 2.0), (blog.excerpt, 1.5), (blog.content, 1.0)],
+    }
+
+
+def _product_entry(product):
+    return {
+        'visible': product.is_active,
+        'title': product.name,
+        'url': f'/products/{product.slug}/',
+        'summary': product.short_description,
+        'image': _file_url(product.main_image),
+        'fields': [
+            (product.name, 3.0), (product.meta_keywords, 2.0), (product.short_description, 1.5),
+            (product.features, 1.0), (product.description, 1.0),
+        ],
+    }
+
+
+def _faq_entry(faq):
+    return {
+        'visible': faq.is_active and faq.category.is_active,
+        'title': faq.question,
+        'url': f'/faq/#{faq.category.slug}',
+        'summary': faq.answer,
+        'image': '',
+        'fields': [(faq.question, 3.0), (faq.category.name, 1.5), (faq.answer, 1.0)],
+    }
+
+
+def _gallery_entry(item):
+    thumbnail = item.thumbnail_path or (item.file_path if item.media_type == 'image' else None)
+    return {
+        'visible': item.is_active,
+        'title': item.title,
+        'url': '/gallery/',
+        'summary': item.description or item.alt_text or '',
+        'image': _file_url(thumbnail),
+        'fields': [(item.title, 3.0), (item.tags, 2.0), (item.alt_text, 1.5), (item.description, 1.0)],
+    }
+
+
+# kind -> (model, entry builder, related fields the builder needs)
+SOURCES = {
+    SearchKind.BLOG: (Blog, _blog_entry, ()),
+    SearchKind.PRODUCT: (Product, _product_entry, ()),
+    SearchKind.FAQ: (FAQ, _faq_entry, ('category',)),
+    SearchKind.GALLERY: (GalleryItem, _gallery_entry, ()),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+
+def term_weights(fields):
+    """Field-weighted, length-normalised log term frequencies."""
+    counts = Counter()
+    for text, weight in fields:
+        for token in tokenize(text, min_length=MIN_TERM_LENGTH):
+            counts[token[:MAX_TERM_LENGTH]] += weight
+    if not counts:
+        return {}
+    length_norm = 1 + math.log(sum(counts.values()))
+    return {term: (1 + math.log(tf)) / length_norm for term, tf in counts.items()}
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _drop_terms(document_ids):
+    """Delete the postings of ``document_ids`` and return the document frequency changes."""
+    deltas = Counter()
+    for term in SearchTerm.objects.filter(document_id__in=document_ids).values_list('term', flat=True):
+        deltas[term] -= 1
+    SearchTerm.objects.filter(document_id__in=document_ids).delete()
+    return deltas
+
+
+def _apply_document_counts(deltas):
+    """Apply {term: change} to SearchVocabulary, one UPDATE per distinct change."""
+    SearchVocabulary.objects.bulk_create(
+        [SearchVocabulary(term=term) for term, delta in deltas.items() if delta > 0],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for term, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(term)
+    for delta, terms in by_delta.items():
+        for chunk in _chunks(terms, 1000):
+            SearchVocabulary.objects.filter(term__in=chunk).update(document_count=F('document_count') + delta)
+
+
+def index_objects(kind, objects):
+    """Add, refresh or drop the index entries of ``objects`` (all of one kind)."""
+    _, build_entry, _ = SOURCES[kind]
+    documents = {}
+    terms = {}
+    hidden = []
+    for obj in objects:
+        entry = build_entry(obj)
+        if not entry['visible']:
+            hidden.append(obj.pk)
+            continue
+        documents[obj.pk] = SearchDocument(
+            kind=kind,
+            object_id=obj.pk,
+            title=Truncator(entry['title']).chars(255),
+            url=entry['url'],
+            summary=Truncator(strip_tags(entry['summary'] or '')).chars(300),
+            image=entry['image'],
+        )
+        terms[obj.pk] = term_weights(entry['fields'])
+
+    with transaction.atomic():
+        if hidden:
+            remove_objects(kind, hidden)
+        if not documents:
+            return 0
+        SearchDocument.objects.bulk_create(
+            documents.values(),
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['title', 'url', 'summary', 'image', 'updated_at'],
+        )
+        document_ids = dict(
+            SearchDocument.objects.filter(kind=kind, object_id__in=list(documents)).values_list('object_id', 'id')
+        )
+        deltas = _drop_terms(list(document_ids.values()))
+        SearchTerm.objects.bulk_create([
+            SearchTerm(term=term, document_id=document_ids[object_id], kind=kind, weight=weight)
+            for object_id, weights in terms.items()
+            for term, weight in weights.items()
+        ], batch_size=2000)
+        for weights in terms.values():
+            deltas.update(dict.fromkeys(weights, 1))
+        _apply_document_counts(deltas)
+    return len(documents)
+
+
+def remove_objects(kind, object_ids):
+    with transaction.atomic():
+        document_ids = list(
+            SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).values_list('id', flat=True)
+        )
+        if document_ids:
+            _apply_document_counts(_drop_terms(document_ids))
+            SearchDocument.objects.filter(id__in=document_ids).delete()
+
+
+def reindex(kind, object_ids, batch_size=500):
+    """Refresh the entries of ``object_ids`` from the database, e.g. after a queryset update()."""
+    model, _, related = SOURCES[kind]
+    for chunk in _chunks(object_ids, batch_size):
+        index_objects(kind, model.objects.select_related(*related).filter(pk__in=chunk))
+
+
+def recount_vocabulary():
+    """Rebuild SearchVocabulary and its document counts from the postings."""
+    with transaction.atomic():
+        SearchVocabulary.objects.all().delete()
+        rows = SearchTerm.objects.values('term').annotate(documents=Count('id')).order_by('term')
+        SearchVocabulary.objects.bulk_create(
+            (SearchVocabulary(term=row['term'], document_count=row['documents']) for row in rows.iterator()),
+            batch_size=2000,
+        )
+    cache.delete(DOCUMENT_TOTAL_CACHE_KEY)
+
+
+def rebuild(kinds=None, batch_size=500):
+    """Re-index every object of the given kinds from scratch. Returns documents indexed per kind."""
+    indexed = {}
+    for kind in kinds or SOURCES:
+        model, _, related = SOURCES[kind]
+        SearchDocument.objects.filter(kind=kind).delete()
+        indexed[kind] = 0
+        batch = []
+        for obj in model.objects.select_related(*related).order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                indexed[kind] += index_objects(kind, batch)
+                batch = []
+        if batch:
+            indexed[kind] += index_objects(kind, batch)
+    recount_vocabulary()
+    return indexed
+
+
+def expand_prefix(prefix, limit=PREFIX_EXPANSIONS):
+    """
+    The most common indexed terms starting with ``prefix``, as (term, document count) pairs.
+
+    Reads the vocabulary table with a range scan rather than LIKE so it
+    stays an index lookup on every backend; the limit keeps short prefixes
+    from pulling in a large part of the vocabulary.
+    """
+    return list(
+        SearchVocabulary.objects.filter(term__gte=prefix, term__lt=prefix + '\uffff', document_count__gt=0)
+        .order_by('-document_count', 'term')
+        .values_list('term', 'document_count')[:limit]
+    )
+
+
+def _document_total():
+    return cache.get_or_set(DOCUMENT_TOTAL_CACHE_KEY, SearchDocument.objects.count, 300)
+
+
+def search(query, kinds=None):
+    """
+    Rank documents for ``query``.
+
+    Every token but the last must match a term exactly; the last one is
+    also matched as a prefix (from three characters on) so results update
+    while the user is typing. Documents matching more distinct query terms
+    rank first, then by their IDF-weighted term weights. Returns a values()
+    queryset of document_id/score rows.
+    """
+    tokens = tokenize(query, min_length=MIN_TERM_LENGTH)
+    if not tokens:
+        return SearchTerm.objects.none().values('document_id')
+    *exact, last = [token[:MAX_TERM_LENGTH] for token in tokens]
+    if len(last) < MIN_PREFIX_LENGTH:
+        exact.append(last)
+    frequencies = dict(
+        SearchVocabulary.objects.filter(term__in=exact, document_count__gt=0).values_list('term', 'document_count')
+    )
+    if len(last) >= MIN_PREFIX_LENGTH:
+        frequencies.update(expand_prefix(last))
+    if not frequencies:
+        return SearchTerm.objects.none().values('document_id')
+
+    total = max(_document_total(), max(frequencies.values()))
+    selective = {term: df for term, df in frequencies.items() if df <= COMMON_TERM_RATIO * total}
+    if selective:
+        frequencies = selective
+
+    terms = SearchTerm.objects.filter(term__in=list(frequencies))
+    if kinds:
+        terms = terms.filter(kind__in=kinds)
+    if len(frequencies) == 1:
+        # One term needs no aggregation: walk its postings by weight.
+        return terms.order_by('-weight', 'document_id').values('document_id', score=F('weight'))
+
+    score = Sum(Case(
+        *[When(term=term, then=F('weight') * math.log(1 + total / df)) for term, df in frequencies.items()],
+        output_field=FloatField(),
+    ))
+    return (terms
+        .values('document_id')
+        .annotate(matched=Count('term', distinct=True), score=score)
+        .order_by('-matched', '-score', 'document_id'))
+
+
+def load_documents(ranked_rows):
+    """Fetch the SearchDocuments for a page of ranked rows, keeping rank order."""
+    ids = [row['document_id'] for row in ranked_rows]
+    documents = SearchDocument.objects.in_bulk(ids)
+    return [documents[pk] for pk in ids if pk in documents]
@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from blog.models import Blog
+from search.indexing import load_documents, rebuild, search
+from search.models import SearchKind
+from search.views import RESULTS_PER_PAGE
+
+SYLLABLES = ['ba', 'ke', 'ov', 'en', 'pi', 'za', 'fi', 're', 'br', 'ic', 'wo', 'od', 'cr', 'af', 'to', 'st', 'ma', 'lu']
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic corpus, index it and report search latency percentiles (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000)
+        parser.add_argument('--words', type=int, default=120, help='Words per seeded document')
+        parser.add_argument('--queries', type=int, default=300)
+        parser.add_argument('--p95-target', type=float, default=50.0, help='Fail if p95 latency (ms) exceeds this')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(8000)})
+        rng.shuffle(vocabulary)
+        # Zipf-like weights so a few terms are very common, like real text.
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['documents']} documents...")
+            Blog.objects.bulk_create([
+                Blog(
+                    title=' '.join(rng.choices(vocabulary, weights, k=6)),
+                    slug=f'search-benchmark-{i}',
+                    content=' '.join(rng.choices(vocabulary, weights, k=options['words'])),
+                    is_published=True,
+                )
+                for i in range(options['documents'])
+            ], batch_size=1000)
+
+            started = time.perf_counter()
+            rebuild([SearchKind.BLOG])
+            self.stdout.write(f'Indexed in {time.perf_counter() - started:.1f}s')
+
+            timings = []
+            # The first queries only warm the database caches and are not counted.
+            warmup = min(20, options['queries'])
+            for i in range(options['queries'] + warmup):
+                words = rng.choices(vocabulary, weights, k=rng.randint(1, 3))
+                words[-1] = words[-1][:rng.randint(2, len(words[-1]))]
+                started = time.perf_counter()
+                paginator = Paginator(search(' '.join(words)), RESULTS_PER_PAGE)
+                paginator.count
+                load_documents(paginator.page(1).object_list)
+                if i >= warmup:
+                    timings.append((time.perf_counter() - started) * 1000)
+
+            transaction.set_rollback(True)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(f'p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms  max {timings[-1]:.1f} ms')
+        if p95 > options['p95_target']:
+            raise CommandError(f"p95 latency {p95:.1f} ms exceeds the {options['p95_target']:.0f} ms target")
+        self.stdout.write(self.style.SUCCESS('Search latency within target.'))
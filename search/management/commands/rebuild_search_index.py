@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from search.indexing import rebuild
+from search.models import SearchKind
+
+
+class Command(BaseCommand):
+    help = "Rebuild the site search index from blogs, products, FAQs and gallery items"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', choices=SearchKind.values, dest='kinds',
+                            help='Only rebuild these content types (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        indexed = rebuild(options['kinds'], batch_size=options['batch_size'])
+        for kind, count in indexed.items():
+            self.stdout.write(f'{kind}: {count} documents')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class SearchKind(models.TextChoices):
+    BLOG = "blog", "Blog"
+    PRODUCT = "product", "Product"
+    FAQ = "faq", "FAQ"
+    GALLERY = "gallery", "Gallery"
+
+
+class SearchDocument(models.Model):
+    kind = models.CharField(max_length=20, choices=SearchKind.choices)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    url = models.CharField(max_length=255)
+    summary = models.CharField(max_length=300, blank=True)
+    image = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind}: {self.title}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_kind_object_uniq'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """One row of the inverted index: a term, the document it occurs in and its weight there."""
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name="terms")
+    kind = models.CharField(max_length=20, choices=SearchKind.choices)
+    weight = models.FloatField()
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', '-weight'], name='search_term_term_weight_idx'),
+            models.Index(fields=['term', 'kind'], name='search_term_term_kind_idx'),
+        ]
+
+
+class SearchVocabulary(models.Model):
+    """Every distinct indexed term with its document frequency, so prefix expansion and IDF never scan the postings."""
+    term = models.CharField(max_length=64, unique=True)
+    document_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        verbose_name_plural = "Search vocabulary"
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from faq.models import FAQCategory
+from .indexing import KIND_BY_MODEL, SearchKind, index_objects, remove_objects
+
+
+def _saved(sender, instance, **kwargs):
+    kind = KIND_BY_MODEL[sender]
+    transaction.on_commit(lambda: index_objects(kind, [instance]))
+
+
+def _deleted(sender, instance, **kwargs):
+    kind = KIND_BY_MODEL[sender]
+    pk = instance.pk
+    transaction.on_commit(lambda: remove_objects(kind, [pk]))
+
+
+for model in KIND_BY_MODEL:
+    post_save.connect(_saved, sender=model, dispatch_uid=f'search_index_{model._meta.label_lower}')
+    post_delete.connect(_deleted, sender=model, dispatch_uid=f'search_remove_{model._meta.label_lower}')
+
+
+@receiver(post_save, sender=FAQCategory)
+def faq_category_saved(sender, instance, **kwargs):
+    # Category visibility and name are part of every FAQ entry in it.
+    transaction.on_commit(
+        lambda: index_objects(SearchKind.FAQ, list(instance.faqs.select_related('category')))
+    )
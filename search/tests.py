@@ -0,0 +1,105 @@
+import io
+
+from unittest import mock
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from blog.models import Blog
+from core.testing import without_page_cache
+from faq.admin import FAQAdmin, FAQCategoryAdmin
+from faq.models import FAQ, FAQCategory
+from gallery.models import GalleryItem
+from product.models import Product
+from users.models import User
+from .models import SearchDocument, SearchKind, SearchTerm, SearchVocabulary
+
+
+@without_page_cache
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Blog.objects.create(title='Neapolitan dough', slug='dough', is_published=True,
+                                            content='<p>A long cold ferment for pizza dough.</p>')
+            self.oven = Product.objects.create(name='Pizza oven', slug='pizza-oven', short_description='Wood fired',
+                                               description='x', price=1000, main_image='products/oven.jpg')
+            category = FAQCategory.objects.create(name='Ovens', slug='ovens')
+            self.faq = FAQ.objects.create(category=category, question='How hot does the pizza oven get?',
+                                          answer='Around 450 °C.')
+
+    def results(self, **params):
+        return self.client.get('/search/', {'format': 'json', **params}).json()
+
+    def test_saves_and_deletes_keep_the_index_current(self):
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(SearchVocabulary.objects.get(term='pizza').document_count, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Roman dough'
+            self.post.content = '<p>Thin and crisp.</p>'
+            self.post.save()
+        self.assertEqual(SearchDocument.objects.get(kind=SearchKind.BLOG).title, 'Roman dough')
+        self.assertEqual(SearchVocabulary.objects.get(term='pizza').document_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oven.is_active = False
+            self.oven.save()
+            self.faq.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind__in=[SearchKind.PRODUCT, SearchKind.FAQ]).exists())
+        self.assertEqual(SearchVocabulary.objects.get(term='pizza').document_count, 0)
+
+    def test_endpoint_ranks_filters_and_matches_prefixes(self):
+        response = self.results(q='pizza')
+        self.assertEqual(response['count'], 3)
+        # The title weighs most.
+        self.assertEqual(response['results'][0]['title'], 'Pizza oven')
+        # 'pizza' is in every document, so next to a rarer term it is dropped.
+        self.assertEqual([result['title'] for result in self.results(q='cold pizza')['results']], ['Neapolitan dough'])
+
+        response = self.results(q='pizza', type='product')
+        self.assertEqual([result['url'] for result in response['results']], ['/products/pizza-oven/'])
+        self.assertEqual([result['title'] for result in self.results(q='neapol')['results']], ['Neapolitan dough'])
+        self.assertEqual(self.results(q='')['count'], 0)
+        self.assertContains(self.client.get('/search/', {'q': 'ferment'}), 'Neapolitan dough')
+
+    def test_rebuild_command_restores_the_index(self):
+        SearchDocument.objects.all().delete()
+        SearchVocabulary.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Search index rebuilt.', out.getvalue())
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(SearchVocabulary.objects.get(term='pizza').document_count, 3)
+
+        call_command('rebuild_search_index', '--type', 'faq', stdout=io.StringIO())
+        self.assertEqual(SearchTerm.objects.filter(kind=SearchKind.FAQ, term='hot').count(), 1)
+        self.assertEqual(SearchDocument.objects.count(), 3)
+
+    def test_admin_actions_keep_the_index_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = Blog.objects.create(title='Roman pizza', slug='roman', content='<p>Thin.</p>')
+            item = GalleryItem.objects.create(title='Pizza peel', media_type='image', file_path='gallery/peel.jpg')
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchKind.BLOG, object_id=draft.pk).exists())
+
+        self.client.force_login(User.objects.create_superuser(username='admin', email='admin@example.com', password='x'))
+        for changelist, action, pk in (('blog_blog', 'make_published', draft.pk),
+                                       ('product_product', 'make_inactive', self.oven.pk),
+                                       ('gallery_galleryitem', 'make_inactive', item.pk)):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse(f'custom_admin:{changelist}_changelist'),
+                                 {'action': action, '_selected_action': [pk]})
+        self.assertEqual(set(SearchDocument.objects.values_list('kind', 'object_id')),
+                         {(SearchKind.BLOG, self.post.pk), (SearchKind.BLOG, draft.pk), (SearchKind.FAQ, self.faq.pk)})
+
+        request = RequestFactory().post('/')
+        faqs = lambda: SearchDocument.objects.filter(kind=SearchKind.FAQ).exists()
+        for model_admin, action, indexed in ((FAQCategoryAdmin(FAQCategory, admin.site), 'make_inactive', False),
+                                             (FAQCategoryAdmin(FAQCategory, admin.site), 'make_active', True),
+                                             (FAQAdmin(FAQ, admin.site), 'make_inactive', False)):
+            with mock.patch.object(model_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+                getattr(model_admin, action)(request, model_admin.model.objects.all())
+            self.assertEqual(faqs(), indexed, (model_admin, action))
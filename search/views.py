@@ -0,0 +1,53 @@
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .indexing import load_documents, search as search_index
+from .models import SearchKind
+
+RESULTS_PER_PAGE = 10
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    kinds = [kind for kind in request.GET.getlist('type') if kind in SearchKind.values]
+
+    paginator = Paginator(search_index(query, kinds), RESULTS_PER_PAGE)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    results = load_documents(page.object_list)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'query': query,
+            'types': kinds,
+            'count': paginator.count,
+            'page': page.number,
+            'num_pages': paginator.num_pages,
+            'results': [
+                {
+                    'type': document.kind,
+                    'title': document.title,
+                    'url': document.url,
+                    'summary': document.summary,
+                    'image': document.image,
+                }
+                for document in results
+            ],
+        })
+
+    return render(request, 'search.html', {
+        'title': 'Search',
+        'query': query,
+        'types': kinds,
+        'kind_choices': SearchKind.choices,
+        'results': results,
+        'page': page,
+        'paginator': paginator,
+        'current_user': request.user if request.user.is_authenticated else None,
+        'is_authenticated': request.user.is_authenticated
+    })